@@ -1,9 +1,26 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastmcp import FastMCP
+from contextlib import asynccontextmanager
 import asyncio
-from main import initialize_system
+import os
+import tempfile
+import uvicorn
+from main import initialize_system, load_config, collect_runtime_gauges
+from core.admission import AdmissionController, AdmissionRejected
+from core.readiness import ReadinessState
+from core.tracing import tracer, SharedMetrics
 
 agent_instance = None
 mcp_manager_instance = None
+config = load_config()
+admission = AdmissionController(**config.get("admission", {}))
+readiness = ReadinessState()
+workers = config.get("agent_server", {}).get("workers", 1)
+
+# Definido por main() antes de iniciar os workers do uvicorn, que herdam o ambiente
+METRICS_DIR_ENV = "AGENTE_UNB_METRICS_DIR"
+shared_metrics = SharedMetrics(tracer.metrics, os.environ[METRICS_DIR_ENV]) if os.environ.get(METRICS_DIR_ENV) else None
 
 mcp = FastMCP("agent-unb")
 
@@ -16,15 +33,28 @@ async def processar_prompt(prompt: str) -> str:
     global agent_instance
     
     if agent_instance is None:
-        return "Erro: Agente não foi inicializado corretamente"
+        return "Erro: Agente ainda está inicializando, tente novamente em instantes"
     
     if not prompt:
         return "Erro: Prompt vazio"
     
     try:
-        response = await agent_instance.run(prompt)
+        # Respostas em cache não ocupam vaga na fila do modelo
+        cached = await agent_instance.try_cached_answer(prompt)
+        if cached is not None:
+            return cached
+        
+        # Cancelamento da chamada pelo cliente chega aqui como CancelledError (não capturado abaixo):
+        # interrompe o agente e o slot() da admissão libera a vaga
+        response = await admission.run(lambda: agent_instance.run(prompt, check_cache=False))
         return response
     
+    except AdmissionRejected:
+        return "Erro: Servidor ocupado, tente novamente em instantes."
+    
+    except asyncio.TimeoutError:
+        return "Erro: Tempo limite excedido ao processar o prompt."
+    
     except Exception as e:
         return f"Erro ao processar prompt: {str(e)}"
 
@@ -32,36 +62,76 @@ async def setup_agent():
     global agent_instance, mcp_manager_instance
     
     print("🚀 Inicializando Agente UnB para servidor MCP...")
-    agent_instance, mcp_manager_instance = await initialize_system()
-    print("✅ Agente inicializado!\n")
-
-def main():
-    global mcp_manager_instance
-    
     try:
-        asyncio.run(setup_agent())
-    
+        agent_instance, mcp_manager_instance = await initialize_system(
+            readiness=readiness,
+            background_warmup=True
+        )
+        print("✅ Agente inicializado!\n")
     except Exception as e:
+        readiness.set_state(ReadinessState.FAILED, str(e))
         print(f"❌ Erro fatal durante a inicialização do agente: {e}")
-        return
 
+# Com vários workers, qualquer processo precisa atender qualquer requisição: sem sessão MCP fixa
+mcp_app = mcp.http_app(path="/mcp", stateless_http=workers > 1)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A porta é aberta imediatamente; modelo e conexões MCP carregam em segundo plano
+    setup_task = asyncio.create_task(setup_agent())
+    if shared_metrics:
+        shared_metrics.start(gauges=lambda: collect_runtime_gauges(agent_instance, admission))
+    
+    async with mcp_app.lifespan(app):
+        yield
+    
+    setup_task.cancel()
+    if shared_metrics:
+        shared_metrics.stop()
+    if mcp_manager_instance:
+        print("\n🔌 Fechando conexões MCP do agente...")
+        await mcp_manager_instance.close_all()
+        print("  ✓ Conexões fechadas")
+    if agent_instance:
+        await agent_instance.llm.close()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    return {**readiness.to_dict(), "admission": admission.get_status()}
+
+@app.get("/ready")
+async def ready():
+    status_code = 200 if readiness.is_ready else 503
+    return JSONResponse(readiness.to_dict(), status_code=status_code)
+
+@app.get("/metrics")
+async def metrics():
+    gauges = collect_runtime_gauges(agent_instance, admission)
+    registry = shared_metrics or tracer.metrics
+    return PlainTextResponse(registry.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+app.mount("/", mcp_app)
+
+def main():
+    if workers > 1 and config.get("llm", {}).get("provider") != "ipc":
+        print("⚠️  Vários workers sem llm.provider: ipc carregam uma cópia do modelo por processo")
+    if workers > 1:
+        print(f"ℹ️  Admissão por worker: {workers} x {admission.max_concurrent} em execução e "
+              f"{workers} x {admission.max_queue} na fila; o teto global é model_server.max_concurrent")
+    
     try:
-        mcp.run(
-            transport='http',
-            host="0.0.0.0",
-            port=8889
-        )
-            
+        if workers > 1:
+            # Cada worker tem o próprio registro de métricas: /metrics soma os snapshots gravados nesta pasta
+            metrics_dir = (config.get("agent_server", {}).get("metrics_dir")
+                           or os.path.join(tempfile.gettempdir(), "agente_unb_metrics"))
+            os.environ[METRICS_DIR_ENV] = SharedMetrics.prepare(metrics_dir)
+            uvicorn.run("agent_mcp_server:app", host="0.0.0.0", port=8889, workers=workers)
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8889)
     except KeyboardInterrupt:
         print("\n👋 Encerrando servidor do agente...")
-    finally:
-        if mcp_manager_instance:
-            print("\n🔌 Fechando conexões MCP do agente...")
-            try:
-                asyncio.run(mcp_manager_instance.close_all())
-            except RuntimeError as e:
-                print(f"Aviso ao fechar conexões: {e}")
-            print("  ✓ Conexões fechadas")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import atexit
+import gc
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import weakref
+from typing import Any, Dict, List, Optional
+from fastmcp import FastMCP
+from core.agent import ReactAgent
+from core.context import ContextManager
+from core.llm_provider import LLMProvider
+from core.mcp_client import MCPClientManager
+from core.tools import ToolRegistry
+from core.tracing import tracer
+
+# Os cenários usam os dados de exemplo (matrícula 2023001, LIV001...) e podem fazer reservas: o servidor de
+# ferramentas abre um banco temporário, semeado na importação, em vez do unb_tools.db real
+_BENCH_DB_DIR = tempfile.mkdtemp(prefix="bench_unb_tools_")
+os.environ["UNB_TOOLS_DB"] = os.path.join(_BENCH_DB_DIR, "unb_tools.db")
+atexit.register(shutil.rmtree, _BENCH_DB_DIR, ignore_errors=True)
+
+from mcp_servers.server import mcp as tools_server
+
+logger = logging.getLogger(__name__)
+
+# Decisões gravadas no formato que o modelo produz; cada cenário é um diálogo completo
+DEFAULT_SCENARIOS = [
+    {
+        "prompt": "Qual o horário de CIC0004?",
+        "responses": [
+            {"thought": "Preciso do horário da disciplina.", "action": "consultar_horario",
+             "action_input": {"codigo": "CIC0004"}},
+            {"thought": "Tenho o horário.", "action": "ANSWER",
+             "answer": "CIC0004 ocorre terça e quinta, 10:00-12:00, no LINF - Lab 3."}
+        ]
+    },
+    {
+        "prompt": "Qual meu saldo no RU e tenho multas na biblioteca? Matrícula 2023001",
+        "responses": [
+            {"thought": "Consultas independentes.", "action": "PARALLEL",
+             "actions": [
+                 {"action": "verificar_saldo_usuario", "action_input": {"matricula": "2023001"}},
+                 {"action": "verificar_pendencias_biblioteca", "action_input": {"matricula": "2023001"}}
+             ]},
+            {"thought": "Tenho as duas informações.", "action": "ANSWER",
+             "answer": "Seu saldo é R$ 15,50 e você não possui multas."}
+        ]
+    },
+    {
+        "prompt": "Como funciona o trancamento de matrícula?",
+        "responses": [
+            {"thought": "Pergunta institucional, uso o RAG.", "action": "enriquecer_prompt_com_rag_unb",
+             "action_input": {"prompt_usuario": "Como funciona o trancamento de matrícula?"}},
+            {"thought": "O contexto recuperado responde.", "action": "ANSWER",
+             "answer": "O trancamento é solicitado no SIGAA dentro do prazo do calendário acadêmico."}
+        ]
+    },
+    {
+        "prompt": "Posso cursar CIC0099 e qual seria meu CRA com média 4 em 20 créditos? Matrícula 2023001",
+        "responses": [
+            {"thought": "Preciso dos requisitos e do histórico.", "action": "PARALLEL",
+             "actions": [
+                 {"action": "verificar_requisitos_disciplina", "action_input": {"codigo_disciplina": "CIC0099"}},
+                 {"action": "consultar_historico_analitico", "action_input": {"matricula": "2023001"}}
+             ]},
+            {"thought": "Agora simulo o CRA.", "action": "simular_cra_projetado",
+             "action_input": {"matricula": "2023001", "media_esperada": 4.0, "creditos_futuros": 20}},
+            {"thought": "Tenho tudo.", "action": "ANSWER",
+             "answer": "Você cumpre o requisito CIC0004 e seu CRA projetado seria 4.42."}
+        ]
+    },
+    {
+        "prompt": "Quanto é 1+1?",
+        "responses": [
+            {"thought": "Pergunta simples.", "action": "ANSWER", "answer": "1 + 1 = 2."}
+        ]
+    }
+]
+
+RAG_MOCK_PASSAGES = [
+    "O trancamento geral de matrícula deve ser solicitado pelo SIGAA dentro do prazo previsto no calendário acadêmico. " * 4,
+    "O aluno pode trancar a matrícula no máximo duas vezes durante o curso, salvo casos de trancamento justificado. " * 4,
+    "Durante o trancamento o vínculo com a UnB é mantido, mas o estudante não pode cursar disciplinas. " * 4
+]
+
+def create_rag_mock_server() -> FastMCP:
+    # Mesma ferramenta e mesmo formato de saída do servidor RAG, sem banco nem modelo de embeddings
+    rag_server = FastMCP(name="Servidor_RAG_UnB")
+
+    @rag_server.tool(annotations={"readOnlyHint": True})
+    def enriquecer_prompt_com_rag_unb(prompt_usuario: str) -> str:
+        return json.dumps({
+            "prompt_original": prompt_usuario,
+            "contexto_recuperado": RAG_MOCK_PASSAGES,
+            "fontes": [f"https://boasvindas.unb.br/doc{i}" for i in range(len(RAG_MOCK_PASSAGES))]
+        })
+
+    return rag_server
+
+class ScriptedLLMProvider(LLMProvider):
+    def __init__(self, scenarios: List[Dict[str, Any]], base_latency: float = 0.0,
+                 per_token_latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.scenarios = scenarios
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.simulated_seconds = 0.0
+        # Cada sessão roda em sua própria task: o passo do roteiro é mantido por task
+        self._steps: "weakref.WeakKeyDictionary[asyncio.Task, int]" = weakref.WeakKeyDictionary()
+
+    def _find_scenario(self, user_message: str) -> Dict[str, Any]:
+        for scenario in self.scenarios:
+            if scenario["prompt"] in user_message:
+                return scenario
+        raise ValueError("Nenhum cenário gravado corresponde ao prompt")
+
+    def _latency(self, response: str) -> float:
+        # Modelo simples: custo fixo (prefill) + custo por token gerado (~4 caracteres por token)
+        latency = self.base_latency + self.per_token_latency * (len(response) / 4)
+        if self.jitter:
+            latency *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, latency)
+
+    async def generate(self, system_prompt: str, user_message: str,
+                       conversation_history: List[Dict[str, str]] = None,
+                       max_new_tokens: Optional[int] = None) -> str:
+        task = asyncio.current_task()
+        step = self._steps.get(task, 0)
+        self._steps[task] = step + 1
+
+        responses = self._find_scenario(user_message)["responses"]
+        response = responses[min(step, len(responses) - 1)]
+        if not isinstance(response, str):
+            response = json.dumps(response, ensure_ascii=False)
+
+        latency = self._latency(response)
+        self.calls += 1
+        self.simulated_seconds += latency
+        if latency:
+            await asyncio.sleep(latency)
+        return response
+
+    def get_model_info(self) -> Dict[str, Any]:
+        return {"provider": "scripted", "model": "scripted-replay", "scenarios": len(self.scenarios)}
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class AgentLoopBenchmark:
+    def __init__(self, scenarios: List[Dict[str, Any]], llm: ScriptedLLMProvider,
+                 pool_size: int = 4, tool_cache: bool = False):
+        self.scenarios = scenarios
+        self.llm = llm
+        self.pool_size = pool_size
+        self.tool_cache = tool_cache
+        self.agent: Optional[ReactAgent] = None
+        self.mcp_manager: Optional[MCPClientManager] = None
+
+    async def setup(self) -> None:
+        registry = ToolRegistry()
+        if self.tool_cache:
+            registry.configure_cache()
+
+        # fastmcp.Client aceita a instância do servidor e usa um transporte em memória,
+        # exercitando o mesmo caminho MCPServerPool -> MCPTool -> ToolRegistry da produção
+        self.mcp_manager = MCPClientManager(pool_config={"size": self.pool_size})
+        await self.mcp_manager.connect_server("rag_unb", create_rag_mock_server())
+        await self.mcp_manager.connect_server("ferramentas-complexas-unb", tools_server)
+        await self.mcp_manager.start_all()
+        await self.mcp_manager.discover_and_register_tools(registry)
+
+        self.agent = ReactAgent(self.llm, registry, ContextManager())
+        self.agent.MAX_ITERATIONS = max(len(s["responses"]) for s in self.scenarios) + 1
+
+    async def close(self) -> None:
+        if self.mcp_manager:
+            await self.mcp_manager.close_all()
+
+    async def _session(self, prompt: str) -> Dict[str, float]:
+        start = time.perf_counter()
+        await self.agent.run(prompt)
+        return {"elapsed": time.perf_counter() - start}
+
+    async def _run_session_task(self, prompt: str) -> Dict[str, float]:
+        # Task dedicada por sessão para que o roteiro do LLM avance de forma independente
+        return await asyncio.create_task(self._session(prompt))
+
+    async def measure_overhead(self, rounds: int) -> Dict[str, Any]:
+        # Com latência zero no LLM, todo o tempo medido é do framework (agente, registro, pool MCP, servidores)
+        saved = (self.llm.base_latency, self.llm.per_token_latency, self.llm.jitter)
+        self.llm.base_latency = self.llm.per_token_latency = self.llm.jitter = 0.0
+        per_iteration = []
+        try:
+            for _ in range(rounds):
+                for scenario in self.scenarios:
+                    calls_before = self.llm.calls
+                    result = await self._run_session_task(scenario["prompt"])
+                    iterations = max(1, self.llm.calls - calls_before)
+                    per_iteration.append(result["elapsed"] / iterations)
+        finally:
+            self.llm.base_latency, self.llm.per_token_latency, self.llm.jitter = saved
+
+        return {
+            "iterations_sampled": len(per_iteration),
+            "per_iteration_ms_mean": round(statistics.mean(per_iteration) * 1000, 3),
+            "per_iteration_ms_p50": round(_percentile(per_iteration, 0.50) * 1000, 3),
+            "per_iteration_ms_p95": round(_percentile(per_iteration, 0.95) * 1000, 3)
+        }
+
+    async def measure_throughput(self, concurrency: int, sessions: int) -> Dict[str, Any]:
+        prompts = [self.scenarios[i % len(self.scenarios)]["prompt"] for i in range(sessions)]
+        semaphore = asyncio.Semaphore(concurrency)
+        simulated_before = self.llm.simulated_seconds
+
+        async def bounded(prompt: str):
+            async with semaphore:
+                return await self._run_session_task(prompt)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(p) for p in prompts))
+        wall = time.perf_counter() - start
+
+        latencies = [r["elapsed"] for r in results]
+        return {
+            "concurrency": concurrency,
+            "sessions": sessions,
+            "sessions_per_s": round(sessions / wall, 2),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            "simulated_llm_s": round(self.llm.simulated_seconds - simulated_before, 3)
+        }
+
+    async def measure_memory(self, sessions: int, checkpoints: int, concurrency: int) -> Dict[str, Any]:
+        batch = max(1, sessions // checkpoints)
+        tracemalloc.start(10)
+        gc.collect()
+        baseline = tracemalloc.take_snapshot()
+        samples = []
+
+        try:
+            for i in range(checkpoints):
+                await self.measure_throughput(concurrency, batch)
+                gc.collect()
+                current, peak = tracemalloc.get_traced_memory()
+                samples.append({
+                    "sessions": (i + 1) * batch,
+                    "traced_mb": round(current / (1024 * 1024), 3),
+                    "rss_mb": round(_rss_mb(), 1)
+                })
+            top_growth = tracemalloc.take_snapshot().compare_to(baseline, "lineno")[:10]
+        finally:
+            tracemalloc.stop()
+
+        first, last = samples[0], samples[-1]
+        sessions_between = max(1, last["sessions"] - first["sessions"])
+        return {
+            "samples": samples,
+            "growth_kb_per_session": round((last["traced_mb"] - first["traced_mb"]) * 1024 / sessions_between, 3),
+            "top_growth": [str(stat) for stat in top_growth]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tool_cache": self.agent.tools.get_cache_stats(),
+            "mcp_pools": {name: {k: v for k, v in status.items() if k != "url"}
+                          for name, status in self.mcp_manager.get_status().items()}
+        }
+
+def load_scenarios(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_SCENARIOS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark do laço REACT sem GPU (LLM roteirizado + servidores MCP em processo)")
+    parser.add_argument("--scenarios", help="JSON com [{'prompt': ..., 'responses': [decisão, ...]}]")
+    parser.add_argument("--base-latency", type=float, default=0.0, help="Latência fixa por chamada ao LLM (s)")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="Latência por token gerado (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação relativa da latência (0-1)")
+    parser.add_argument("--overhead-rounds", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--memory-sessions", type=int, default=2000)
+    parser.add_argument("--memory-checkpoints", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--tool-cache", action="store_true")
+    parser.add_argument("--tracing", action="store_true", help="Mantém o tracer ativo (mede o custo dos spans)")
+    parser.add_argument("--output", default="bench_agent.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    tracer.configure(enabled=args.tracing)
+
+    scenarios = load_scenarios(args.scenarios)
+    llm = ScriptedLLMProvider(scenarios, args.base_latency, args.per_token_latency, args.jitter)
+    bench = AgentLoopBenchmark(scenarios, llm, pool_size=args.pool_size, tool_cache=args.tool_cache)
+
+    await bench.setup()
+    try:
+        report = {"config": vars(args)}
+        print("⏱️  Medindo overhead por iteração...")
+        report["overhead"] = await bench.measure_overhead(args.overhead_rounds)
+        print("🚀 Medindo vazão com sessões concorrentes...")
+        report["throughput"] = [await bench.measure_throughput(c, args.sessions) for c in args.concurrency]
+        print("🧠 Medindo crescimento de memória...")
+        report["memory"] = await bench.measure_memory(args.memory_sessions, args.memory_checkpoints,
+                                                      max(args.concurrency))
+        report["stats"] = bench.get_stats()
+    finally:
+        await bench.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps({k: report[k] for k in ("overhead", "throughput")}, ensure_ascii=False, indent=2))
+    print(f"✅ Relatório salvo em {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    pass
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 1, max_queue: int = 8, queue_timeout: float = 60.0,
+                 request_timeout: Optional[float] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._moved: Optional[asyncio.Future] = None
+
+    def _notify_moved(self) -> None:
+        if self._moved is not None and not self._moved.done():
+            self._moved.set_result(None)
+        self._moved = None
+
+    def _wake_next(self) -> None:
+        while self._waiters and self.active < self.max_concurrent:
+            ticket = self._waiters.popleft()
+            if ticket.done():
+                continue
+            self.active += 1
+            ticket.set_result(True)
+        self._notify_moved()
+
+    async def acquire(self, on_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+                      timeout: Optional[float] = None) -> None:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Servidor ocupado: {self.active} em execução e {len(self._waiters)} na fila"
+            )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.queue_timeout)
+        ticket = loop.create_future()
+        self._waiters.append(ticket)
+        last_position = None
+
+        try:
+            while not ticket.done():
+                position = self._waiters.index(ticket) + 1
+                if on_position and position != last_position:
+                    last_position = position
+                    await on_position(position)
+                    continue
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.timed_out += 1
+                    raise asyncio.TimeoutError(
+                        f"Tempo de espera na fila excedido ({timeout or self.queue_timeout}s)"
+                    )
+
+                if self._moved is None:
+                    self._moved = loop.create_future()
+                await asyncio.wait({ticket, self._moved}, timeout=remaining,
+                                   return_when=asyncio.FIRST_COMPLETED)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                self.cancelled += 1
+            if ticket.done() and not ticket.cancelled():
+                # A vaga foi concedida enquanto a requisição era abandonada
+                self.release()
+            else:
+                ticket.cancel()
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                self._notify_moved()
+            raise
+
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, on_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+                   timeout: Optional[float] = None):
+        await self.acquire(on_position=on_position, timeout=timeout)
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Requisição em execução abandonada (cliente desconectou ou cancelou a chamada MCP)
+            self.cancelled += 1
+            raise
+        finally:
+            self.release()
+
+    async def run(self, coro_factory: Callable[[], Awaitable[Any]],
+                  on_position: Optional[Callable[[int], Awaitable[Any]]] = None) -> Any:
+        async with self.slot(on_position=on_position):
+            if self.request_timeout:
+                return await asyncio.wait_for(coro_factory(), timeout=self.request_timeout)
+            return await coro_factory()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled
+        }
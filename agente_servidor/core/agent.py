@@ -1,37 +1,85 @@
 from typing import Literal, Optional, Dict, Any, List, Callable
 from pydantic import BaseModel
+import asyncio
 import json
 import logging
 import re
 from core.llm_provider import LLMProvider
 from core.tools import ToolRegistry
+from core.context import ContextManager
+from core.answer_cache import SemanticAnswerCache
+from core.tool_router import ToolRouter
+from core.fast_path import FastPathClassifier
+from core.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+class DecisionFormatError(ValueError):
+    # JSON válido mas fora do formato esperado: volta para o modelo como observação, sem executar nada
+    pass
+
+class ToolCall(BaseModel):
+    action: str
+    action_input: Optional[Dict[str, Any]] = None
+
 class ReactDecision(BaseModel):
     thought: str
-    action: Literal["ANSWER", "ABORT"] | str
+    action: Literal["ANSWER", "ABORT", "PARALLEL"] | str
     action_input: Optional[Dict[str, Any]] = None
+    actions: Optional[List[ToolCall]] = None
     answer: Optional[str] = None
+    
+    def tool_calls(self) -> List[ToolCall]:
+        if self.action == "PARALLEL" or self.actions:
+            return list(self.actions or [])
+        return [ToolCall(action=self.action, action_input=self.action_input)]
 
 class ReactAgent:
     MAX_ITERATIONS = 10
+    TOOL_TIMEOUT = 30.0
+    EXPAND_ACTION = "BUSCAR_FERRAMENTAS"
     
-    def __init__(self, llm_provider: LLMProvider, tool_registry: ToolRegistry):
+    def __init__(self, llm_provider: LLMProvider, tool_registry: ToolRegistry,
+                 context_manager: Optional[ContextManager] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 tool_router: Optional[ToolRouter] = None,
+                 fast_path: Optional[FastPathClassifier] = None):
         self.llm = llm_provider
         self.tools = tool_registry
-        self.system_prompt = self._build_system_prompt()
+        self.context = context_manager or ContextManager(tokenizer=llm_provider.get_tokenizer())
+        self.answer_cache = answer_cache
+        self.tool_router = tool_router
+        self.fast_path = fast_path
+        self.base_prompt = self._build_system_prompt()
+        # Com roteador, o bloco de ferramentas muda por pedido e fica no fim: as instruções
+        # continuam sendo um prefixo fixo, reaproveitado pelo cache de prefixo do LLM
+        self.system_prompt = self.base_prompt if tool_router else self.base_prompt + self._build_tools_section()
+        self._prompt_version = tool_registry.version
+    
+    def _refresh_system_prompt(self) -> None:
+        # Ferramentas descobertas depois (ex.: servidor MCP que estava fora no início e se recuperou)
+        if self.tool_router or self._prompt_version == self.tools.version:
+            return
+        self._prompt_version = self.tools.version
+        self.system_prompt = self.base_prompt + self._build_tools_section()
+        logger.info(f"Catálogo de ferramentas mudou; system prompt reconstruído ({len(self.tools.tools)} ferramentas)")
+    
+    def _build_tools_section(self, names: Optional[List[str]] = None) -> str:
+        section = f"""
+FERRAMENTAS DISPONÍVEIS (nome(parâmetros): descrição; "?" marca parâmetro opcional):
+{self.tools.get_tools_description(names)}
+"""
+        if self.tool_router:
+            section += f"""
+Se nenhuma ferramenta acima servir, use "action": "{self.EXPAND_ACTION}" com "action_input": {{"consulta": "o que você precisa fazer"}} para receber outras ferramentas.
+"""
+        return section
     
     def _build_system_prompt(self) -> str:
-        tools_description = self.tools.get_tools_description()
-        
         return f"""Você é um agente assistente de estudantes da Universidade de Brasília (UnB).
 
 Sua função é ajudar estudantes com informações acadêmicas, horários, cardápios, cálculos e outras tarefas.
 
-FERRAMENTAS DISPONÍVEIS:
-{tools_description}
-
 PROCESSO DE RACIOCÍNIO (REACT):
 Você deve seguir o ciclo Reasoning → Action → Observation até resolver o problema.
 
@@ -40,18 +88,20 @@ Você DEVE responder APENAS com um objeto JSON válido no seguinte formato:
 
 {{
   "thought": "seu raciocínio sobre o problema e próximos passos. Este campo é OBRIGATÓRIO.",
-  "action": "nome_da_ferramenta" ou "ANSWER" ou "ABORT",
+  "action": "nome_da_ferramenta" ou "PARALLEL" ou "ANSWER" ou "ABORT",
   "action_input": {{"parametro": "valor"}} ou null,
+  "actions": [{{"action": "nome_da_ferramenta", "action_input": {{"parametro": "valor"}}}}] ou null,
   "answer": "resposta final ao usuário" ou null
 }}
 
 REGRAS:
 1. O campo "thought" é SEMPRE obrigatório, mesmo se a ação for "ANSWER".
 2. Se você tem informação suficiente para responder, use "action": "ANSWER" e preencha "answer"
-3. Se você precisa usar uma ferramenta ("action": "nome_da_ferramenta"), você DEVE preencher o "action_input" com os parâmetros exatos definidos no JSON Schema da ferramenta.
-4. Se você não consegue resolver o problema mesmo após usar ferramentas, use "action": "ABORT"
-5. NUNCA invente informações. Use as ferramentas disponíveis.
-6. Seja conciso e direto nas respostas.
+3. Se você precisa usar uma ferramenta ("action": "nome_da_ferramenta"), você DEVE preencher o "action_input" com os parâmetros exatos listados para a ferramenta.
+4. Se você precisa de várias informações INDEPENDENTES entre si, use "action": "PARALLEL" e liste todas as chamadas em "actions". Elas serão executadas ao mesmo tempo e você receberá todas as observações juntas.
+5. Se você não consegue resolver o problema mesmo após usar ferramentas, use "action": "ABORT"
+6. NUNCA invente informações. Use as ferramentas disponíveis.
+7. Seja conciso e direto nas respostas.
 
 EXEMPLO DE USO DE FERRAMENTA:
 Prompt do Usuário: "Qual o horário de CIC0004?"
@@ -64,6 +114,21 @@ Sua Resposta JSON:
   "answer": null
 }}
 
+EXEMPLO DE USO DE FERRAMENTAS EM PARALELO:
+Prompt do Usuário: "Qual meu saldo no RU e tenho multas na biblioteca? Matrícula 2023001"
+
+Sua Resposta JSON:
+{{
+  "thought": "Preciso do saldo do RU e da situação na biblioteca. As consultas são independentes, então posso fazê-las juntas.",
+  "action": "PARALLEL",
+  "action_input": null,
+  "actions": [
+    {{"action": "verificar_saldo_usuario", "action_input": {{"matricula": "2023001"}}}},
+    {{"action": "verificar_pendencias_biblioteca", "action_input": {{"matricula": "2023001"}}}}
+  ],
+  "answer": null
+}}
+
 EXEMPLO DE RESPOSTA DIRETA (PERGUNTA SIMPLES):
 Prompt do Usuário: "Quanto é 1+1?"
 
@@ -78,92 +143,240 @@ Sua Resposta JSON:
 IMPORTANTE: Responda APENAS com o JSON, sem texto adicional antes ou depois.
 """
     
-    async def run(self, user_prompt: str, step_callback: Optional[Callable[[Dict], Any]] = None) -> str:
-        logger.info(f"Iniciando novo ciclo REACT para o prompt: '{user_prompt[:70]}...'")
-        conversation_history = []
-        observations = []
-        
-        for iteration in range(self.MAX_ITERATIONS):
-            context = self._build_context(user_prompt, observations)
+    async def run(self, user_prompt: str, step_callback: Optional[Callable[[Dict], Any]] = None,
+                  check_cache: bool = True) -> str:
+        with tracer.span("agent.run", prompt_chars=len(user_prompt)) as span:
+            if check_cache:
+                cached = await self.try_cached_answer(user_prompt, step_callback)
+                if cached is not None:
+                    return cached
             
-            llm_response = await self.llm.generate(
-                system_prompt=self.system_prompt,
-                user_message=context,
-                conversation_history=conversation_history
-            )
+            trace = []
             
-            try:
-                decision = self._parse_decision(llm_response)
-            except Exception as e:
-                error_msg = f"Erro ao processar decisão do agente: {str(e)}"
+            async def recording_callback(step: Dict):
+                trace.append(step)
                 if step_callback:
-                    await step_callback({"type": "error", "content": error_msg})
-                return error_msg
+                    await step_callback(step)
             
-            conversation_history.append({"role": "assistant", "content": llm_response})
+            first_call = await self._classify_fast_path(user_prompt)
+            result = await self._run(user_prompt, recording_callback if self.answer_cache else step_callback, first_call)
+            if span is not None:
+                span.set_attribute("outcome", "answer" if not (result or "").startswith(("ABORT", "Erro", "Desculpe")) else "failed")
             
+            if self.answer_cache and any(step["type"] == "final" for step in trace):
+                mutating = [name for name, tool in self.tools.tools.items() if not tool.cacheable]
+                if self.answer_cache.is_cacheable_trace(trace, mutating):
+                    await self.answer_cache.store(user_prompt, result, trace)
+            return result
+    
+    async def try_cached_answer(self, user_prompt: str,
+                                step_callback: Optional[Callable[[Dict], Any]] = None) -> Optional[str]:
+        if not self.answer_cache:
+            return None
+        
+        with tracer.span("agent.answer_cache") as span:
+            entry = await self.answer_cache.lookup(user_prompt)
+            if span is not None:
+                span.set_attribute("result", "hit" if entry else "miss")
+        if entry is None:
+            return None
+        
+        # Reproduz o rastro de ferramentas original para a interface mostrar de onde veio a resposta
+        if step_callback:
+            for step in entry["trace"]:
+                await step_callback({**step, "cached": True})
+        return entry["answer"]
+    
+    async def _classify_fast_path(self, user_prompt: str) -> Optional[ToolCall]:
+        if not self.fast_path:
+            return None
+        with tracer.span("agent.fast_path") as span:
+            route = await self.fast_path.classify(user_prompt, self.tools.tools)
+            if span is not None:
+                span.set_attribute("route", route["route"] if route else "agent")
+        if route is None:
+            return None
+        logger.info(f"Rota rápida '{route['route']}': {route['tool']} {route['arguments']}")
+        return ToolCall(action=route["tool"], action_input=route["arguments"])
+    
+    async def _select_tools(self, user_prompt: str) -> Optional[List[str]]:
+        if not self.tool_router:
+            return None
+        with tracer.span("agent.tool_router") as span:
+            selected = await self.tool_router.select(user_prompt)
+            if span is not None:
+                span.set_attribute("selected", len(selected))
+        logger.debug(f"Ferramentas selecionadas: {selected}")
+        return selected
+    
+    async def _expand_tools(self, call: ToolCall, active: List[str]) -> str:
+        query = str((call.action_input or {}).get("consulta", ""))
+        with tracer.span("agent.tool_router", expansion=True):
+            added = await self.tool_router.select(query, exclude=set(active))
+        active.extend(added)
+        self.tool_router.expansions += 1
+        logger.info(f"Conjunto de ferramentas expandido para '{query[:70]}': {added}")
+        if not added:
+            return "Nenhuma outra ferramenta disponível."
+        return "Ferramentas adicionadas:\n" + self.tools.get_tools_description(added)
+    
+    async def _run(self, user_prompt: str, step_callback: Optional[Callable[[Dict], Any]] = None,
+                   first_call: Optional[ToolCall] = None) -> str:
+        logger.info(f"Iniciando novo ciclo REACT para o prompt: '{user_prompt[:70]}...'")
+        conversation_history = []
+        observations = []
+        self._refresh_system_prompt()
+        active_tools = await self._select_tools(user_prompt)
+        
+        if first_call is not None:
+            # Rota rápida: a primeira ação é decidida pelo classificador, sem gerar com o LLM.
+            # A decisão entra no histórico como se o modelo a tivesse tomado, e o ciclo segue
+            # normalmente (em geral a próxima geração já é a resposta final).
+            decision = ReactDecision(thought="Consulta direta pela rota rápida.", action=first_call.action,
+                                     action_input=first_call.action_input)
             if step_callback:
                 await step_callback({
-                    "type": "thought", 
+                    "type": "thought",
                     "content": decision.thought,
                     "action": decision.action,
                     "input": decision.action_input
                 })
-            
-            if decision.action == "ANSWER":
-                if step_callback:
-                    await step_callback({"type": "final", "content": decision.answer})
-                return decision.answer
-            
-            elif decision.action == "ABORT":
-                return "Desculpe, não consegui resolver seu problema com as ferramentas disponíveis."
-            
-            else:
+            if active_tools is not None and first_call.action not in active_tools:
+                active_tools.append(first_call.action)
+            results = await self._execute_tool_calls([first_call], step_callback)
+            observations.extend(results)
+            conversation_history.append({"role": "assistant", "content": json.dumps({
+                "thought": decision.thought,
+                "action": decision.action,
+                "action_input": decision.action_input,
+                "answer": None
+            }, ensure_ascii=False)})
+            conversation_history.append({"role": "user", "content": "OBSERVATION: " + "\n".join(results)})
+        
+        for iteration in range(self.MAX_ITERATIONS):
+            tracer.set_attributes(iterations=iteration + 1)
+            with tracer.span("agent.iteration", iteration=iteration):
+                with tracer.span("agent.build_context", observations=len(observations)):
+                    context = self._build_context(user_prompt, observations)
+                    history = self.context.fit_history(conversation_history, context)
+                
+                system_prompt = self.system_prompt
+                if active_tools is not None:
+                    system_prompt = self.base_prompt + self._build_tools_section(active_tools)
+                
+                with tracer.span("llm.generate", iteration=iteration):
+                    llm_response = await self.llm.generate(
+                        system_prompt=system_prompt,
+                        user_message=context,
+                        conversation_history=history
+                    )
+                
                 try:
+                    with tracer.span("agent.parse_decision"):
+                        decision = self._parse_decision(llm_response)
+                except DecisionFormatError as e:
+                    format_msg = f"Erro de formato na decisão: {e}"
                     if step_callback:
-                        await step_callback({
-                            "type": "tool_start", 
-                            "tool": decision.action,
-                            "input": decision.action_input
-                        })
-                        
-                    tool = self.tools.get_tool(decision.action)
-                    result = await tool.execute(**(decision.action_input or {}))
-                    observation = f"Resultado da ferramenta '{decision.action}': {result}"
-                    
+                        await step_callback({"type": "error", "content": format_msg})
+                    observations.append(format_msg)
+                    conversation_history.append({"role": "assistant", "content": llm_response})
+                    conversation_history.append({"role": "user", "content": "OBSERVATION: " + format_msg})
+                    continue
+                except Exception as e:
+                    error_msg = f"Erro ao processar decisão do agente: {str(e)}"
                     if step_callback:
-                        await step_callback({
-                            "type": "observation", 
-                            "content": str(result)
-                        })
-                    
-                    observations.append(observation)
-                    
-                    conversation_history.append({
-                        "role": "user",
-                        "content": f"OBSERVATION: {observation}"
+                        await step_callback({"type": "error", "content": error_msg})
+                    return error_msg
+                
+                conversation_history.append({"role": "assistant", "content": llm_response})
+                
+                if step_callback:
+                    await step_callback({
+                        "type": "thought", 
+                        "content": decision.thought,
+                        "action": decision.action,
+                        "input": decision.action_input
                     })
-                    
-                except Exception as e:
-                    error_msg = f"Erro ao executar ferramenta '{decision.action}': {str(e)}"
-                    observations.append(error_msg)
+                
+                if decision.action == "ANSWER":
+                    if not (decision.answer or "").strip():
+                        # "ANSWER" sem texto: trata como erro (não vira "final" nem entra no cache de respostas)
+                        error_msg = "Erro ao processar decisão do agente: resposta final vazia."
+                        if step_callback:
+                            await step_callback({"type": "error", "content": error_msg})
+                        return error_msg
+                    if step_callback:
+                        await step_callback({"type": "final", "content": decision.answer})
+                    return decision.answer
+                
+                elif decision.action == "ABORT":
+                    return "Desculpe, não consegui resolver seu problema com as ferramentas disponíveis."
+                
+                else:
+                    results = await self._execute_tool_calls(decision.tool_calls(), step_callback, active_tools)
+                    observations.extend(results)
                     conversation_history.append({
                         "role": "user",
-                        "content": f"OBSERVATION: {error_msg}"
+                        "content": "OBSERVATION: " + "\n".join(results)
                     })
-                    if step_callback:
-                        await step_callback({"type": "error", "content": error_msg})
         
         return f"ABORT: Limite de {self.MAX_ITERATIONS} iterações atingido sem resolver o problema."
     
-    def _build_context(self, original_prompt: str, observations: List[str]) -> str:
-        if not observations:
-            return original_prompt
+    async def _execute_tool_calls(self, calls: List[ToolCall],
+                                  step_callback: Optional[Callable[[Dict], Any]] = None,
+                                  active_tools: Optional[List[str]] = None) -> List[str]:
+        if active_tools is not None:
+            expansions = [c for c in calls if c.action == self.EXPAND_ACTION]
+            calls = [c for c in calls if c.action != self.EXPAND_ACTION]
+            # Ferramenta real fora da seleção: executa e passa a listá-la nas próximas iterações
+            for call in calls:
+                if call.action in self.tools.tools and call.action not in active_tools:
+                    active_tools.append(call.action)
+                    self.tool_router.expansions += 1
+            expanded = [await self._expand_tools(c, active_tools) for c in expansions]
+        else:
+            expanded = []
         
-        context = f"TAREFA ORIGINAL: {original_prompt}\n\n"
-        context += "OBSERVAÇÕES DAS AÇÕES ANTERIORES:\n"
-        context += "\n".join(observations)
-        return context
+        if len(calls) > 1:
+            logger.info(f"Executando {len(calls)} ferramentas em paralelo: {[c.action for c in calls]}")
+        return expanded + list(await asyncio.gather(*(self._execute_tool_call(call, step_callback) for call in calls)))
+    
+    async def _execute_tool_call(self, call: ToolCall,
+                                 step_callback: Optional[Callable[[Dict], Any]] = None) -> str:
+        try:
+            if step_callback:
+                await step_callback({
+                    "type": "tool_start", 
+                    "tool": call.action,
+                    "input": call.action_input
+                })
+                
+            with tracer.span("tool.execute", tool=call.action):
+                result = await asyncio.wait_for(
+                    self.tools.execute(call.action, call.action_input),
+                    timeout=self.TOOL_TIMEOUT
+                )
+            
+            if step_callback:
+                await step_callback({
+                    "type": "observation", 
+                    "tool": call.action,
+                    "content": str(result)
+                })
+            
+            return f"Resultado da ferramenta '{call.action}': {self.context.compact_tool_result(str(result))}"
+        
+        except asyncio.TimeoutError:
+            error_msg = f"Erro ao executar ferramenta '{call.action}': tempo limite de {self.TOOL_TIMEOUT}s excedido"
+        except Exception as e:
+            error_msg = f"Erro ao executar ferramenta '{call.action}': {str(e)}"
+        
+        if step_callback:
+            await step_callback({"type": "error", "content": error_msg})
+        return error_msg
+    
+    def _build_context(self, original_prompt: str, observations: List[str]) -> str:
+        return self.context.build_context(original_prompt, observations)
     
     def _parse_decision(self, llm_response: str) -> ReactDecision:
         llm_response = llm_response.strip()
@@ -178,5 +391,8 @@ IMPORTANTE: Responda APENAS com o JSON, sem texto adicional antes ou depois.
             data = json.loads(json_str)
         except json.JSONDecodeError as e:
             raise ValueError(f"Falha ao decodificar JSON: {e}")
-            
-        return ReactDecision(**data)
\ No newline at end of file
+        
+        decision = ReactDecision(**data)
+        if decision.action == "PARALLEL" and not decision.actions:
+            raise DecisionFormatError('"PARALLEL" exige uma lista "actions" não vazia com as ferramentas a executar.')
+        return decision
\ No newline at end of file
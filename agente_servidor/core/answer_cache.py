@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import re
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    def __init__(self, encoder: Any, threshold: float = 0.92, ttl: float = 3600.0,
+                 max_entries: int = 2000, bypass_tools: Optional[Iterable[str]] = None,
+                 bypass_patterns: Optional[Iterable[str]] = None):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.bypass_tools = set(bypass_tools or [])
+        self.bypass_patterns = [re.compile(p, re.IGNORECASE) for p in (bypass_patterns or [])]
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stored = 0
+        self.evictions = 0
+
+        # Índice vetorial em memória: uma linha por slot, vetores normalizados (produto interno = cosseno)
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self.max_entries
+        self._expires_at = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self.encoder.encode(text, normalize_embeddings=True)
+        return np.asarray(vector, dtype=np.float32)
+
+    def is_personalized(self, prompt: str) -> bool:
+        return any(p.search(prompt) for p in self.bypass_patterns)
+
+    async def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if self.is_personalized(prompt):
+            self.bypassed += 1
+            return None
+
+        vector = await asyncio.to_thread(self._embed, prompt)
+        now = time.monotonic()
+        self._valid &= self._expires_at > now
+
+        if self._vectors is None or not self._valid.any():
+            self.misses += 1
+            return None
+
+        slots = np.flatnonzero(self._valid)
+        scores = self._vectors[slots] @ vector
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        slot = int(slots[best])
+        self._last_used[slot] = now
+        self.hits += 1
+        entry = self._entries[slot]
+        logger.info(f"Resposta em cache (similaridade {scores[best]:.3f}) para: '{prompt[:70]}'")
+        return {**entry, "similarity": float(scores[best])}
+
+    def is_cacheable_trace(self, trace: List[Dict[str, Any]], mutating_tools: Iterable[str] = ()) -> bool:
+        blocked = self.bypass_tools | set(mutating_tools)
+        for step in trace:
+            if step.get("type") != "tool_start":
+                continue
+            if step.get("tool") in blocked:
+                return False
+            # Qualquer ferramenta chamada com matrícula produz uma resposta específica do estudante
+            if "matricula" in (step.get("input") or {}):
+                return False
+        return True
+
+    async def store(self, prompt: str, answer: str, trace: List[Dict[str, Any]]) -> None:
+        if self.is_personalized(prompt):
+            return
+
+        vector = await asyncio.to_thread(self._embed, prompt)
+        now = time.monotonic()
+        self._valid &= self._expires_at > now
+
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        free = np.flatnonzero(~self._valid)
+        if free.size:
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self._last_used))
+            self.evictions += 1
+
+        self._vectors[slot] = vector
+        self._entries[slot] = {"prompt": prompt, "answer": answer, "trace": trace}
+        self._expires_at[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._valid[slot] = True
+        self.stored += 1
+
+    def clear(self) -> None:
+        self._valid[:] = False
+        self._entries = [None] * self.max_entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": int(np.count_nonzero(self._valid & (self._expires_at > time.monotonic()))),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stored": self.stored,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ContextManager:
+    CHARS_PER_TOKEN = 4
+    TRUNCATION_MARKER = " [...]"
+
+    def __init__(self, tokenizer: Any = None, max_tokens: int = 3000,
+                 observation_max_tokens: int = 600, old_observation_max_tokens: int = 120,
+                 keep_recent_observations: int = 2, rag_top_k: int = 3,
+                 rag_snippet_max_tokens: int = 200):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.observation_max_tokens = observation_max_tokens
+        self.old_observation_max_tokens = old_observation_max_tokens
+        self.keep_recent_observations = keep_recent_observations
+        self.rag_top_k = rag_top_k
+        self.rag_snippet_max_tokens = rag_snippet_max_tokens
+        self._token_counts: Dict[str, int] = {}
+
+    def count_tokens(self, text: str) -> int:
+        if text in self._token_counts:
+            return self._token_counts[text]
+
+        if self.tokenizer is not None:
+            count = len(self.tokenizer.encode(text, add_special_tokens=False))
+        else:
+            count = len(text) // self.CHARS_PER_TOKEN + 1
+
+        if len(self._token_counts) > 4096:
+            self._token_counts.clear()
+        self._token_counts[text] = count
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+
+        # Reserva espaço para o marcador de truncamento
+        keep = max(0, max_tokens - self.count_tokens(self.TRUNCATION_MARKER) - 1)
+        if self.tokenizer is not None:
+            ids = self.tokenizer.encode(text, add_special_tokens=False)[:keep]
+            truncated = self.tokenizer.decode(ids, skip_special_tokens=True)
+        else:
+            truncated = text[:keep * self.CHARS_PER_TOKEN]
+        return truncated.rstrip() + self.TRUNCATION_MARKER
+
+    def compact_tool_result(self, result: str) -> str:
+        rag_output = self._parse_rag_output(result)
+        if rag_output is None:
+            return self.truncate(result, self.observation_max_tokens)
+
+        # Os trechos já chegam ordenados pelo score RRF; mantém apenas os melhores
+        contextos = rag_output.get("contexto_recuperado", [])[:self.rag_top_k]
+        fontes = rag_output.get("fontes", [])[:self.rag_top_k]
+        compacted = {
+            "contexto_recuperado": [self.truncate(c, self.rag_snippet_max_tokens) for c in contextos],
+            "fontes": fontes
+        }
+        return json.dumps(compacted, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def _parse_rag_output(result: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(result)
+            if isinstance(data, str):
+                data = json.loads(data)
+        except (TypeError, ValueError):
+            return None
+
+        if isinstance(data, dict) and isinstance(data.get("contexto_recuperado"), list):
+            return data
+        return None
+
+    def build_context(self, original_prompt: str, observations: List[str]) -> str:
+        if not observations:
+            return original_prompt
+
+        header = f"TAREFA ORIGINAL: {original_prompt}\n\nOBSERVAÇÕES DAS AÇÕES ANTERIORES:\n"
+        # Reserva espaço para a nota de observações omitidas e separadores
+        budget = self.max_tokens - self.count_tokens(header) - self.count_tokens("[000 observações anteriores omitidas]")
+        budget -= len(observations)
+
+        selected: List[str] = []
+        for age, observation in enumerate(reversed(observations)):
+            limit = (self.observation_max_tokens if age < self.keep_recent_observations
+                     else self.old_observation_max_tokens)
+            compacted = self.truncate(observation, min(limit, budget))
+            cost = self.count_tokens(compacted)
+
+            if not compacted or cost > budget:
+                break
+            selected.append(compacted)
+            budget -= cost
+
+        omitted = len(observations) - len(selected)
+        if omitted:
+            logger.info(f"Orçamento de contexto atingido: {omitted} observações antigas omitidas")
+            selected.append(f"[{omitted} observações anteriores omitidas]")
+
+        return header + "\n".join(reversed(selected))
+
+    def fit_history(self, conversation_history: List[Dict[str, str]], context: str) -> List[Dict[str, str]]:
+        budget = self.max_tokens - self.count_tokens(context)
+        fitted: List[Dict[str, str]] = []
+
+        for message in reversed(conversation_history):
+            cost = self.count_tokens(message["content"])
+            if cost > budget:
+                break
+            fitted.append(message)
+            budget -= cost
+
+        # Evita iniciar o histórico com uma observação órfã
+        fitted.reverse()
+        while fitted and fitted[0]["role"] != "assistant":
+            fitted.pop(0)
+        return fitted
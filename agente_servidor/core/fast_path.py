@@ -0,0 +1,104 @@
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FastPathRule:
+    def __init__(self, name: str, tool: str, pattern: str, arguments: Optional[Dict[str, str]] = None,
+                 uppercase: Optional[Iterable[str]] = None):
+        self.name = name
+        self.tool = tool
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        # Mapeia parâmetro da ferramenta -> grupo nomeado do padrão (padrão: mesmo nome)
+        self.arguments = arguments
+        self.uppercase = set(uppercase or [])
+
+    def match(self, prompt: str) -> Optional[Dict[str, Any]]:
+        found = self.pattern.search(prompt)
+        if not found:
+            return None
+        groups = found.groupdict()
+        mapping = self.arguments or {name: name for name in groups}
+        arguments = {param: groups.get(group) for param, group in mapping.items()}
+        if any(value is None for value in arguments.values()):
+            return None
+        return {k: v.upper() if k in self.uppercase else v for k, v in arguments.items()}
+
+class FastPathClassifier:
+    def __init__(self, rules: Optional[List[FastPathRule]] = None, encoder: Any = None,
+                 rag_tool: str = "enriquecer_prompt_com_rag_unb", rag_argument: str = "prompt_usuario",
+                 rag_examples: Optional[List[str]] = None, agent_examples: Optional[List[str]] = None,
+                 rag_patterns: Optional[Iterable[str]] = None, skip_patterns: Optional[Iterable[str]] = None,
+                 threshold: float = 0.6, margin: float = 0.05, max_prompt_chars: int = 200):
+        self.rules = rules or []
+        self.encoder = encoder
+        self.rag_tool = rag_tool
+        self.rag_argument = rag_argument
+        self.rag_patterns = [re.compile(p, re.IGNORECASE) for p in (rag_patterns or [])]
+        self.skip_patterns = [re.compile(p, re.IGNORECASE) for p in (skip_patterns or [])]
+        self.threshold = threshold
+        self.margin = margin
+        self.max_prompt_chars = max_prompt_chars
+
+        self.routed: Dict[str, int] = {}
+        self.passed = 0
+
+        self.rag_examples = list(rag_examples or [])
+        self.agent_examples = list(agent_examples or [])
+        self._rag_vectors: Optional[np.ndarray] = None
+        self._agent_vectors: Optional[np.ndarray] = None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.encoder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def _ensure_examples(self) -> None:
+        if self._rag_vectors is None and self.rag_examples:
+            self._rag_vectors = self._embed(self.rag_examples)
+        if self._agent_vectors is None and self.agent_examples:
+            self._agent_vectors = self._embed(self.agent_examples)
+
+    def _is_retrieval_question(self, prompt: str) -> bool:
+        if any(p.search(prompt) for p in self.rag_patterns):
+            return True
+        if self.encoder is None or not self.rag_examples:
+            return False
+
+        # Perto de um exemplo de pergunta factual e mais perto dele do que de um exemplo de tarefa composta
+        self._ensure_examples()
+        vector = self._embed([prompt])[0]
+        rag_score = float(np.max(self._rag_vectors @ vector))
+        agent_score = float(np.max(self._agent_vectors @ vector)) if self._agent_vectors is not None else 0.0
+        logger.debug(f"Rota rápida: similaridade rag={rag_score:.3f} agente={agent_score:.3f}")
+        return rag_score >= self.threshold and rag_score - agent_score >= self.margin
+
+    def _classify(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if len(prompt) > self.max_prompt_chars:
+            return None
+
+        for rule in self.rules:
+            arguments = rule.match(prompt)
+            if arguments is not None:
+                return {"route": rule.name, "tool": rule.tool, "arguments": arguments}
+
+        if any(p.search(prompt) for p in self.skip_patterns):
+            return None
+        if self._is_retrieval_question(prompt):
+            return {"route": "rag", "tool": self.rag_tool, "arguments": {self.rag_argument: prompt}}
+        return None
+
+    async def classify(self, prompt: str, available_tools: Iterable[str]) -> Optional[Dict[str, Any]]:
+        route = await asyncio.to_thread(self._classify, prompt.strip())
+        if route is None or route["tool"] not in set(available_tools):
+            self.passed += 1
+            return None
+        self.routed[route["route"]] = self.routed.get(route["route"], 0) + 1
+        return route
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {f"routed_{name}": count for name, count in self.routed.items()}
+        stats["routed"] = sum(self.routed.values())
+        stats["passed"] = self.passed
+        return stats
@@ -1,20 +1,64 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-import torch
+from typing import Dict, Any, List, AsyncIterator, Optional
+import asyncio
+import json
+import logging
+import random
+import time
+from core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+IPC_STREAM_LIMIT = 64 * 1024 * 1024
 
 class LLMProvider(ABC):
     @abstractmethod
     async def generate(self, system_prompt: str, user_message: str, 
-                      conversation_history: List[Dict[str, str]] = None) -> str:
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
         pass
     
     @abstractmethod
     def get_model_info(self) -> Dict[str, Any]:
         pass
+    
+    def get_tokenizer(self) -> Any:
+        return None
+    
+    async def close(self) -> None:
+        pass
+    
+    async def warmup(self, system_prompt: str) -> None:
+        # Uma geração curta compila kernels e, quando suportado, preenche o cache do prefixo do system prompt
+        await self.generate(system_prompt, "Olá", max_new_tokens=8)
+    
+    @staticmethod
+    def _build_messages(system_prompt: str, user_message: str,
+                        conversation_history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+class _FirstTokenTimer:
+    # O primeiro processamento de logits ocorre logo após o prefill do prompt
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+    
+    def __call__(self, input_ids, scores):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return scores
 
 class QwenLocalProvider(LLMProvider):
-    def __init__(self, model_name: str = "Qwen/Qwen2.5-7B-Instruct"):
+    def __init__(self, model_name: str = "Qwen/Qwen2.5-7B-Instruct",
+                 speculative: Optional[Dict[str, Any]] = None):
+        from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+        import torch
+        
         quantization_config = BitsAndBytesConfig(
             load_in_4bit=True,
             bnb_4bit_compute_dtype=torch.float16,
@@ -30,33 +74,101 @@ class QwenLocalProvider(LLMProvider):
             trust_remote_code=True
         )
         self.model_name = model_name
-    
-    async def generate(self, system_prompt: str, user_message: str,
-                      conversation_history: List[Dict[str, str]] = None) -> str:
         
-        messages = [{"role": "system", "content": system_prompt}]
+        self.speculative = dict(speculative or {})
+        self.speculative_mode = self.speculative.get("mode") or "off"
+        self.draft_model = None
+        self.spec_stats = {"generated_tokens": 0, "target_forwards": 0, "draft_forwards": 0}
         
-        if conversation_history:
-            messages.extend(conversation_history)
+        if self.speculative_mode == "draft":
+            # O rascunho precisa compartilhar o vocabulário do modelo alvo (família Qwen2.5)
+            draft_name = self.speculative.get("draft_model", "Qwen/Qwen2.5-0.5B-Instruct")
+            self.draft_model = AutoModelForCausalLM.from_pretrained(
+                draft_name,
+                torch_dtype=torch.float16,
+                device_map="auto",
+                trust_remote_code=True
+            )
+            self.draft_model.generation_config.num_assistant_tokens = self.speculative.get("num_assistant_tokens", 5)
+            self.draft_model.register_forward_hook(lambda *_: self._count_forward("draft_forwards"))
+        elif self.speculative_mode not in ("off", "prompt_lookup"):
+            raise ValueError(f"Modo de decodificação especulativa inválido: {self.speculative_mode}")
         
-        messages.append({"role": "user", "content": user_message})
+        if self.speculative_mode != "off":
+            self.model.register_forward_hook(lambda *_: self._count_forward("target_forwards"))
         
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
+        self._lock = asyncio.Lock()
+    
+    def _count_forward(self, counter: str) -> None:
+        self.spec_stats[counter] += 1
+    
+    def _speculative_kwargs(self) -> Dict[str, Any]:
+        if self.speculative_mode == "draft":
+            return {"assistant_model": self.draft_model}
+        if self.speculative_mode == "prompt_lookup":
+            return {"prompt_lookup_num_tokens": self.speculative.get("prompt_lookup_num_tokens", 10)}
+        return {}
+    
+    def get_speculative_stats(self) -> Dict[str, Any]:
+        generated = self.spec_stats["generated_tokens"]
+        target_forwards = self.spec_stats["target_forwards"]
+        draft_forwards = self.spec_stats["draft_forwards"]
+        
+        # Cada passo do modelo alvo produz um token próprio; o excedente veio de candidatos aceitos
+        accepted = max(0, generated - target_forwards)
+        stats = {
+            "mode": self.speculative_mode,
+            "generated_tokens": generated,
+            "target_forwards": target_forwards,
+            "tokens_per_forward": round(generated / target_forwards, 3) if target_forwards else 0.0
+        }
+        if self.speculative_mode == "draft":
+            stats["draft_tokens"] = draft_forwards
+            stats["acceptance_rate"] = round(accepted / draft_forwards, 4) if draft_forwards else 0.0
+        return stats
+    
+    def _generate_sync(self, messages: List[Dict[str, str]], max_new_tokens: Optional[int]) -> str:
+        from transformers import LogitsProcessorList
+        
+        with tracer.span("llm.tokenize"):
+            text = self.tokenizer.apply_chat_template(
+                messages,
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            
+            inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
         
-        inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
+        first_token_timer = _FirstTokenTimer()
+        started = time.perf_counter()
         
         outputs = self.model.generate(
             **inputs,
-            max_new_tokens=512,
+            max_new_tokens=max_new_tokens or 512,
             temperature=0.7,
             top_p=0.9,
-            do_sample=True
+            do_sample=True,
+            logits_processor=LogitsProcessorList([first_token_timer]),
+            **self._speculative_kwargs()
         )
         
+        finished = time.perf_counter()
+        prompt_tokens = inputs['input_ids'].shape[1]
+        completion_tokens = outputs.shape[1] - prompt_tokens
+        first_token_at = first_token_timer.first_token_at or finished
+        decode_s = finished - first_token_at
+        tracer.set_attributes(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            prefill_s=round(first_token_at - started, 4),
+            decode_s=round(decode_s, 4),
+            tokens_per_s=round(completion_tokens / decode_s, 2) if decode_s > 0 else 0.0
+        )
+        
+        if self.speculative_mode != "off":
+            self.spec_stats["generated_tokens"] += outputs.shape[1] - inputs['input_ids'].shape[1]
+            logger.debug(f"Decodificação especulativa: {self.get_speculative_stats()}")
+        
         response = self.tokenizer.decode(
             outputs[0][inputs['input_ids'].shape[1]:],
             skip_special_tokens=True
@@ -64,12 +176,341 @@ class QwenLocalProvider(LLMProvider):
         
         return response.strip()
     
+    async def generate(self, system_prompt: str, user_message: str,
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
+        
+        # model.generate bloqueia por segundos: roda fora do event loop (health/ready e o
+        # servidor de modelo continuam respondendo) e uma geração por vez, como no llama.cpp
+        async with self._lock:
+            return await asyncio.to_thread(self._generate_sync, messages, max_new_tokens)
+    
+    def get_tokenizer(self) -> Any:
+        return self.tokenizer
+    
     def get_model_info(self) -> Dict[str, Any]:
         return {
             "provider": "qwen_local",
             "model": self.model_name,
             "quantization": "int4",
-            "device": str(self.model.device)
+            "device": str(self.model.device),
+            "speculative": self.get_speculative_stats()
+        }
+
+class _LlamaTokenizerAdapter:
+    def __init__(self, llama):
+        self.llama = llama
+    
+    def encode(self, text: str, add_special_tokens: bool = False) -> List[int]:
+        return self.llama.tokenize(text.encode("utf-8"), add_bos=add_special_tokens, special=False)
+    
+    def decode(self, ids: List[int], skip_special_tokens: bool = True) -> str:
+        return self.llama.detokenize(ids).decode("utf-8", errors="ignore")
+
+class LlamaCppProvider(LLMProvider):
+    def __init__(self, model_path: Optional[str] = None, repo_id: Optional[str] = None,
+                 filename: Optional[str] = None, n_ctx: int = 8192, n_threads: Optional[int] = None,
+                 n_batch: int = 512, use_mlock: bool = False, prompt_cache_mb: int = 512,
+                 max_new_tokens: int = 512, temperature: float = 0.7, top_p: float = 0.9):
+        from llama_cpp import Llama, LlamaRAMCache
+        
+        # use_mmap mantém os pesos no page cache do SO, compartilhado entre processos
+        options = dict(n_ctx=n_ctx, n_threads=n_threads, n_batch=n_batch,
+                       use_mmap=True, use_mlock=use_mlock, verbose=False)
+        if model_path:
+            self.llama = Llama(model_path=model_path, **options)
+        elif repo_id and filename:
+            self.llama = Llama.from_pretrained(repo_id=repo_id, filename=filename, **options)
+        else:
+            raise ValueError("LlamaCppProvider requer 'model_path' ou 'repo_id' + 'filename'")
+        
+        if prompt_cache_mb > 0:
+            # Reaproveita o KV cache do prefixo comum (system prompt + ferramentas)
+            self.llama.set_cache(LlamaRAMCache(capacity_bytes=prompt_cache_mb * 1024 * 1024))
+        
+        self.model_name = model_path or f"{repo_id}/{filename}"
+        self.n_threads = self.llama.context_params.n_threads
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.tokenizer = _LlamaTokenizerAdapter(self.llama)
+        self._lock = asyncio.Lock()
+    
+    def _generate_sync(self, messages: List[Dict[str, str]], max_new_tokens: int) -> str:
+        started = time.perf_counter()
+        completion = self.llama.create_chat_completion(
+            messages=messages,
+            max_tokens=max_new_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p
+        )
+        elapsed = time.perf_counter() - started
+        usage = completion.get("usage") or {}
+        if usage:
+            tracer.set_attributes(
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                tokens_per_s=round(usage.get("completion_tokens", 0) / elapsed, 2) if elapsed > 0 else 0.0
+            )
+        return completion["choices"][0]["message"].get("content") or ""
+    
+    async def generate(self, system_prompt: str, user_message: str,
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
+        
+        # O contexto llama.cpp não é thread-safe: uma geração por vez, fora do event loop
+        async with self._lock:
+            response = await asyncio.to_thread(self._generate_sync, messages,
+                                               max_new_tokens or self.max_new_tokens)
+        return response.strip()
+    
+    def get_tokenizer(self) -> Any:
+        return self.tokenizer
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        return {
+            "provider": "llama_cpp",
+            "model": self.model_name,
+            "quantization": "gguf",
+            "device": "cpu",
+            "n_threads": self.n_threads
+        }
+
+class OpenAICompatibleProvider(LLMProvider):
+    RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+    
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None,
+                 timeout: float = 120.0, connect_timeout: float = 5.0, max_retries: int = 3,
+                 max_connections: int = 16, max_new_tokens: int = 512,
+                 temperature: float = 0.7, top_p: float = 0.9, stream: bool = False,
+                 backoff_base: float = 0.5, transport: Any = None):
+        import httpx
+        
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        # transport permite apontar o cliente para um servidor simulado (httpx.MockTransport) nos testes
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            transport=transport
+        )
+        self.base_url = base_url
+        self.model_name = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.stream_responses = stream
+    
+    def _build_payload(self, messages: List[Dict[str, str]], stream: bool,
+                       max_new_tokens: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": max_new_tokens or self.max_new_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stream": stream
+        }
+    
+    async def _backoff(self, attempt: int, reason: str) -> None:
+        delay = min(8.0, self.backoff_base * (2 ** attempt)) + random.uniform(0, 0.1)
+        logger.warning(f"Falha no servidor LLM ({reason}); nova tentativa em {delay:.1f}s")
+        await asyncio.sleep(delay)
+    
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import httpx
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post("/chat/completions", json=payload)
+                if response.status_code in self.RETRYABLE_STATUS and attempt < self.max_retries:
+                    await self._backoff(attempt, f"HTTP {response.status_code}")
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt, str(e) or type(e).__name__)
+        raise RuntimeError("Número máximo de tentativas excedido")
+    
+    async def generate(self, system_prompt: str, user_message: str,
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
+        if self.stream_responses:
+            chunks = [chunk async for chunk in self.stream(system_prompt, user_message,
+                                                           conversation_history, max_new_tokens)]
+            return "".join(chunks).strip()
+        
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
+        data = await self._post(self._build_payload(messages, stream=False, max_new_tokens=max_new_tokens))
+        usage = data.get("usage") or {}
+        if usage:
+            tracer.set_attributes(
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0)
+            )
+        return (data["choices"][0]["message"].get("content") or "").strip()
+    
+    async def stream(self, system_prompt: str, user_message: str,
+                     conversation_history: List[Dict[str, str]] = None,
+                     max_new_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        import httpx
+        
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
+        payload = self._build_payload(messages, stream=True, max_new_tokens=max_new_tokens)
+        
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+                    if response.status_code in self.RETRYABLE_STATUS and attempt < self.max_retries:
+                        await self._backoff(attempt, f"HTTP {response.status_code}")
+                        continue
+                    response.raise_for_status()
+                    
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            return
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            started = True
+                            yield delta
+                    return
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                # Só é seguro repetir se nenhum token já foi entregue
+                if started or attempt >= self.max_retries:
+                    raise
+                await self._backoff(attempt, str(e) or type(e).__name__)
+    
+    async def close(self) -> None:
+        await self.client.aclose()
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        return {
+            "provider": "openai_compatible",
+            "model": self.model_name,
+            "base_url": self.base_url
+        }
+
+class IPCModelProvider(LLMProvider):
+    def __init__(self, socket_path: str, model: Optional[str] = None, tokenizer: Optional[str] = None,
+                 connect_timeout: float = 5.0, request_timeout: float = 300.0):
+        self.socket_path = socket_path
+        self.model_name = model
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.tokenizer = None
+        
+        if tokenizer:
+            # Apenas o tokenizer (leve) é carregado no front-end, para o orçamento de contexto
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+        
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+        self._remote_info: Dict[str, Any] = {}
+    
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        # Devolve o writer lido sob o lock: self._writer pode ser trocado (ou zerado pelo _read_loop)
+        # por outra corrotina assim que o lock é liberado
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path, limit=IPC_STREAM_LIMIT),
+                timeout=self.connect_timeout
+            )
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer))
+            return self._writer
+    
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(RuntimeError(f"Servidor de modelo: {message['error']}"))
+                else:
+                    future.set_result(message.get("result"))
+        except Exception as e:
+            logger.warning(f"Conexão IPC com o servidor de modelo interrompida: {e}")
+        finally:
+            writer.close()
+            # Um loop antigo que termina depois da reconexão não pode derrubar a conexão nova
+            if self._writer is not writer:
+                return
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Conexão com o servidor de modelo perdida"))
+            self._pending.clear()
+    
+    async def _call(self, method: str, params: Dict[str, Any]) -> Any:
+        writer = await self._ensure_connected()
+        
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        
+        payload = json.dumps({"id": request_id, "method": method, "params": params}, ensure_ascii=False)
+        try:
+            # Conexão caiu entre o _ensure_connected e aqui: o _read_loop já falhou os pendentes
+            # e esta requisição ficaria esperando até o request_timeout
+            if writer.is_closing():
+                raise ConnectionError("Conexão com o servidor de modelo perdida")
+            writer.write(payload.encode("utf-8") + b"\n")
+            await writer.drain()
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+    
+    async def generate(self, system_prompt: str, user_message: str,
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
+        return await self._call("generate", {
+            "system_prompt": system_prompt,
+            "user_message": user_message,
+            "conversation_history": conversation_history,
+            "max_new_tokens": max_new_tokens
+        })
+    
+    async def warmup(self, system_prompt: str) -> None:
+        self._remote_info = await self._call("info", {})
+        await super().warmup(system_prompt)
+    
+    def get_tokenizer(self) -> Any:
+        return self.tokenizer
+    
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        return {
+            **self._remote_info,
+            "provider": "ipc",
+            "model": self._remote_info.get("model", self.model_name),
+            "socket": self.socket_path
         }
 
 class GeminiAPIProvider(LLMProvider):
@@ -78,7 +519,8 @@ class GeminiAPIProvider(LLMProvider):
         self.model = model
     
     async def generate(self, system_prompt: str, user_message: str,
-                      conversation_history: List[Dict[str, str]] = None) -> str:
+                      conversation_history: List[Dict[str, str]] = None,
+                      max_new_tokens: Optional[int] = None) -> str:
         raise NotImplementedError("Gemini provider será implementado futuramente")
     
     def get_model_info(self) -> Dict[str, Any]:
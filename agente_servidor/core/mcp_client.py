@@ -1,55 +1,291 @@
 from fastmcp import Client
-from typing import Dict, List
+from fastmcp.exceptions import ToolError
+from typing import Dict, List, Any, Optional, Callable, Awaitable
 from core.tools import ToolRegistry
 from tools.mcp_tool import MCPTool
-import json
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    pass
+
+class MCPServerPool:
+    def __init__(self, name: str, url: str, size: int = 2, call_timeout: float = 20.0,
+                 connect_timeout: float = 10.0, failure_threshold: int = 3,
+                 recovery_timeout: float = 30.0, max_backoff: float = 60.0):
+        self.name = name
+        self.url = url
+        self.size = max(1, size)
+        self.call_timeout = call_timeout
+        self.connect_timeout = connect_timeout
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_backoff = max_backoff
+        self.on_recovered: Optional[Callable[[], Awaitable[None]]] = None
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._clients: List[Client] = []
+        self._reconnect_tasks: set = set()
+        self._rediscovery_task: Optional[asyncio.Task] = None
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._needs_rediscovery = False
+        self._closed = False
+
+    @property
+    def circuit_state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.recovery_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def connected(self) -> int:
+        return len(self._clients)
+
+    async def _open_client(self) -> Client:
+        client = Client(self.url)
+        try:
+            await asyncio.wait_for(client.__aenter__(), timeout=self.connect_timeout)
+            await asyncio.wait_for(client.ping(), timeout=self.connect_timeout)
+        except BaseException:
+            await self._close_client(client)
+            raise
+        return client
+
+    async def _close_client(self, client: Client) -> None:
+        try:
+            await asyncio.wait_for(client.__aexit__(None, None, None), timeout=self.connect_timeout)
+        except BaseException:
+            pass
+
+    async def start(self) -> None:
+        results = await asyncio.gather(
+            *(self._open_client() for _ in range(self.size)),
+            return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+
+        for result in results:
+            if not isinstance(result, BaseException):
+                self._clients.append(result)
+                self._idle.put_nowait(result)
+
+        for _ in errors:
+            self._schedule_reconnect()
+
+        if not self._clients:
+            self._trip()
+            raise ConnectionError(f"Nenhuma sessão MCP aberta para '{self.name}': {errors[0]}")
+
+    def _trip(self) -> None:
+        if self._opened_at is None:
+            logger.warning(f"Circuit breaker ABERTO para servidor MCP '{self.name}'")
+        self._opened_at = time.monotonic()
+        self._needs_rediscovery = True
+
+    def _record_success(self) -> None:
+        self._consecutive_failures = 0
+        if self._opened_at is not None:
+            logger.info(f"Circuit breaker FECHADO para servidor MCP '{self.name}'")
+            self._opened_at = None
+
+    def _record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold or self.circuit_state == "half_open":
+            self._trip()
+
+    def _check_circuit(self) -> None:
+        if self._closed:
+            raise CircuitOpenError(f"Pool MCP '{self.name}' encerrado")
+        if self.circuit_state == "open":
+            raise CircuitOpenError(
+                f"Servidor MCP '{self.name}' indisponível (circuit breaker aberto)"
+            )
+
+    def _schedule_reconnect(self, broken: Optional[Client] = None) -> None:
+        if self._closed:
+            return
+        task = asyncio.create_task(self._reconnect(broken))
+        self._reconnect_tasks.add(task)
+        task.add_done_callback(self._reconnect_tasks.discard)
+
+    async def _reconnect(self, broken: Optional[Client]) -> None:
+        if broken is not None:
+            if broken in self._clients:
+                self._clients.remove(broken)
+            await self._close_client(broken)
+
+        attempt = 0
+        while not self._closed:
+            delay = min(self.max_backoff, 0.5 * (2 ** attempt))
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+            try:
+                client = await self._open_client()
+            except Exception as e:
+                attempt += 1
+                logger.debug(f"Reconexão MCP '{self.name}' falhou (tentativa {attempt}): {e}")
+                continue
+
+            if self._closed:
+                await self._close_client(client)
+                return
+
+            self._clients.append(client)
+            self._idle.put_nowait(client)
+            self._record_success()
+            logger.info(f"Sessão MCP reconectada: {self.name} ({self.connected}/{self.size})")
+
+            if self._needs_rediscovery:
+                self.request_rediscovery()
+            return
+
+    def request_rediscovery(self) -> None:
+        # Chamado após o circuito abrir e a sessão voltar, ou quando a descoberta falhou com o pool
+        # conectado: sem isso as ferramentas do servidor ficariam fora do registro até um novo trip
+        self._needs_rediscovery = True
+        if self._closed or self.on_recovered is None:
+            return
+        if self._rediscovery_task is None or self._rediscovery_task.done():
+            self._rediscovery_task = asyncio.create_task(self._rediscover())
+            self._reconnect_tasks.add(self._rediscovery_task)
+            self._rediscovery_task.add_done_callback(self._reconnect_tasks.discard)
+
+    async def _rediscover(self) -> None:
+        attempt = 0
+        while not self._closed and self._needs_rediscovery:
+            if self.connected and self.circuit_state != "open":
+                self._needs_rediscovery = False
+                try:
+                    await self.on_recovered()
+                    return
+                except Exception as e:
+                    self._needs_rediscovery = True
+                    logger.warning(f"Falha ao redescobrir ferramentas de '{self.name}': {e}")
+            delay = min(self.max_backoff, 0.5 * (2 ** attempt))
+            attempt += 1
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+
+    async def _run(self, operation: Callable[[Client], Awaitable[Any]], timeout: Optional[float]) -> Any:
+        self._check_circuit()
+        deadline = time.monotonic() + (timeout or self.call_timeout)
+
+        try:
+            client = await asyncio.wait_for(self._idle.get(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Nenhuma sessão MCP livre para '{self.name}' dentro do prazo")
+
+        try:
+            result = await asyncio.wait_for(operation(client), timeout=max(0.0, deadline - time.monotonic()))
+        except ToolError:
+            # Erro de negócio da ferramenta: a sessão continua saudável
+            self._idle.put_nowait(client)
+            self._record_success()
+            raise
+        except asyncio.CancelledError:
+            # A resposta da chamada interrompida pode ainda chegar nesta sessão: não volta para a fila
+            self._schedule_reconnect(client)
+            raise
+        except BaseException as e:
+            self._record_failure()
+            self._schedule_reconnect(client)
+            if isinstance(e, asyncio.TimeoutError):
+                raise TimeoutError(f"Chamada MCP para '{self.name}' excedeu o prazo") from e
+            raise
+
+        self._idle.put_nowait(client)
+        self._record_success()
+        return result
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None):
+        return await self._run(lambda client: client.call_tool(tool_name, arguments), timeout)
+
+    async def list_tools(self, timeout: Optional[float] = None):
+        return await self._run(lambda client: client.list_tools(), timeout)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "circuit": self.circuit_state,
+            "consecutive_failures": self._consecutive_failures
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in list(self._reconnect_tasks):
+            task.cancel()
+        await asyncio.gather(*(self._close_client(c) for c in self._clients), return_exceptions=True)
+        self._clients.clear()
 
 class MCPClientManager:
-    def __init__(self):
-        self.clients: Dict[str, Client] = {}
+    def __init__(self, pool_config: Optional[Dict[str, Any]] = None):
+        self.pool_config = pool_config or {}
+        self.pools: Dict[str, MCPServerPool] = {}
         self.servers: Dict[str, str] = {}
-        self.started_clients: Dict[str, Client] = {}
-    
-    async def connect_server(self, name: str, url: str) -> Client:
-        client = Client(url)
-        self.clients[name] = client
+        self.tool_registry: Optional[ToolRegistry] = None
+
+    async def connect_server(self, name: str, url: str, **overrides) -> MCPServerPool:
+        options = {**self.pool_config, **overrides}
+        pool = MCPServerPool(name, url, **options)
+        pool.on_recovered = lambda: self._register_server_tools(name, pool)
+        self.pools[name] = pool
         self.servers[name] = url
-        return client
+        return pool
 
     async def start_all(self):
-        for server_name, client in self.clients.items():
+        async def start(server_name: str, pool: MCPServerPool):
             try:
-                await client.__aenter__()
-                await client.ping()
-                print(f"  ✓ Conexão MCP iniciada: {server_name}")
-                self.started_clients[server_name] = client
+                await pool.start()
+                print(f"  ✓ Conexão MCP iniciada: {server_name} ({pool.connected}/{pool.size} sessões)")
             except Exception as e:
-                print(f"  ✗ Erro ao iniciar {server_name}: {e}")
-        
-        self.clients = self.started_clients
+                print(f"  ✗ Erro ao iniciar {server_name}: {e} (reconexão em segundo plano)")
+
+        await asyncio.gather(*(start(name, pool) for name, pool in self.pools.items()))
+
+    async def _register_server_tools(self, server_name: str, pool: MCPServerPool) -> None:
+        if self.tool_registry is None:
+            return
+
+        tools_response = await pool.list_tools()
+
+        for tool_info in tools_response:
+            annotations = getattr(tool_info, "annotations", None)
+            read_only = bool(annotations and getattr(annotations, "readOnlyHint", False))
+
+            mcp_tool = MCPTool(
+                name=tool_info.name,
+                description=tool_info.description or "Sem descrição",
+                parameters=tool_info.inputSchema,
+                mcp_client=pool,
+                mcp_tool_name=tool_info.name,
+                cacheable=read_only
+            )
+            self.tool_registry.register(mcp_tool)
+            print(f"✓ Ferramenta MCP registrada: {tool_info.name} (servidor: {server_name})")
 
     async def discover_and_register_tools(self, tool_registry: ToolRegistry) -> None:
-        for server_name, client in self.clients.items():
+        self.tool_registry = tool_registry
+
+        for server_name, pool in self.pools.items():
+            if not pool.connected:
+                # As reconexões em segundo plano fazem a descoberta quando a primeira sessão abrir
+                continue
             try:
-                tools_response = await client.list_tools()
-                
-                for tool_info in tools_response:
-                    mcp_tool = MCPTool(
-                        name=tool_info.name,
-                        description=tool_info.description or "Sem descrição",
-                        parameters=tool_info.inputSchema,
-                        mcp_client=client,
-                        mcp_tool_name=tool_info.name
-                    )
-                    tool_registry.register(mcp_tool)
-                    print(f"✓ Ferramenta MCP registrada: {tool_info.name} (servidor: {server_name})")
-                    
+                await self._register_server_tools(server_name, pool)
             except Exception as e:
-                print(f"✗ Erro ao descobrir ferramentas do servidor {server_name}: {e}")
-    
+                print(f"✗ Erro ao descobrir ferramentas do servidor {server_name}: {e} (nova tentativa em segundo plano)")
+                pool.request_rediscovery()
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.get_status() for name, pool in self.pools.items()}
+
     async def close_all(self):
-        for client in self.clients.values():
-            try:
-                await client.__aexit__(None, None, None)
-            except Exception:
-                pass
\ No newline at end of file
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()), return_exceptions=True)
@@ -0,0 +1,37 @@
+from typing import Any, Dict, Optional
+import time
+
+class ReadinessState:
+    STARTING = "starting"
+    WARMING_UP = "warming_up"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.state = self.STARTING
+        self.started_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == self.READY
+
+    def record_step(self, step: str, started: float) -> None:
+        self.steps[step] = round(time.monotonic() - started, 3)
+
+    def set_state(self, state: str, error: Optional[str] = None) -> None:
+        self.state = state
+        self.error = error
+        if state == self.READY:
+            self.ready_at = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.state,
+            "uptime_s": round(time.monotonic() - self.started_at, 3),
+            "startup_s": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "steps_s": self.steps,
+            "error": self.error
+        }
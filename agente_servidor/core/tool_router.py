@@ -0,0 +1,66 @@
+from typing import Any, Iterable, List, Optional, Set
+import asyncio
+import logging
+import numpy as np
+from core.tools import ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+class ToolRouter:
+    def __init__(self, encoder: Any, registry: ToolRegistry, top_k: int = 4,
+                 always_include: Optional[Iterable[str]] = None):
+        self.encoder = encoder
+        self.registry = registry
+        self.top_k = max(1, top_k)
+        self.always_include = list(always_include or [])
+
+        self.selections = 0
+        self.expansions = 0
+
+        self._names: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.encoder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    async def _ensure_index(self) -> None:
+        # Reindexa só quando o catálogo muda (ex.: um servidor MCP reconectou com ferramentas novas)
+        names = list(self.registry.tools)
+        if names == self._names and self._vectors is not None:
+            return
+        async with self._lock:
+            if names == self._names and self._vectors is not None:
+                return
+            texts = [f"{name.replace('_', ' ')}: {self.registry.tools[name].description}" for name in names]
+            self._vectors = await asyncio.to_thread(self._embed, texts) if texts else None
+            self._names = names
+            logger.info(f"Roteador de ferramentas indexou {len(names)} ferramentas")
+
+    async def select(self, query: str, exclude: Optional[Set[str]] = None, k: Optional[int] = None) -> List[str]:
+        k = k or self.top_k
+        exclude = exclude or set()
+        await self._ensure_index()
+
+        forced = [n for n in self.always_include if n in self.registry.tools and n not in exclude]
+        candidates = [i for i, n in enumerate(self._names) if n not in exclude and n not in forced]
+        if len(candidates) <= k or self._vectors is None:
+            chosen = [self._names[i] for i in candidates]
+        else:
+            query_vector = await asyncio.to_thread(self._embed, [query])
+            scores = self._vectors[candidates] @ query_vector[0]
+            top = np.argsort(-scores)[:k]
+            chosen = [self._names[candidates[i]] for i in top]
+
+        self.selections += 1
+        # Ordem do catálogo (e não do score) mantém o bloco de ferramentas estável entre pedidos parecidos
+        selected = set(forced) | set(chosen)
+        return [n for n in self._names if n in selected]
+
+    def get_stats(self) -> dict:
+        return {
+            "indexed_tools": len(self._names),
+            "top_k": self.top_k,
+            "selections": self.selections,
+            "expansions": self.expansions
+        }
@@ -1,12 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import json
+import logging
+import time
+from core.tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 class Tool(ABC):
-    def __init__(self, name: str, description: str, parameters: Dict[str, Any]):
+    def __init__(self, name: str, description: str, parameters: Dict[str, Any],
+                 cacheable: bool = False, cache_ttl: Optional[float] = None):
         self.name = name
         self.description = description
         self.parameters = parameters
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
     
     @abstractmethod
     async def execute(self, **kwargs) -> str:
@@ -22,25 +31,142 @@ class Tool(ABC):
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Tool] = {}
+        # Incrementada quando o catálogo muda; quem monta prompts a partir dele compara para reconstruir
+        self.version = 0
+        self.cache_enabled = False
+        self.cache_default_ttl = 60.0
+        self.cache_max_entries = 1024
+        self.cache_ttl_overrides: Dict[str, float] = {}
+        self.cache_invalidations: Dict[str, List[str]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
     
     def register(self, tool: Tool) -> None:
+        previous = self.tools.get(tool.name)
+        if previous is None or (previous.description, previous.parameters) != (tool.description, tool.parameters):
+            self.version += 1
         self.tools[tool.name] = tool
+        self.invalidate_cache(tool.name)
     
     def get_tool(self, name: str) -> Tool:
         if name not in self.tools:
             raise ValueError(f"Tool '{name}' not found")
         return self.tools[name]
     
-    def get_tools_description(self) -> str:
-        descriptions = []
-        for tool in self.tools.values():
-            desc = f"""
-Ferramenta: {tool.name}
-Descrição: {tool.description}
-Parâmetros (JSON Schema): {json.dumps(tool.parameters, indent=2)}
-"""
-            descriptions.append(desc)
-        return "\n".join(descriptions)
+    def configure_cache(self, enabled: bool = True, default_ttl: float = 60.0,
+                        max_entries: int = 1024, ttl_overrides: Optional[Dict[str, float]] = None,
+                        invalidations: Optional[Dict[str, List[str]]] = None) -> None:
+        self.cache_enabled = enabled
+        self.cache_default_ttl = default_ttl
+        self.cache_max_entries = max_entries
+        self.cache_ttl_overrides = dict(ttl_overrides or {})
+        self.cache_invalidations = {name: list(tools) for name, tools in (invalidations or {}).items()}
+        self._cache.clear()
+    
+    def _get_cache_ttl(self, tool: Tool) -> float:
+        # Somente ferramentas declaradas como somente-leitura são memorizadas;
+        # a configuração apenas ajusta (ou zera) o TTL delas.
+        if not self.cache_enabled or not tool.cacheable:
+            return 0.0
+        if tool.name in self.cache_ttl_overrides:
+            return float(self.cache_ttl_overrides[tool.name] or 0.0)
+        return float(tool.cache_ttl if tool.cache_ttl is not None else self.cache_default_ttl)
+    
+    @staticmethod
+    def _make_cache_key(name: str, arguments: Dict[str, Any]) -> Tuple[str, str]:
+        canonical_args = json.dumps(arguments, sort_keys=True, ensure_ascii=False,
+                                    separators=(",", ":"), default=str)
+        return name, canonical_args
+    
+    async def execute(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> str:
+        tool = self.get_tool(name)
+        arguments = arguments or {}
+        ttl = self._get_cache_ttl(tool)
+        
+        if ttl <= 0:
+            result = await tool.execute(**arguments)
+            if not tool.cacheable and self._cache and not (isinstance(result, str) and result.startswith("Erro")):
+                self._invalidate_after_write(name)
+            return result
+        
+        key = self._make_cache_key(name, arguments)
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        
+        if cached and cached[0] > now:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            tracer.set_attributes(cache="hit")
+            logger.debug(f"Cache hit: {name} {key[1]}")
+            return cached[1]
+        
+        self.cache_misses += 1
+        tracer.set_attributes(cache="miss")
+        result = await tool.execute(**arguments)
+        
+        # Erros não são memorizados para permitir nova tentativa na próxima chamada
+        if isinstance(result, str) and not result.startswith("Erro"):
+            self._cache[key] = (now + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        
+        return result
+    
+    def _invalidate_after_write(self, name: str) -> None:
+        # Ferramenta que altera estado: as leituras memorizadas podem ter ficado desatualizadas.
+        # Sem mapeamento explícito, descarta o cache inteiro (mais seguro que servir dado velho).
+        dependents = self.cache_invalidations.get(name)
+        if dependents is None:
+            self.invalidate_cache()
+        else:
+            for dependent in dependents:
+                self.invalidate_cache(dependent)
+        logger.debug(f"Cache invalidado após '{name}': {dependents or 'todas as ferramentas'}")
+    
+    def invalidate_cache(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._cache.clear()
+            return
+        for key in [k for k in self._cache if k[0] == name]:
+            del self._cache[key]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        total = self.cache_hits + self.cache_misses
+        return {
+            "enabled": self.cache_enabled,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+            "entries": len(self._cache)
+        }
+    
+    @staticmethod
+    def _compact_parameters(schema: Dict[str, Any]) -> str:
+        required = set(schema.get("required", []))
+        parts = []
+        for name, spec in schema.get("properties", {}).items():
+            types = [spec.get("type")] if spec.get("type") else [
+                s.get("type", "?") for s in spec.get("anyOf", []) if s.get("type") != "null"
+            ]
+            part = f"{name}: {'|'.join(types) or 'any'}"
+            if spec.get("type") == "array" and spec.get("items", {}).get("type"):
+                part += f"[{spec['items']['type']}]"
+            if "enum" in spec:
+                part += " (" + "|".join(map(str, spec["enum"])) + ")"
+            parts.append(part if name in required else part + "?")
+        return ", ".join(parts)
+    
+    def get_tools_description(self, names: Optional[Iterable[str]] = None) -> str:
+        # Uma linha por ferramenta: nome(parâmetros) e descrição; "?" marca parâmetro opcional
+        selected = self.tools if names is None else [n for n in names if n in self.tools]
+        lines = []
+        for name in selected:
+            tool = self.tools[name]
+            description = " ".join(tool.description.split())
+            lines.append(f"- {tool.name}({self._compact_parameters(tool.parameters)}): {description}")
+        return "\n".join(lines)
     
     def list_tools(self) -> List[Dict[str, Any]]:
-        return [tool.to_llm_format() for tool in self.tools.values()]
\ No newline at end of file
+        return [tool.to_llm_format() for tool in self.tools.values()]
@@ -0,0 +1,305 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0)
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+class MetricsRegistry:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Optional[Dict[str, Any]]) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None, help: str = "") -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None, help: str = "",
+                buckets: Optional[Tuple[float, ...]] = None) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._help.setdefault(name, help)
+            bounds = self._buckets.setdefault(name, buckets or self.buckets)
+            # [contagens por bucket..., +Inf, soma]
+            series = self._histograms.setdefault(key, [0.0] * (len(bounds) + 2))
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": [[name, [list(p) for p in labels], value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, [list(p) for p in labels], list(series)]
+                               for (name, labels), series in self._histograms.items()],
+                "buckets": {name: list(bounds) for name, bounds in self._buckets.items()},
+                "help": dict(self._help)
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            for name, text in snapshot.get("help", {}).items():
+                self._help.setdefault(name, text)
+            for name, bounds in snapshot.get("buckets", {}).items():
+                self._buckets.setdefault(name, tuple(bounds))
+            for name, labels, value in snapshot.get("counters", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            for name, labels, series in snapshot.get("histograms", []):
+                current = self._histograms.setdefault((name, tuple(tuple(p) for p in labels)), [0.0] * len(series))
+                for i, value in enumerate(series):
+                    current[i] += value
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({k[0] for k in self._counters}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in self._counters.items():
+                    if metric == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+            for name in sorted({k[0] for k in self._histograms}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), series in self._histograms.items():
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self._buckets[name], series):
+                        lines.append(f"{name}_bucket{self._format_labels(labels, (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {series[-2]}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {series[-2]}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {series[-1]}")
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+class SharedMetrics:
+    # Com uvicorn --workers cada processo tem o próprio registro e a coleta cai em um worker qualquer.
+    # Cada worker grava periodicamente um snapshot no diretório; quem atende /metrics soma contadores e
+    # histogramas de todos (inclusive de workers já encerrados, para a soma nunca diminuir) e expõe os
+    # gauges dos workers vivos com o rótulo "worker".
+    def __init__(self, registry: MetricsRegistry, directory: str, interval: float = 5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._gauges = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def prepare(directory: str) -> str:
+        # Chamado pelo processo principal antes de iniciar os workers: descarta snapshots de execuções anteriores
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("metrics_") and name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
+        return directory
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+
+    def write(self, gauges: Optional[Dict[str, float]] = None) -> None:
+        snapshot = self.registry.snapshot()
+        if gauges is None and self._gauges is not None:
+            gauges = self._gauges()
+        snapshot["gauges"] = gauges or {}
+        path = self._path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning(f"Falha ao gravar snapshot de métricas: {e}")
+
+    def start(self, gauges=None) -> None:
+        self._gauges = gauges
+        self.write()
+        threading.Thread(target=self._loop, name="metrics-snapshot", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.write()
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        self.write(gauges)
+        combined = MetricsRegistry(self.registry.buckets)
+        worker_gauges: Dict[str, Dict[str, float]] = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("metrics_") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Snapshot de métricas ignorado ({name}): {e}")
+                continue
+            combined.merge(snapshot)
+            pid = name[len("metrics_"):-len(".json")]
+            if pid.isdigit() and self._alive(int(pid)):
+                worker_gauges[pid] = snapshot.get("gauges", {})
+
+        lines = combined.render_prometheus().splitlines()
+        for gauge in sorted({g for values in worker_gauges.values() for g in values}):
+            lines.append(f"# TYPE {gauge} gauge")
+            for pid, values in worker_gauges.items():
+                if gauge in values:
+                    lines.append(f"{gauge}{MetricsRegistry._format_labels((('worker', pid),))} {values[gauge]}")
+        return "\n".join(lines) + "\n"
+
+class Tracer:
+    def __init__(self):
+        self.enabled = True
+        self.trace_file: Optional[str] = None
+        self.metrics = MetricsRegistry()
+        self._current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+        self._pending: Dict[str, List[Span]] = {}
+        self._file_lock = threading.Lock()
+
+    def configure(self, enabled: bool = True, trace_file: Optional[str] = None) -> None:
+        self.enabled = enabled
+        self.trace_file = trace_file
+        if trace_file:
+            os.makedirs(os.path.dirname(trace_file) or ".", exist_ok=True)
+
+    @property
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def set_attributes(self, **attributes) -> None:
+        span = self._current.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = self._current.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        span = Span(name, trace_id, parent.span_id if parent else None, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end()
+            self._current.reset(token)
+            self._record(span, is_root=parent is None)
+
+    def _record(self, span: Span, is_root: bool) -> None:
+        labels = {"span": span.name}
+        if "tool" in span.attributes:
+            labels["tool"] = span.attributes["tool"]
+        self.metrics.observe("agent_span_duration_seconds", span.duration, labels,
+                             help="Duração de cada etapa do agente")
+        if span.status == "error":
+            self.metrics.inc("agent_span_errors_total", labels=labels, help="Etapas que terminaram em erro")
+
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if kind in span.attributes:
+                self.metrics.inc("agent_llm_tokens_total", span.attributes[kind], {"kind": kind},
+                                 help="Tokens processados pelo LLM")
+        if "tokens_per_s" in span.attributes:
+            self.metrics.observe("agent_llm_decode_tokens_per_second", span.attributes["tokens_per_s"],
+                                 help="Velocidade de decodificação do LLM",
+                                 buckets=TOKENS_PER_SECOND_BUCKETS)
+
+        self._pending.setdefault(span.trace_id, []).append(span)
+        if is_root:
+            self._flush(span.trace_id)
+
+    def _flush(self, trace_id: str) -> None:
+        spans = self._pending.pop(trace_id, [])
+        if not self.trace_file or not spans:
+            return
+        line = json.dumps({"trace_id": trace_id, "spans": [s.to_dict() for s in spans]},
+                          ensure_ascii=False, default=str)
+        try:
+            with self._file_lock, open(self.trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Falha ao gravar trace: {e}")
+
+tracer = Tracer()
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastmcp import FastMCP, Context
 from fastmcp.server.http import create_sse_app
@@ -6,28 +7,58 @@ from contextlib import asynccontextmanager
 import asyncio
 import json
 import uvicorn
-from main import initialize_system
+from main import initialize_system, load_config, collect_runtime_gauges
+from core.admission import AdmissionController, AdmissionRejected
+from core.readiness import ReadinessState
+from core.tracing import tracer
 
 agent_instance = None
 mcp_manager_instance = None
+admission = AdmissionController(**load_config().get("admission", {}))
+readiness = ReadinessState()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def setup_agent():
     global agent_instance, mcp_manager_instance
     print("🚀 Inicializando Sistema (Interface Web)...")
     try:
-        agent_instance, mcp_manager_instance = await initialize_system("config.yaml")
+        agent_instance, mcp_manager_instance = await initialize_system(
+            "config.yaml",
+            readiness=readiness,
+            background_warmup=True
+        )
     except Exception as e:
+        readiness.set_state(ReadinessState.FAILED, str(e))
         print(f"❌ Erro na inicialização: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_task = asyncio.create_task(setup_agent())
     
     yield
     
+    setup_task.cancel()
     print("🔌 Encerrando conexões MCP...")
     if mcp_manager_instance:
         await mcp_manager_instance.close_all()
+    if agent_instance:
+        await agent_instance.llm.close()
 
 app = FastAPI(lifespan=lifespan)
 
+@app.get("/health")
+async def health():
+    return {**readiness.to_dict(), "admission": admission.get_status()}
+
+@app.get("/ready")
+async def ready():
+    status_code = 200 if readiness.is_ready else 503
+    return JSONResponse(readiness.to_dict(), status_code=status_code)
+
+@app.get("/metrics")
+async def metrics():
+    gauges = collect_runtime_gauges(agent_instance, admission)
+    return PlainTextResponse(tracer.metrics.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
 mcp = FastMCP("InterfaceWeb")
 
 @mcp.tool
@@ -35,17 +66,53 @@ async def interagir_com_agente(prompt: str, ctx: Context) -> str:
     global agent_instance
     
     if not agent_instance:
-        return "Erro: Agente não inicializado."
+        return "Erro: Agente ainda está inicializando, tente novamente em instantes."
+
+    agent_task = None
+    client_gone = False
 
     async def on_step(step_data: dict):
+        nonlocal client_gone
         try:
             await ctx.info(json.dumps(step_data))
         except Exception as e:
-            print(f"Erro ao enviar log MCP: {e}")
+            # Falha ao notificar indica que o cliente desconectou sem cancelar a chamada:
+            # interrompe o agente para não segurar a vaga de execução até o fim da resposta
+            print(f"Erro ao enviar log MCP, cancelando a execução: {e}")
+            client_gone = True
+            if agent_task is not None:
+                agent_task.cancel()
+
+    async def on_queue_position(position: int):
+        # Falha ao notificar indica que o cliente desconectou: abandona a fila
+        await ctx.info(json.dumps({"type": "queue", "position": position}))
 
     try:
-        response = await agent_instance.run(prompt, step_callback=on_step)
+        # Respostas em cache não ocupam vaga na fila do modelo
+        cached = await agent_instance.try_cached_answer(prompt, step_callback=on_step)
+        if cached is not None:
+            return cached
+        
+        async def run_agent():
+            # Tarefa própria para poder ser cancelada pelo on_step; o cancelamento da chamada MCP
+            # (notifications/cancelled ou queda da sessão SSE) também chega a ela através do await
+            nonlocal agent_task
+            agent_task = asyncio.create_task(
+                agent_instance.run(prompt, step_callback=on_step, check_cache=False)
+            )
+            return await agent_task
+
+        response = await admission.run(run_agent, on_position=on_queue_position)
         return response
+    except asyncio.CancelledError:
+        # Só absorve o cancelamento feito pelo on_step; o da própria chamada MCP segue adiante
+        if not client_gone or asyncio.current_task().cancelling():
+            raise
+        return "Execução cancelada: cliente desconectado."
+    except AdmissionRejected:
+        return "Servidor ocupado no momento. Tente novamente em instantes."
+    except asyncio.TimeoutError:
+        return "Tempo limite excedido. Tente novamente em instantes."
     except Exception as e:
         return f"Erro fatal no agente: {str(e)}"
 
@@ -2,25 +2,116 @@ import asyncio
 import yaml
 import logging
 import os
+import threading
+import time
+from typing import Optional
 from core.tools import ToolRegistry
 from core.mcp_client import MCPClientManager
-from core.llm_provider import QwenLocalProvider
+from core.llm_provider import QwenLocalProvider, LlamaCppProvider, OpenAICompatibleProvider, IPCModelProvider
 from core.agent import ReactAgent
+from core.context import ContextManager
+from core.answer_cache import SemanticAnswerCache
+from core.tool_router import ToolRouter
+from core.fast_path import FastPathClassifier, FastPathRule
+from core.readiness import ReadinessState
+from core.tracing import tracer
 
-async def initialize_system(config_path: str = "config.yaml"):
+_background_tasks = set()
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def load_config(config_path: str = "config.yaml") -> dict:
     with open(config_path) as f:
-        config = yaml.safe_load(f)
-    
-    tool_registry = ToolRegistry()
-    
+        return yaml.safe_load(f)
+
+def create_llm_provider(llm_config: dict):
+    if llm_config.get("provider") == "qwen_local":
+        llm_provider = QwenLocalProvider(
+            model_name=llm_config.get("model"),
+            speculative=llm_config.get("speculative")
+        )
+        print(f"  ✓ Qwen Local carregado: {llm_config.get('model')}")
+    elif llm_config.get("provider") == "llama_cpp":
+        llm_provider = LlamaCppProvider(**llm_config.get("llama_cpp", {}))
+        print(f"  ✓ Modelo GGUF carregado (CPU): {llm_provider.model_name}")
+    elif llm_config.get("provider") == "openai_compatible":
+        remote_config = dict(llm_config.get("openai_compatible", {}))
+        remote_config.setdefault("api_key", os.environ.get("LLM_API_KEY"))
+        llm_provider = OpenAICompatibleProvider(model=llm_config.get("model"), **remote_config)
+        print(f"  ✓ Servidor LLM remoto configurado: {remote_config.get('base_url')}")
+    elif llm_config.get("provider") == "ipc":
+        llm_provider = IPCModelProvider(model=llm_config.get("model"), **llm_config.get("ipc", {}))
+        print(f"  ✓ Processo de modelo compartilhado: {llm_provider.socket_path}")
+    else:
+        raise ValueError(f"Provider não suportado: {llm_config.get('provider')}")
+    return llm_provider
+
+def load_encoder(model_name: str):
+    # Cache de respostas e roteador de ferramentas compartilham o mesmo encoder quando usam o mesmo modelo
+    with _encoders_lock:
+        if model_name not in _encoders:
+            from sentence_transformers import SentenceTransformer
+            
+            # Encoder pequeno em CPU: a busca precisa custar milissegundos, não competir com o LLM pela GPU
+            _encoders[model_name] = SentenceTransformer(model_name, device="cpu")
+        return _encoders[model_name]
+
+def create_answer_cache(cache_config: dict) -> SemanticAnswerCache:
+    encoder = load_encoder(cache_config.get("model", "paraphrase-multilingual-mpnet-base-v2"))
+    print(f"  ✓ Cache semântico de respostas: limiar {cache_config.get('threshold', 0.92)}")
+    return SemanticAnswerCache(
+        encoder,
+        threshold=cache_config.get("threshold", 0.92),
+        ttl=cache_config.get("ttl", 3600),
+        max_entries=cache_config.get("max_entries", 2000),
+        bypass_tools=cache_config.get("bypass_tools", []),
+        bypass_patterns=cache_config.get("bypass_patterns", [])
+    )
+
+def create_tool_router(router_config: dict, tool_registry: ToolRegistry) -> ToolRouter:
+    encoder = load_encoder(router_config.get("model", "paraphrase-multilingual-mpnet-base-v2"))
+    print(f"  ✓ Roteador de ferramentas: top {router_config.get('top_k', 4)} por pedido")
+    return ToolRouter(
+        encoder,
+        tool_registry,
+        top_k=router_config.get("top_k", 4),
+        always_include=router_config.get("always_include", [])
+    )
+
+def create_fast_path(fast_path_config: dict) -> FastPathClassifier:
+    rules = [FastPathRule(**rule) for rule in fast_path_config.get("rules", [])]
+    encoder = None
+    if fast_path_config.get("rag_examples"):
+        encoder = load_encoder(fast_path_config.get("model", "paraphrase-multilingual-mpnet-base-v2"))
+    classifier = FastPathClassifier(
+        rules=rules,
+        encoder=encoder,
+        rag_tool=fast_path_config.get("rag_tool", "enriquecer_prompt_com_rag_unb"),
+        rag_argument=fast_path_config.get("rag_argument", "prompt_usuario"),
+        rag_examples=fast_path_config.get("rag_examples", []),
+        agent_examples=fast_path_config.get("agent_examples", []),
+        rag_patterns=fast_path_config.get("rag_patterns", []),
+        skip_patterns=fast_path_config.get("skip_patterns", []),
+        threshold=fast_path_config.get("threshold", 0.6),
+        margin=fast_path_config.get("margin", 0.05),
+        max_prompt_chars=fast_path_config.get("max_prompt_chars", 200)
+    )
+    if encoder is not None:
+        # Embeddings dos exemplos calculados na inicialização, fora do caminho do primeiro pedido
+        classifier._ensure_examples()
+    print(f"  ✓ Rota rápida: {len(rules)} regras, exemplos {'ativos' if encoder else 'desativados'}")
+    return classifier
+
+async def connect_mcp_servers(config: dict, tool_registry: ToolRegistry) -> MCPClientManager:
     print("\n🌐 Configurando conexões MCP...")
-    mcp_manager = MCPClientManager()
+    mcp_manager = MCPClientManager(pool_config=config.get("mcp_pool", {}))
     
     for server_config in config.get("mcp_servers", []):
         try:
             await mcp_manager.connect_server(
                 name=server_config["name"],
-                url=server_config["url"]
+                url=server_config["url"],
+                **server_config.get("pool", {})
             )
             print(f"  • Servidor configurado: {server_config['name']}")
         except Exception as e:
@@ -31,24 +122,151 @@ async def initialize_system(config_path: str = "config.yaml"):
     
     print("\n🔍 Descobrindo ferramentas MCP...")
     await mcp_manager.discover_and_register_tools(tool_registry)
+    return mcp_manager
+
+async def warmup_agent(agent: ReactAgent, readiness: Optional[ReadinessState] = None):
+    started = time.monotonic()
+    if readiness:
+        readiness.set_state(ReadinessState.WARMING_UP)
+    try:
+        await agent.llm.warmup(agent.system_prompt)
+        print(f"  ✓ Aquecimento concluído em {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Falha no aquecimento do modelo: {e}")
+    if readiness:
+        readiness.record_step("warmup", started)
+        readiness.set_state(ReadinessState.READY)
+
+def collect_runtime_gauges(agent: Optional[ReactAgent], admission=None) -> dict:
+    gauges = {}
+    if agent is not None:
+        for key, value in agent.tools.get_cache_stats().items():
+            if key != "enabled":
+                gauges[f"agent_tool_cache_{key}"] = value
+    if agent is not None and agent.answer_cache is not None:
+        for key, value in agent.answer_cache.get_stats().items():
+            gauges[f"agent_answer_cache_{key}"] = value
+    if agent is not None and agent.tool_router is not None:
+        for key, value in agent.tool_router.get_stats().items():
+            gauges[f"agent_tool_router_{key}"] = value
+    if agent is not None and agent.fast_path is not None:
+        for key, value in agent.fast_path.get_stats().items():
+            gauges[f"agent_fast_path_{key}"] = value
+    if admission is not None:
+        for key, value in admission.get_status().items():
+            gauges[f"agent_admission_{key}"] = value
+    return gauges
+
+async def initialize_system(config_path: str = "config.yaml", readiness: Optional[ReadinessState] = None,
+                            background_warmup: bool = False):
+    config = load_config(config_path)
+    
+    tracing_config = config.get("tracing", {})
+    tracer.configure(
+        enabled=tracing_config.get("enabled", True),
+        trace_file=tracing_config.get("trace_file")
+    )
+    
+    tool_registry = ToolRegistry()
     
-    print("\n🤖 Inicializando LLM Provider...")
+    cache_config = config.get("tool_cache", {})
+    if cache_config.get("enabled", False):
+        tool_registry.configure_cache(
+            default_ttl=cache_config.get("default_ttl", 60),
+            max_entries=cache_config.get("max_entries", 1024),
+            ttl_overrides=cache_config.get("tools", {}),
+            invalidations=cache_config.get("invalidates", {})
+        )
+    
+    print("\n🤖 Inicializando LLM Provider (em paralelo com as conexões MCP)...")
     llm_config = config.get("llm", {})
+    started = time.monotonic()
     
-    if llm_config.get("provider") == "qwen_local":
-        llm_provider = QwenLocalProvider(model_name=llm_config.get("model"))
-        print(f"  ✓ Qwen Local carregado: {llm_config.get('model')}")
-    else:
-        raise ValueError(f"Provider não suportado: {llm_config.get('provider')}")
+    # O carregamento do modelo é bloqueante: roda em uma thread enquanto o event loop
+    # abre as sessões MCP e descobre as ferramentas
+    llm_task = asyncio.create_task(asyncio.to_thread(create_llm_provider, llm_config))
+    answer_cache_config = config.get("answer_cache", {})
+    cache_task = None
+    if answer_cache_config.get("enabled", False):
+        cache_task = asyncio.create_task(asyncio.to_thread(create_answer_cache, answer_cache_config))
+    router_config = config.get("tool_router", {})
+    router_task = None
+    if router_config.get("enabled", False):
+        router_task = asyncio.create_task(asyncio.to_thread(create_tool_router, router_config, tool_registry))
+    fast_path_config = config.get("fast_path", {})
+    fast_path_task = None
+    if fast_path_config.get("enabled", False):
+        fast_path_task = asyncio.create_task(asyncio.to_thread(create_fast_path, fast_path_config))
+    side_tasks = [task for task in (cache_task, router_task, fast_path_task) if task]
+    try:
+        mcp_manager = await connect_mcp_servers(config, tool_registry)
+    except BaseException:
+        llm_task.cancel()
+        for task in side_tasks:
+            task.cancel()
+        raise
+    if readiness:
+        readiness.record_step("mcp", started)
     
-    print("\n🎯 Criando agente REACT...")
-    agent = ReactAgent(llm_provider, tool_registry)
-    agent.MAX_ITERATIONS = config.get("agent", {}).get("max_iterations", 10)
-    print("  ✓ Agente pronto!")
+    # Daqui em diante as sessões MCP já estão abertas: qualquer falha (ex.: o modelo não carrega
+    # por falta de memória) precisa fechá-las, pois o chamador só recebe o manager no retorno
+    llm_provider = None
+    try:
+        llm_provider = await llm_task
+        if readiness:
+            readiness.record_step("llm", started)
     
-    print(f"\n✅ Sistema inicializado com sucesso!")
-    print(f"   Ferramentas disponíveis: {len(tool_registry.tools)}")
-    print(f"   Modelo LLM: {llm_provider.get_model_info()['model']}")
+        print("\n🎯 Criando agente REACT...")
+        context_manager = ContextManager(
+            tokenizer=llm_provider.get_tokenizer(),
+            **config.get("context", {})
+        )
+        answer_cache = None
+        if cache_task:
+            try:
+                answer_cache = await cache_task
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Cache semântico desativado: {e}")
+        tool_router = None
+        if router_task:
+            try:
+                tool_router = await router_task
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Roteador de ferramentas desativado: {e}")
+        fast_path = None
+        if fast_path_task:
+            try:
+                fast_path = await fast_path_task
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Rota rápida desativada: {e}")
+        agent = ReactAgent(llm_provider, tool_registry, context_manager, answer_cache, tool_router, fast_path)
+        agent.MAX_ITERATIONS = config.get("agent", {}).get("max_iterations", 10)
+        agent.TOOL_TIMEOUT = config.get("agent", {}).get("tool_timeout", 30.0)
+        print("  ✓ Agente pronto!")
+    
+        print(f"\n✅ Sistema inicializado com sucesso!")
+        print(f"   Ferramentas disponíveis: {len(tool_registry.tools)}")
+        print(f"   Modelo LLM: {llm_provider.get_model_info()['model']}")
+    
+    except BaseException:
+        llm_task.cancel()
+        for task in side_tasks:
+            task.cancel()
+        if llm_provider is not None:
+            await llm_provider.close()
+        await mcp_manager.close_all()
+        raise
+    
+    if config.get("agent", {}).get("warmup", False):
+        print("\n🔥 Aquecendo o modelo...")
+        if background_warmup:
+            warmup_task = asyncio.create_task(warmup_agent(agent, readiness))
+            _background_tasks.add(warmup_task)
+            warmup_task.add_done_callback(_background_tasks.discard)
+        else:
+            await warmup_agent(agent, readiness)
+    elif readiness:
+        readiness.set_state(ReadinessState.READY)
     
     return agent, mcp_manager
 
@@ -122,6 +340,16 @@ async def main():
         traceback.print_exc()
     
     finally:
+        if agent:
+            root_logger.info(f"Cache de ferramentas: {agent.tools.get_cache_stats()}")
+            if agent.answer_cache:
+                root_logger.info(f"Cache de respostas: {agent.answer_cache.get_stats()}")
+            if agent.tool_router:
+                root_logger.info(f"Roteador de ferramentas: {agent.tool_router.get_stats()}")
+            if agent.fast_path:
+                root_logger.info(f"Rota rápida: {agent.fast_path.get_stats()}")
+            await agent.llm.close()
+        
         if mcp_manager:
             print("\n🔌 Fechando conexões MCP...")
             await mcp_manager.close_all()
@@ -0,0 +1,89 @@
+import argparse
+import random
+import time
+
+try:
+    from mcp_servers.storage import UnbDatabase, DEFAULT_DB_PATH
+except ImportError:  # executado como script: python mcp_servers/generate_data.py
+    from storage import UnbDatabase, DEFAULT_DB_PATH
+
+DEPARTAMENTOS = ["CIC", "MAT", "FIS", "EST", "ENE", "ADM", "ECO", "LET", "HIS", "QUI", "BIO", "DIR"]
+DIAS = ["Segunda e Quarta", "Terça e Quinta", "Quarta e Sexta", "Sábado"]
+HORAS = ["08:00-10:00", "10:00-12:00", "14:00-16:00", "16:00-18:00", "19:00-21:00"]
+PREFIXOS = ["Introdução a", "Fundamentos de", "Tópicos em", "Laboratório de", "Métodos de", "Teoria de"]
+ASSUNTOS = ["Algoritmos", "Cálculo", "Estatística", "Redes", "Compiladores", "Álgebra Linear",
+            "Sistemas Operacionais", "Bancos de Dados", "Física Experimental", "Economia Política",
+            "Direito Constitucional", "Química Orgânica", "Genética", "História do Brasil", "Linguística"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João",
+         "Larissa", "Marcelo", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Tiago", "Vanessa", "Yuri"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Ferreira", "Almeida", "Gomes"]
+
+def generate_courses(rng: random.Random, n: int):
+    codes = [f"{DEPARTAMENTOS[i % len(DEPARTAMENTOS)]}{1000 + i // len(DEPARTAMENTOS):04d}" for i in range(n)]
+    courses, prereqs = [], []
+    for i, code in enumerate(codes):
+        nome = f"{rng.choice(PREFIXOS)} {rng.choice(ASSUNTOS)} {i // len(ASSUNTOS) + 1}"
+        professor = f"Prof. {rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        courses.append((code, nome, f"{rng.choice(DIAS)}, {rng.choice(HORAS)}", professor,
+                        f"PAT - AT-{rng.randint(1, 300):03d}"))
+        # Requisitos apenas entre disciplinas anteriores: o grafo gerado é acíclico
+        if i > 10:
+            for req in rng.sample(codes[max(0, i - 200):i], k=rng.choice([0, 0, 1, 1, 2, 3])):
+                prereqs.append((code, req))
+    return codes, courses, prereqs
+
+def generate_books(rng: random.Random, n: int):
+    for i in range(n):
+        copias = rng.randint(1, 5)
+        titulo = f"{rng.choice(PREFIXOS)} {rng.choice(ASSUNTOS)}: volume {rng.randint(1, 12)}, edição {rng.randint(1, 9)}"
+        autor = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        yield (f"LIV{i + 1:07d}", titulo, autor, copias, rng.randint(0, copias))
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera catálogo e base de estudantes para o servidor de ferramentas")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--courses", type=int, default=5_000)
+    parser.add_argument("--history-size", type=int, default=12, help="Disciplinas por histórico")
+    parser.add_argument("--days", type=int, default=365, help="Dias de cardápio do RU")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db = UnbDatabase(args.db)
+    started = time.perf_counter()
+
+    with db.bulk_load():
+        codes, courses, prereqs = generate_courses(rng, args.courses)
+        db.load("disciplinas", ["codigo", "nome", "horario", "professor", "sala"], courses)
+        db.load("requisitos", ["codigo", "requisito"], prereqs)
+        print(f"  ✓ {len(courses)} disciplinas, {len(prereqs)} requisitos")
+
+        db.load("livros", ["id", "titulo", "autor", "copias", "disponiveis"], generate_books(rng, args.books))
+        print(f"  ✓ {args.books} livros")
+
+        matriculas = [f"{2015 + i % 10}{i:06d}" for i in range(args.students)]
+        db.load("usuarios_ru", ["matricula", "saldo", "tipo"],
+                ((m, round(rng.uniform(0, 80), 2), rng.choice(["subsidiado", "integral"])) for m in matriculas))
+        multas = {m for m in matriculas if rng.random() < 0.05}
+        db.load("situacao_biblioteca", ["matricula", "multas", "valor_multa"],
+                ((m, int(m in multas), round(rng.uniform(1, 40), 2) if m in multas else None) for m in matriculas))
+        db.load("emprestimos", ["matricula", "id_livro"],
+                ((m, f"LIV{rng.randint(1, max(1, args.books)):07d}") for m in matriculas if rng.random() < 0.3))
+        db.load("historico", ["matricula", "cra"], ((m, round(rng.uniform(1.5, 5.0), 2)) for m in matriculas))
+        db.load("historico_disciplinas", ["matricula", "codigo", "situacao"],
+                ((m, c, "aprovado" if rng.random() < 0.9 else "reprovado")
+                 for m in matriculas for c in rng.sample(codes, k=min(args.history_size, len(codes)))))
+        print(f"  ✓ {args.students} estudantes")
+
+        start_day = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+        db.load("cardapio_ru", ["data", "almoco", "jantar", "vegetariano"],
+                ((time.strftime("%Y-%m-%d", time.localtime(start_day + d * 86400)),
+                  f"Prato {rng.randint(1, 40)}", f"Prato {rng.randint(1, 40)}", f"Vegetariano {rng.randint(1, 20)}")
+                 for d in range(args.days)))
+
+    print(f"✅ Banco gerado em {args.db} ({time.perf_counter() - started:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from collections import defaultdict, deque
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class PrerequisiteCycleError(ValueError):
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__(f"Ciclo de pré-requisitos: {' -> '.join(cycle)}")
+
+class PrerequisiteGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.direct: Dict[str, Set[str]] = defaultdict(set)
+        self.dependents: Dict[str, Set[str]] = defaultdict(set)
+        self.closure: Dict[str, FrozenSet[str]] = {}
+        self._order: Dict[str, int] = {}
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[str, str]]) -> "PrerequisiteGraph":
+        graph = cls()
+        for course, requirement in pairs:
+            graph.direct[course].add(requirement)
+            graph.dependents[requirement].add(course)
+        graph._rebuild()
+        return graph
+
+    def _find_cycle(self, nodes: Set[str]) -> List[str]:
+        # Os nós que sobraram do Kahn pertencem a um ciclo ou dependem de um: segue arestas até repetir
+        start = next(iter(nodes))
+        path, seen = [], {}
+        node = start
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(r for r in self.direct[node] if r in nodes)
+        return path[seen[node]:] + [node]
+
+    def _topological_order(self) -> List[str]:
+        nodes = set(self.direct) | set(self.dependents)
+        pending = {n: len(self.direct.get(n, ())) for n in nodes}
+        queue = deque(sorted(n for n, count in pending.items() if count == 0))
+        order = []
+
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for dependent in sorted(self.dependents.get(node, ())):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    queue.append(dependent)
+
+        if len(order) != len(nodes):
+            raise PrerequisiteCycleError(self._find_cycle(nodes - set(order)))
+        return order
+
+    def _rebuild(self) -> None:
+        order = self._topological_order()
+        closure: Dict[str, FrozenSet[str]] = {}
+        # Em ordem topológica os requisitos já têm o fecho calculado quando a disciplina é visitada
+        for node in order:
+            reqs = self.direct.get(node, ())
+            closure[node] = frozenset(reqs).union(*(closure[r] for r in reqs))
+        self.closure = closure
+        self._order = {node: i for i, node in enumerate(order)}
+
+    def all_requirements(self, course: str) -> List[str]:
+        return sorted(self.closure.get(course, ()), key=lambda c: self._order.get(c, 0))
+
+    def direct_requirements(self, course: str) -> List[str]:
+        return sorted(self.direct.get(course, ()))
+
+    def _requirement_path(self, start: str, target: str) -> List[str]:
+        # Segue requisitos diretos de start até target, só por nós cujo fecho ainda alcança target
+        path = [start]
+        while path[-1] != target:
+            path.append(next(r for r in sorted(self.direct[path[-1]])
+                             if r == target or target in self.closure.get(r, ())))
+        return path
+
+    def add_requirement(self, course: str, requirement: str, persist: Optional[Callable[[], None]] = None) -> None:
+        # persist grava no banco dentro do lock: se falhar, o grafo em memória não é alterado
+        with self._lock:
+            if course == requirement:
+                raise PrerequisiteCycleError([course, course])
+            if course in self.closure.get(requirement, ()):
+                raise PrerequisiteCycleError(self._requirement_path(requirement, course) + [requirement])
+            if requirement in self.direct.get(course, ()):
+                return
+            if persist:
+                persist()
+
+            self.direct[course].add(requirement)
+            self.dependents[requirement].add(course)
+
+            # Atualização incremental: só a disciplina e quem depende dela (direta ou indiretamente) ganham requisitos
+            added = {requirement} | self.closure.get(requirement, frozenset())
+            affected = [course] + [c for c, reqs in self.closure.items() if course in reqs]
+            for node in affected:
+                self.closure[node] = self.closure.get(node, frozenset()) | added
+            self.closure.setdefault(requirement, frozenset())
+
+            # Mantém a ordem usada na listagem coerente; só reordena o grafo quando um nó é novo
+            # ou quando a nova aresta contradiz a ordem atual
+            if (course not in self._order or requirement not in self._order
+                    or self._order[requirement] >= self._order[course]):
+                self._order = {node: i for i, node in enumerate(self._topological_order())}
+
+    def remove_requirement(self, course: str, requirement: str, persist: Optional[Callable[[], None]] = None) -> None:
+        with self._lock:
+            if requirement not in self.direct.get(course, ()):
+                return
+            if persist:
+                persist()
+            self.direct[course].discard(requirement)
+            self.dependents[requirement].discard(course)
+
+            # Remoção pode encolher o fecho de vários nós: recalcula apenas o subgrafo afetado
+            affected = {course} | {c for c, reqs in self.closure.items() if course in reqs}
+            for node in sorted(affected, key=lambda c: self._order.get(c, 0)):
+                reqs = self.direct.get(node, ())
+                self.closure[node] = frozenset(reqs).union(*(self.closure.get(r, frozenset()) for r in reqs))
+
+    def missing_requirements(self, course: str, approved: Set[str]) -> List[str]:
+        return [c for c in self.all_requirements(course) if c not in approved]
+
+    def is_eligible(self, course: str, approved: Set[str]) -> bool:
+        # Usa o fecho, como missing_requirements: um histórico com requisito indireto faltando não é elegível
+        return course not in approved and self.closure.get(course, frozenset()) <= approved
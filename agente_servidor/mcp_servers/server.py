@@ -1,5 +1,12 @@
 from fastmcp import FastMCP
 
+try:
+    from mcp_servers.storage import UnbDatabase
+    from mcp_servers.prerequisites import PrerequisiteGraph, PrerequisiteCycleError
+except ImportError:  # executado como script: python mcp_servers/server.py
+    from storage import UnbDatabase
+    from prerequisites import PrerequisiteGraph, PrerequisiteCycleError
+
 HORARIOS_MOCK = {
     "CIC0004": {
         "codigo": "CIC0004",
@@ -62,84 +69,175 @@ REQUISITOS_DISCIPLINAS = {
     "MAT0026": ["MAT0025"]
 }
 
+def seed_database(db: UnbDatabase) -> None:
+    db.load("disciplinas", ["codigo", "nome", "horario", "professor", "sala"],
+            [(d["codigo"], d["nome"], d["horario"], d["professor"], d["sala"]) for d in HORARIOS_MOCK.values()])
+    db.load("requisitos", ["codigo", "requisito"],
+            [(codigo, req) for codigo, reqs in REQUISITOS_DISCIPLINAS.items() for req in reqs])
+    db.load("cardapio_ru", ["data", "almoco", "jantar", "vegetariano"],
+            [(data, c["almoco"], c["jantar"], c["vegetariano"]) for data, c in CARDAPIO_RU.items()])
+    db.load("usuarios_ru", ["matricula", "saldo", "tipo"],
+            [(m, u["saldo"], u["tipo"]) for m, u in USUARIOS_RU.items()])
+    db.load("livros", ["id", "titulo", "autor", "copias", "disponiveis"],
+            [(i, l["titulo"], l["autor"], l["copias"], l["disponiveis"]) for i, l in LIVROS_BIBLIOTECA.items()])
+    db.load("situacao_biblioteca", ["matricula", "multas", "valor_multa"],
+            [(m, int(s["multas"]), s.get("valor_multa")) for m, s in SITUACAO_BIBLIOTECA.items()])
+    db.load("emprestimos", ["matricula", "id_livro"],
+            [(m, l) for m, s in SITUACAO_BIBLIOTECA.items() for l in s["livros_emprestados"]])
+    db.load("historico", ["matricula", "cra"], [(m, h["cra"]) for m, h in HISTORICO_ACADEMICO.items()])
+    db.load("historico_disciplinas", ["matricula", "codigo", "situacao"],
+            [(m, c, "aprovado") for m, h in HISTORICO_ACADEMICO.items() for c in h["cursadas"]] +
+            [(m, c, "reprovado") for m, h in HISTORICO_ACADEMICO.items() for c in h["reprovadas"]])
+
+# Os dicionários acima são apenas a carga inicial de um banco vazio;
+# catálogos grandes são gerados com mcp_servers/generate_data.py
+db = UnbDatabase()
+if db.is_empty():
+    seed_database(db)
+
+# Fecho transitivo calculado na carga (falha na inicialização se houver ciclo) e mantido
+# incrementalmente pelas ferramentas de cadastro, que gravam no banco e no grafo juntos
+prerequisitos = PrerequisiteGraph.from_pairs(db.all_requisitos())
+
+def _disciplina_existe(codigo: str) -> bool:
+    return codigo in prerequisitos.closure or db.get_disciplina(codigo) is not None
+
+CREDITOS_PASSADOS = 100
+
+def _projetar_cra(cra_atual: float, media_esperada: float, creditos_futuros: int) -> float:
+    novo_cra = ((cra_atual * CREDITOS_PASSADOS) + (media_esperada * creditos_futuros)) / (CREDITOS_PASSADOS + creditos_futuros)
+    return round(novo_cra, 2)
+
 mcp = FastMCP("ferramentas-complexas-unb")
 
-@mcp.tool
+READ_ONLY = {"readOnlyHint": True}
+
+@mcp.tool(annotations=READ_ONLY)
 def consultar_horario(codigo: str) -> dict:
-    return HORARIOS_MOCK.get(codigo.upper(), {"erro": "Disciplina não encontrada"})
+    return db.get_disciplina(codigo.upper()) or {"erro": "Disciplina não encontrada"}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def consultar_cardapio_ru(data: str) -> dict:
-    return CARDAPIO_RU.get(data, {"erro": "Cardápio não disponível para esta data"})
+    return db.get_cardapio(data) or {"erro": "Cardápio não disponível para esta data"}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def verificar_saldo_usuario(matricula: str) -> dict:
-    return USUARIOS_RU.get(matricula, {"erro": "Usuário não encontrado"})
+    return db.get_usuario_ru(matricula) or {"erro": "Usuário não encontrado"}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def calcular_custo_refeicao(tipo_usuario: str) -> float:
     if tipo_usuario.lower() == "subsidiado":
         return 2.50
     return 15.00
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def buscar_livro_por_titulo(termo: str) -> list:
-    resultados = []
-    termo = termo.lower()
-    for id_livro, dados in LIVROS_BIBLIOTECA.items():
-        if termo in dados["titulo"].lower():
-            r = dados.copy()
-            r["id"] = id_livro
-            resultados.append(r)
-    return resultados
-
-@mcp.tool
+    return db.buscar_livros(termo)
+
+@mcp.tool(annotations=READ_ONLY)
 def verificar_disponibilidade_exemplar(id_livro: str) -> dict:
-    livro = LIVROS_BIBLIOTECA.get(id_livro)
+    livro = db.get_livro(id_livro)
     if not livro:
         return {"erro": "Livro não encontrado"}
     return {"titulo": livro["titulo"], "disponiveis": livro["disponiveis"]}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def verificar_pendencias_biblioteca(matricula: str) -> dict:
-    return SITUACAO_BIBLIOTECA.get(matricula, {"erro": "Aluno não cadastrado na biblioteca"})
+    return db.get_situacao_biblioteca(matricula) or {"erro": "Aluno não cadastrado na biblioteca"}
 
-@mcp.tool
+@mcp.tool(annotations={"readOnlyHint": False})
 def reservar_livro(matricula: str, id_livro: str) -> str:
-    situacao = SITUACAO_BIBLIOTECA.get(matricula)
-    if not situacao:
-        return "Erro: Aluno não encontrado"
-    
-    if situacao["multas"]:
-        return "Erro: Não é possível reservar. Aluno possui multas pendentes."
-    
-    livro = LIVROS_BIBLIOTECA.get(id_livro)
-    if not livro:
-        return "Erro: Livro inexistente"
-    
-    if livro["disponiveis"] < 1:
-        return "Erro: Não há exemplares disponíveis para reserva imediata."
-    
-    return f"Sucesso: Livro '{livro['titulo']}' reservado para matrícula {matricula}."
+    return db.reservar_livro(matricula, id_livro)
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def consultar_historico_analitico(matricula: str) -> dict:
-    return HISTORICO_ACADEMICO.get(matricula, {"erro": "Histórico não encontrado"})
+    return db.get_historico(matricula) or {"erro": "Histórico não encontrado"}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def verificar_requisitos_disciplina(codigo_disciplina: str) -> list:
-    return REQUISITOS_DISCIPLINAS.get(codigo_disciplina.upper(), [])
+    return prerequisitos.direct_requirements(codigo_disciplina.upper())
+
+@mcp.tool(annotations=READ_ONLY)
+def verificar_cadeia_requisitos(codigo_disciplina: str) -> dict:
+    """Retorna os pré-requisitos diretos e toda a cadeia de pré-requisitos (indiretos incluídos) de uma disciplina."""
+    codigo = codigo_disciplina.upper()
+    return {
+        "codigo": codigo,
+        "diretos": prerequisitos.direct_requirements(codigo),
+        "cadeia_completa": prerequisitos.all_requirements(codigo)
+    }
+
+@mcp.tool(annotations={"readOnlyHint": False})
+def adicionar_requisito(codigo_disciplina: str, codigo_requisito: str) -> dict:
+    """Cadastra um pré-requisito direto para a disciplina; recusa o cadastro se ele criar um ciclo."""
+    codigo, requisito = codigo_disciplina.upper(), codigo_requisito.upper()
+    for c in (codigo, requisito):
+        if not _disciplina_existe(c):
+            return {"erro": f"Disciplina {c} não encontrada"}
+    try:
+        prerequisitos.add_requirement(codigo, requisito, persist=lambda: db.add_requisito(codigo, requisito))
+    except PrerequisiteCycleError as e:
+        return {"erro": str(e), "ciclo": e.cycle}
+    return verificar_cadeia_requisitos(codigo)
+
+@mcp.tool(annotations={"readOnlyHint": False})
+def remover_requisito(codigo_disciplina: str, codigo_requisito: str) -> dict:
+    """Remove um pré-requisito direto da disciplina."""
+    codigo, requisito = codigo_disciplina.upper(), codigo_requisito.upper()
+    if requisito not in prerequisitos.direct_requirements(codigo):
+        return {"erro": f"{requisito} não é pré-requisito direto de {codigo}"}
+    prerequisitos.remove_requirement(codigo, requisito, persist=lambda: db.remove_requisito(codigo, requisito))
+    return verificar_cadeia_requisitos(codigo)
+
+@mcp.tool(annotations=READ_ONLY)
+def verificar_elegibilidade(matricula: str, codigos_disciplinas: list[str]) -> dict:
+    """Verifica de uma vez se o estudante pode cursar cada disciplina da lista e quais requisitos faltam."""
+    if db.get_cra(matricula) is None:
+        return {"erro": "Histórico não encontrado"}
+    
+    aprovadas = db.get_aprovadas(matricula)
+    resultado = {}
+    for codigo in (c.upper() for c in codigos_disciplinas):
+        if not _disciplina_existe(codigo):
+            resultado[codigo] = {"erro": "Disciplina não encontrada"}
+            continue
+        faltando = prerequisitos.missing_requirements(codigo, aprovadas)
+        ja_cursada = codigo in aprovadas
+        resultado[codigo] = {
+            "elegivel": not faltando and not ja_cursada,
+            "ja_cursada": ja_cursada,
+            "requisitos_faltando": faltando
+        }
+    return resultado
+
+@mcp.tool(annotations=READ_ONLY)
+def listar_disciplinas_elegiveis(matricula: str, limite: int = 50) -> dict:
+    """Lista as disciplinas que o estudante ainda não cursou e cujos pré-requisitos já cumpriu."""
+    if db.get_cra(matricula) is None:
+        return {"erro": "Histórico não encontrado"}
+    
+    aprovadas = db.get_aprovadas(matricula)
+    codigos = sorted(set(db.list_codigos()) | set(prerequisitos.closure))
+    elegiveis = [c for c in codigos if prerequisitos.is_eligible(c, aprovadas)]
+    return {"total": len(elegiveis), "disciplinas": elegiveis[:limite]}
 
-@mcp.tool
+@mcp.tool(annotations=READ_ONLY)
 def simular_cra_projetado(matricula: str, media_esperada: float, creditos_futuros: int) -> float:
-    dados = HISTORICO_ACADEMICO.get(matricula)
-    if not dados:
+    cra_atual = db.get_cra(matricula)
+    if cra_atual is None:
         return -1.0
-    
-    cra_atual = dados["cra"]
-    creditos_passados = 100
-    novo_cra = ((cra_atual * creditos_passados) + (media_esperada * creditos_futuros)) / (creditos_passados + creditos_futuros)
-    return round(novo_cra, 2)
+    return _projetar_cra(cra_atual, media_esperada, creditos_futuros)
+
+@mcp.tool(annotations=READ_ONLY)
+def simular_cra_cenarios(matricula: str, cenarios: list[dict]) -> list:
+    """Simula o CRA projetado para vários cenários de uma vez. Cada cenário: {"media_esperada": float, "creditos_futuros": int}."""
+    cra_atual = db.get_cra(matricula)
+    if cra_atual is None:
+        return [{"erro": "Histórico não encontrado"}]
+    return [
+        {**c, "cra_projetado": _projetar_cra(cra_atual, float(c["media_esperada"]), int(c["creditos_futuros"]))}
+        for c in cenarios
+    ]
 
 if __name__ == "__main__":
     mcp.run(transport='http', host="0.0.0.0", port=8889)
\ No newline at end of file
@@ -0,0 +1,300 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get(
+    "UNB_TOOLS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "unb_tools.db")
+)
+
+SEARCH_LIMIT = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disciplinas (
+    codigo TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    horario TEXT,
+    professor TEXT,
+    sala TEXT
+);
+CREATE TABLE IF NOT EXISTS requisitos (
+    codigo TEXT NOT NULL,
+    requisito TEXT NOT NULL,
+    PRIMARY KEY (codigo, requisito)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cardapio_ru (
+    data TEXT PRIMARY KEY,
+    almoco TEXT,
+    jantar TEXT,
+    vegetariano TEXT
+);
+CREATE TABLE IF NOT EXISTS usuarios_ru (
+    matricula TEXT PRIMARY KEY,
+    saldo REAL NOT NULL,
+    tipo TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS livros (
+    id TEXT PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    copias INTEGER NOT NULL,
+    disponiveis INTEGER NOT NULL CHECK (disponiveis >= 0)
+);
+CREATE TABLE IF NOT EXISTS situacao_biblioteca (
+    matricula TEXT PRIMARY KEY,
+    multas INTEGER NOT NULL DEFAULT 0,
+    valor_multa REAL
+);
+CREATE TABLE IF NOT EXISTS emprestimos (
+    matricula TEXT NOT NULL,
+    id_livro TEXT NOT NULL,
+    PRIMARY KEY (matricula, id_livro)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reservas (
+    id INTEGER PRIMARY KEY,
+    matricula TEXT NOT NULL,
+    id_livro TEXT NOT NULL,
+    criada_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_reservas_matricula ON reservas (matricula);
+CREATE TABLE IF NOT EXISTS historico (
+    matricula TEXT PRIMARY KEY,
+    cra REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS historico_disciplinas (
+    matricula TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    situacao TEXT NOT NULL CHECK (situacao IN ('aprovado', 'reprovado')),
+    PRIMARY KEY (matricula, codigo, situacao)
+) WITHOUT ROWID;
+"""
+
+class UnbDatabase:
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.fts_tokenizer = None
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            self._create_search_index(conn)
+
+    def connection(self) -> sqlite3.Connection:
+        # Uma conexão por thread: leituras em paralelo no modo WAL, escritas serializadas pelo lock
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _create_search_index(self, conn: sqlite3.Connection) -> None:
+        # O tokenizador trigram (SQLite >= 3.34) permite busca por substring indexada;
+        # versões antigas caem para o unicode61, que casa por palavras/prefixos
+        for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+            try:
+                conn.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS livros_busca
+                    USING fts5(titulo, autor, content='livros', content_rowid='rowid', tokenize='{tokenizer}')
+                """)
+                self.fts_tokenizer = tokenizer.split()[0]
+                break
+            except sqlite3.OperationalError:
+                continue
+
+        conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS livros_ai AFTER INSERT ON livros BEGIN
+                INSERT INTO livros_busca (rowid, titulo, autor) VALUES (new.rowid, new.titulo, new.autor);
+            END;
+            CREATE TRIGGER IF NOT EXISTS livros_ad AFTER DELETE ON livros BEGIN
+                INSERT INTO livros_busca (livros_busca, rowid, titulo, autor) VALUES ('delete', old.rowid, old.titulo, old.autor);
+            END;
+            CREATE TRIGGER IF NOT EXISTS livros_au AFTER UPDATE OF titulo, autor ON livros BEGIN
+                INSERT INTO livros_busca (livros_busca, rowid, titulo, autor) VALUES ('delete', old.rowid, old.titulo, old.autor);
+                INSERT INTO livros_busca (rowid, titulo, autor) VALUES (new.rowid, new.titulo, new.autor);
+            END;
+        """)
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def bulk_load(self):
+        # Cargas grandes: sem gatilho de indexação linha a linha; o índice FTS é reconstruído no fim
+        conn = self.connection()
+        conn.execute("DROP TRIGGER IF EXISTS livros_ai")
+        conn.execute("PRAGMA synchronous=OFF")
+        try:
+            yield self
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_search_index(conn)
+            self.rebuild_search_index()
+            conn.execute("ANALYZE")
+
+    def is_empty(self) -> bool:
+        return self.connection().execute("SELECT 1 FROM disciplinas LIMIT 1").fetchone() is None
+
+    def rebuild_search_index(self) -> None:
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO livros_busca (livros_busca) VALUES ('rebuild')")
+
+    def get_disciplina(self, codigo: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT codigo, nome, horario, professor, sala FROM disciplinas WHERE codigo = ?", (codigo,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_requisitos(self, codigo: str) -> List[str]:
+        rows = self.connection().execute(
+            "SELECT requisito FROM requisitos WHERE codigo = ? ORDER BY requisito", (codigo,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def all_requisitos(self) -> List[tuple]:
+        return [tuple(r) for r in self.connection().execute("SELECT codigo, requisito FROM requisitos")]
+
+    def add_requisito(self, codigo: str, requisito: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO requisitos (codigo, requisito) VALUES (?, ?)", (codigo, requisito))
+
+    def remove_requisito(self, codigo: str, requisito: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM requisitos WHERE codigo = ? AND requisito = ?", (codigo, requisito))
+
+    def list_codigos(self) -> List[str]:
+        return [r[0] for r in self.connection().execute("SELECT codigo FROM disciplinas ORDER BY codigo")]
+
+    def get_cardapio(self, data: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT almoco, jantar, vegetariano FROM cardapio_ru WHERE data = ?", (data,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_usuario_ru(self, matricula: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT saldo, tipo FROM usuarios_ru WHERE matricula = ?", (matricula,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_livro(self, id_livro: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT titulo, autor, copias, disponiveis FROM livros WHERE id = ?", (id_livro,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def buscar_livros(self, termo: str, limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        termo = termo.strip()
+        if not termo:
+            return []
+
+        conn = self.connection()
+        # O trigram exige ao menos 3 caracteres; termos curtos usam LIKE (ainda limitado).
+        # Sem ORDER BY rank: ordenar por relevância custa O(correspondências) em termos comuns
+        if self.fts_tokenizer == "trigram" and len(termo) >= 3 or self.fts_tokenizer == "unicode61":
+            phrase = '"' + termo.replace('"', '""') + '"'
+            if self.fts_tokenizer == "unicode61":
+                phrase += "*"
+            rows = conn.execute("""
+                SELECT l.id, l.titulo, l.autor, l.copias, l.disponiveis
+                FROM livros_busca
+                JOIN livros l ON l.rowid = livros_busca.rowid
+                WHERE livros_busca MATCH ?
+                LIMIT ?
+            """, (phrase, limit)).fetchall()
+        else:
+            pattern = "%" + termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = conn.execute("""
+                SELECT id, titulo, autor, copias, disponiveis FROM livros
+                WHERE titulo LIKE ? ESCAPE '\\' OR autor LIKE ? ESCAPE '\\'
+                LIMIT ?
+            """, (pattern, pattern, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_situacao_biblioteca(self, matricula: str) -> Optional[Dict[str, Any]]:
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT multas, valor_multa FROM situacao_biblioteca WHERE matricula = ?", (matricula,)
+        ).fetchone()
+        if not row:
+            return None
+
+        situacao = {"multas": bool(row["multas"])}
+        if row["valor_multa"] is not None:
+            situacao["valor_multa"] = row["valor_multa"]
+        situacao["livros_emprestados"] = [r[0] for r in conn.execute(
+            "SELECT id_livro FROM emprestimos WHERE matricula = ? ORDER BY id_livro", (matricula,)
+        )]
+        return situacao
+
+    def reservar_livro(self, matricula: str, id_livro: str) -> str:
+        with self.transaction() as conn:
+            situacao = conn.execute(
+                "SELECT multas FROM situacao_biblioteca WHERE matricula = ?", (matricula,)
+            ).fetchone()
+            if not situacao:
+                return "Erro: Aluno não encontrado"
+            if situacao["multas"]:
+                return "Erro: Não é possível reservar. Aluno possui multas pendentes."
+
+            livro = conn.execute("SELECT titulo FROM livros WHERE id = ?", (id_livro,)).fetchone()
+            if not livro:
+                return "Erro: Livro inexistente"
+
+            # Decremento condicional: duas reservas simultâneas não conseguem levar o estoque abaixo de zero
+            updated = conn.execute(
+                "UPDATE livros SET disponiveis = disponiveis - 1 WHERE id = ? AND disponiveis > 0", (id_livro,)
+            ).rowcount
+            if not updated:
+                return "Erro: Não há exemplares disponíveis para reserva imediata."
+
+            conn.execute("INSERT INTO reservas (matricula, id_livro) VALUES (?, ?)", (matricula, id_livro))
+            return f"Sucesso: Livro '{livro['titulo']}' reservado para matrícula {matricula}."
+
+    def get_historico(self, matricula: str) -> Optional[Dict[str, Any]]:
+        conn = self.connection()
+        row = conn.execute("SELECT cra FROM historico WHERE matricula = ?", (matricula,)).fetchone()
+        if not row:
+            return None
+
+        historico = {"cursadas": [], "reprovadas": [], "cra": row["cra"]}
+        for codigo, situacao in conn.execute(
+            "SELECT codigo, situacao FROM historico_disciplinas WHERE matricula = ? ORDER BY codigo", (matricula,)
+        ):
+            historico["cursadas" if situacao == "aprovado" else "reprovadas"].append(codigo)
+        return historico
+
+    def get_aprovadas(self, matricula: str) -> set:
+        return {r[0] for r in self.connection().execute(
+            "SELECT codigo FROM historico_disciplinas WHERE matricula = ? AND situacao = 'aprovado'", (matricula,)
+        )}
+
+    def get_cra(self, matricula: str) -> Optional[float]:
+        row = self.connection().execute("SELECT cra FROM historico WHERE matricula = ?", (matricula,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, table: str, columns: Iterable[str], rows: Iterable[tuple]) -> None:
+        columns = list(columns)
+        placeholders = ", ".join("?" for _ in columns)
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+            )
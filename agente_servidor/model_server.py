@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import os
+from main import load_config, create_llm_provider
+from core.llm_provider import LLMProvider, IPC_STREAM_LIMIT
+
+logger = logging.getLogger(__name__)
+
+class ModelServer:
+    def __init__(self, provider: LLMProvider, socket_path: str, max_concurrent: int = 1):
+        self.provider = provider
+        self.socket_path = socket_path
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.active_connections = 0
+
+    async def _dispatch(self, method: str, params: dict):
+        if method == "generate":
+            async with self.semaphore:
+                return await self.provider.generate(**params)
+        if method == "info":
+            return self.provider.get_model_info()
+        raise ValueError(f"Método desconhecido: {method}")
+
+    async def _send(self, response: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        async with write_lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def _handle_request(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        try:
+            result = await self._dispatch(request.get("method"), request.get("params") or {})
+            response = {"id": request.get("id"), "result": result}
+        except Exception as e:
+            logger.error(f"Erro ao processar requisição IPC '{request.get('method')}': {e}", exc_info=True)
+            response = {"id": request.get("id"), "error": str(e)}
+        await self._send(response, writer, write_lock)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Cada front-end mantém uma única conexão multiplexada por id de requisição
+        self.active_connections += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    # Linha inválida não derruba a conexão: as demais requisições multiplexadas seguem
+                    logger.warning(f"Requisição IPC inválida: {e}")
+                    await self._send({"id": None, "error": f"JSON inválido: {e}"}, writer, write_lock)
+                    continue
+                task = asyncio.create_task(self._handle_request(request, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.active_connections -= 1
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path,
+                                                 limit=IPC_STREAM_LIMIT)
+        print(f"✅ Servidor de modelo ouvindo em {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = load_config()
+    server_config = config.get("model_server", {})
+
+    # O processo de modelo carrega o provider real; os front-ends usam llm.provider: ipc
+    llm_config = {**config.get("llm", {}), "provider": server_config.get("provider", "qwen_local")}
+
+    print("🤖 Carregando modelo no processo compartilhado...")
+    provider = await asyncio.to_thread(create_llm_provider, llm_config)
+
+    server = ModelServer(
+        provider,
+        socket_path=config.get("llm", {}).get("ipc", {}).get("socket_path", "/tmp/agente_unb_llm.sock"),
+        max_concurrent=server_config.get("max_concurrent", 1)
+    )
+    try:
+        await server.serve()
+    finally:
+        await provider.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n👋 Encerrando servidor de modelo...")
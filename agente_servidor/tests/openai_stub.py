@@ -0,0 +1,35 @@
+import json
+import httpx
+
+def completion(content: str) -> dict:
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 3}
+    }
+
+def sse(*deltas: str) -> bytes:
+    events = [{"choices": [{"delta": {"content": d}}]} for d in deltas]
+    lines = [f"data: {json.dumps(e)}\n\n" for e in events] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode("utf-8")
+
+class OpenAIStub:
+    """Servidor OpenAI-compatible em memória: responde /chat/completions com uma sequência roteirizada.
+
+    Cada item do roteiro é um httpx.Response ou uma exceção do httpx a ser levantada na requisição.
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/chat/completions")
+        self.requests.append(json.loads(request.content))
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from core.admission import AdmissionController, AdmissionRejected
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_admits_up_to_max_concurrent_then_queues():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=2, max_queue=4)
+        await admission.acquire()
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        assert not waiter.done()
+        assert admission.get_status()["queued"] == 1
+
+        admission.release()
+        await waiter
+        assert admission.get_status()["active"] == 2
+
+    run(scenario())
+
+def test_queue_is_fifo():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4)
+        order = []
+
+        async def request(name):
+            async with admission.slot():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await admission.acquire()
+        tasks = []
+        for name in "abc":
+            tasks.append(asyncio.create_task(request(name)))
+            await settle()
+        admission.release()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    run(scenario())
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire()
+        assert admission.rejected == 1
+        waiter.cancel()
+
+    run(scenario())
+
+def test_queue_timeout_frees_the_position():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        await admission.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await admission.acquire()
+        status = admission.get_status()
+        assert status["timed_out"] == 1
+        assert status["queued"] == 0
+
+        admission.release()
+        await admission.acquire()
+        assert admission.active == 1
+
+    run(scenario())
+
+def test_position_updates_follow_the_queue():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4)
+        positions = []
+
+        async def on_position(position):
+            positions.append(position)
+
+        await admission.acquire()
+        first = asyncio.create_task(admission.acquire())
+        await settle()
+        second = asyncio.create_task(admission.acquire(on_position=on_position))
+        await settle()
+        admission.release()
+        await first
+        await settle()
+        admission.release()
+        await second
+        assert positions == [2, 1]
+
+    run(scenario())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.get_status()["queued"] == 0
+        assert admission.cancelled == 1
+
+        admission.release()
+        assert admission.active == 0
+
+    run(scenario())
+
+def test_request_timeout_releases_the_slot():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, request_timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await admission.run(lambda: asyncio.sleep(1))
+        assert admission.active == 0
+
+    run(scenario())
+
+def test_cancelling_running_request_releases_slot():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=4)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(3600)
+
+        running = asyncio.create_task(admission.run(slow))
+        await started.wait()
+        queued = asyncio.create_task(admission.run(lambda: asyncio.sleep(0, result="ok")))
+        await settle()
+        assert admission.get_status()["queued"] == 1
+
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        assert await queued == "ok"
+        status = admission.get_status()
+        assert status["active"] == 0
+        assert status["cancelled"] == 1
+
+    run(scenario())
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("pydantic")
+
+from core.agent import ReactAgent, ReactDecision, DecisionFormatError
+from core.llm_provider import LLMProvider
+from core.tools import Tool, ToolRegistry
+
+class ScriptedLLM(LLMProvider):
+    def __init__(self, *decisions):
+        self.decisions = [json.dumps(d, ensure_ascii=False) for d in decisions]
+        self.calls = []
+
+    async def generate(self, system_prompt, user_message, conversation_history=None, max_new_tokens=None):
+        self.calls.append(list(conversation_history or []))
+        return self.decisions.pop(0)
+
+    def get_model_info(self):
+        return {"provider": "scripted"}
+
+class EchoTool(Tool):
+    def __init__(self):
+        super().__init__("eco", "Repete a entrada", {"type": "object", "properties": {"texto": {"type": "string"}}})
+        self.calls = 0
+
+    async def execute(self, **kwargs) -> str:
+        self.calls += 1
+        return kwargs.get("texto", "")
+
+def make_agent(*decisions):
+    registry = ToolRegistry()
+    tool = EchoTool()
+    registry.register(tool)
+    llm = ScriptedLLM(*decisions)
+    return ReactAgent(llm, registry), llm, tool
+
+def test_parallel_without_actions_is_a_format_error():
+    agent, _, _ = make_agent()
+    for actions in (None, []):
+        payload = {"thought": "t", "action": "PARALLEL", "actions": actions}
+        with pytest.raises(DecisionFormatError):
+            agent._parse_decision(json.dumps(payload))
+
+def test_parallel_tool_calls_never_dispatch_parallel_itself():
+    assert ReactDecision(thought="t", action="PARALLEL").tool_calls() == []
+
+def test_format_error_is_returned_to_the_model():
+    agent, llm, tool = make_agent(
+        {"thought": "várias", "action": "PARALLEL", "actions": None},
+        {"thought": "uma", "action": "eco", "action_input": {"texto": "oi"}},
+        {"thought": "pronto", "action": "ANSWER", "answer": "oi"}
+    )
+    steps = []
+
+    async def on_step(step):
+        steps.append(step)
+
+    assert asyncio.run(agent.run("diga oi", step_callback=on_step, check_cache=False)) == "oi"
+    assert tool.calls == 1
+    observation = llm.calls[1][-1]["content"]
+    assert observation.startswith("OBSERVATION: Erro de formato")
+    assert not any(s.get("tool") == "PARALLEL" for s in steps)
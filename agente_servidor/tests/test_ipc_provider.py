@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from core.llm_provider import IPCModelProvider
+
+async def serve(socket_path: str, drop_after: int = 0):
+    # Responde "eco:<user_message>"; com drop_after > 0 fecha a conexão depois de N respostas
+    async def handle(reader, writer):
+        answered = 0
+        while line := await reader.readline():
+            message = json.loads(line)
+            result = f"eco:{message['params'].get('user_message')}"
+            writer.write(json.dumps({"id": message["id"], "result": result}).encode() + b"\n")
+            await writer.drain()
+            answered += 1
+            if drop_after and answered >= drop_after:
+                break
+        writer.close()
+
+    return await asyncio.start_unix_server(handle, path=socket_path)
+
+def test_concurrent_calls_share_one_connection(tmp_path):
+    async def scenario():
+        socket_path = str(tmp_path / "modelo.sock")
+        server = await serve(socket_path)
+        provider = IPCModelProvider(socket_path)
+        try:
+            results = await asyncio.gather(*(provider.generate("s", f"m{i}") for i in range(5)))
+            assert results == [f"eco:m{i}" for i in range(5)]
+        finally:
+            await provider.close()
+            server.close()
+
+    asyncio.run(scenario())
+
+def test_reconnects_after_server_drops_connection(tmp_path):
+    async def scenario():
+        socket_path = str(tmp_path / "modelo.sock")
+        server = await serve(socket_path, drop_after=1)
+        provider = IPCModelProvider(socket_path)
+        try:
+            assert await provider.generate("s", "a") == "eco:a"
+            # Dá tempo ao _read_loop de perceber o EOF e descartar o writer antigo
+            for _ in range(50):
+                if provider._writer is None:
+                    break
+                await asyncio.sleep(0.01)
+            assert await provider.generate("s", "b") == "eco:b"
+        finally:
+            await provider.close()
+            server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+
+pytest.importorskip("fastmcp")
+
+from core.mcp_client import MCPServerPool
+
+class FakeClient:
+    def __init__(self, name: str):
+        self.name = name
+
+def make_pool(*clients, **kwargs) -> MCPServerPool:
+    pool = MCPServerPool("teste", "http://stub/mcp", size=len(clients), max_backoff=0.01, **kwargs)
+    for client in clients:
+        pool._clients.append(client)
+        pool._idle.put_nowait(client)
+    return pool
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_failed_discovery_is_retried_in_background():
+    async def scenario():
+        pool = make_pool(FakeClient("a"))
+        attempts = []
+
+        async def on_recovered():
+            attempts.append(len(attempts))
+            if len(attempts) < 3:
+                raise TimeoutError("list_tools")
+
+        pool.on_recovered = on_recovered
+        pool.request_rediscovery()
+        pool.request_rediscovery()  # pedidos repetidos não duplicam a tarefa
+        await asyncio.wait_for(pool._rediscovery_task, timeout=2)
+        assert len(attempts) == 3
+        assert not pool._needs_rediscovery
+        await pool.close()
+
+    run(scenario())
+
+def test_rediscovery_waits_for_a_connected_pool():
+    async def scenario():
+        pool = make_pool()
+        calls = []
+
+        async def on_recovered():
+            calls.append(True)
+
+        pool.on_recovered = on_recovered
+        pool.request_rediscovery()
+        await asyncio.sleep(0.05)
+        assert calls == []
+
+        pool._clients.append(FakeClient("a"))
+        await asyncio.wait_for(pool._rediscovery_task, timeout=2)
+        assert calls == [True]
+        await pool.close()
+
+    run(scenario())
+
+def test_cancelled_call_does_not_return_session_to_idle(monkeypatch):
+    async def scenario():
+        client = FakeClient("a")
+        pool = make_pool(client)
+        reconnected = []
+        monkeypatch.setattr(pool, "_schedule_reconnect", lambda broken=None: reconnected.append(broken))
+
+        started = asyncio.Event()
+
+        async def slow_operation(c):
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.create_task(pool._run(slow_operation, timeout=5))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert pool._idle.qsize() == 0
+        assert reconnected == [client]
+
+    run(scenario())
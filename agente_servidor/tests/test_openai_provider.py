@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from core.llm_provider import OpenAICompatibleProvider
+from openai_stub import OpenAIStub, completion, sse
+
+def make_provider(stub: OpenAIStub, **kwargs) -> OpenAICompatibleProvider:
+    return OpenAICompatibleProvider(base_url="http://stub/v1", model="stub-model", backoff_base=0.0,
+                                    transport=stub.transport, **kwargs)
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr("core.llm_provider.asyncio.sleep", fake_sleep)
+    return delays
+
+def test_generate_returns_content_and_sends_payload(sleeps):
+    stub = OpenAIStub(httpx.Response(200, json=completion("  olá  ")))
+    provider = make_provider(stub)
+
+    assert run(provider.generate("sistema", "oi", max_new_tokens=32)) == "olá"
+    payload = stub.requests[0]
+    assert payload["model"] == "stub-model"
+    assert payload["max_tokens"] == 32
+    assert payload["stream"] is False
+    assert [m["role"] for m in payload["messages"]] == ["system", "user"]
+    assert sleeps == []
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503])
+def test_retries_retryable_status_with_backoff(sleeps, status):
+    stub = OpenAIStub(httpx.Response(status), httpx.Response(status), httpx.Response(200, json=completion("ok")))
+    provider = make_provider(stub, max_retries=3)
+
+    assert run(provider.generate("s", "u")) == "ok"
+    assert len(stub.requests) == 3
+    assert len(sleeps) == 2
+
+def test_backoff_grows_exponentially(monkeypatch, sleeps):
+    monkeypatch.setattr("core.llm_provider.random.uniform", lambda a, b: 0.0)
+    stub = OpenAIStub(*[httpx.Response(503)] * 3, httpx.Response(200, json=completion("ok")))
+    provider = OpenAICompatibleProvider(base_url="http://stub/v1", model="m", backoff_base=0.5,
+                                        max_retries=3, transport=stub.transport)
+
+    run(provider.generate("s", "u"))
+    assert sleeps == [0.5, 1.0, 2.0]
+
+def test_gives_up_after_max_retries(sleeps):
+    stub = OpenAIStub(*[httpx.Response(429)] * 3)
+    provider = make_provider(stub, max_retries=2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(provider.generate("s", "u"))
+    assert len(stub.requests) == 3
+
+def test_client_error_is_not_retried(sleeps):
+    stub = OpenAIStub(httpx.Response(400, json={"error": "bad request"}))
+    provider = make_provider(stub, max_retries=3)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(provider.generate("s", "u"))
+    assert len(stub.requests) == 1
+    assert sleeps == []
+
+def test_timeout_is_retried_then_raised(sleeps):
+    stub = OpenAIStub(*[httpx.ReadTimeout("timeout")] * 3)
+    provider = make_provider(stub, max_retries=2)
+
+    with pytest.raises(httpx.ReadTimeout):
+        run(provider.generate("s", "u"))
+    assert len(stub.requests) == 3
+    assert len(sleeps) == 2
+
+def test_timeout_then_success(sleeps):
+    stub = OpenAIStub(httpx.ConnectTimeout("timeout"), httpx.Response(200, json=completion("ok")))
+    provider = make_provider(stub, max_retries=2)
+
+    assert run(provider.generate("s", "u")) == "ok"
+    assert len(sleeps) == 1
+
+def test_stream_parses_sse_events(sleeps):
+    body = b": keep-alive\n\n" + sse("Thought", ": ", "ok")
+    stub = OpenAIStub(httpx.Response(200, content=body, headers={"content-type": "text/event-stream"}))
+    provider = make_provider(stub)
+
+    async def collect():
+        return [chunk async for chunk in provider.stream("s", "u")]
+
+    assert run(collect()) == ["Thought", ": ", "ok"]
+    assert stub.requests[0]["stream"] is True
+
+def test_stream_mode_generate_joins_deltas(sleeps):
+    stub = OpenAIStub(httpx.Response(503), httpx.Response(200, content=sse("a", "b", " ")))
+    provider = make_provider(stub, stream=True, max_retries=1)
+
+    assert run(provider.generate("s", "u")) == "ab"
+    assert len(sleeps) == 1
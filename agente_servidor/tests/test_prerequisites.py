@@ -0,0 +1,79 @@
+import pytest
+from mcp_servers.prerequisites import PrerequisiteGraph, PrerequisiteCycleError
+
+def chain() -> PrerequisiteGraph:
+    # D -> C -> B -> A e D -> A
+    return PrerequisiteGraph.from_pairs([("B", "A"), ("C", "B"), ("D", "C"), ("D", "A")])
+
+def test_closure_includes_indirect_requirements():
+    graph = chain()
+    assert graph.closure["D"] == {"A", "B", "C"}
+    assert graph.closure["A"] == frozenset()
+    assert graph.direct_requirements("D") == ["A", "C"]
+
+def test_all_requirements_in_topological_order():
+    assert chain().all_requirements("D") == ["A", "B", "C"]
+
+def test_from_pairs_rejects_cycle():
+    with pytest.raises(PrerequisiteCycleError) as error:
+        PrerequisiteGraph.from_pairs([("A", "B"), ("B", "C"), ("C", "A")])
+    cycle = error.value.cycle
+    assert cycle[0] == cycle[-1]
+    assert set(cycle) == {"A", "B", "C"}
+
+def test_missing_requirements_and_eligibility_use_closure():
+    graph = chain()
+    assert graph.missing_requirements("D", {"C"}) == ["A", "B"]
+    assert not graph.is_eligible("D", {"A", "C"})
+    assert graph.is_eligible("D", {"A", "B", "C"})
+    assert not graph.is_eligible("A", {"A"})
+
+def test_add_requirement_updates_closure_of_dependents():
+    graph = chain()
+    graph.add_requirement("A", "Z")
+    assert "Z" in graph.closure["A"]
+    assert "Z" in graph.closure["D"]
+    assert graph.closure["Z"] == frozenset()
+
+def test_add_requirement_keeps_topological_order_for_new_nodes():
+    graph = chain()
+    graph.add_requirement("A", "Z")
+    graph.add_requirement("N", "D")
+    assert graph.all_requirements("D") == ["Z", "A", "B", "C"]
+    assert graph.all_requirements("N") == ["Z", "A", "B", "C", "D"]
+
+def test_add_requirement_reports_indirect_cycle_path():
+    graph = PrerequisiteGraph.from_pairs([("B", "A"), ("C", "B")])
+    with pytest.raises(PrerequisiteCycleError) as error:
+        graph.add_requirement("A", "C")
+    assert error.value.cycle == ["C", "B", "A", "C"]
+    assert "C" not in graph.closure["A"]
+
+def test_add_requirement_rejects_self_loop():
+    with pytest.raises(PrerequisiteCycleError) as error:
+        chain().add_requirement("A", "A")
+    assert error.value.cycle == ["A", "A"]
+
+def test_failed_persist_leaves_graph_unchanged():
+    graph = chain()
+
+    def fail():
+        raise RuntimeError("banco indisponível")
+
+    with pytest.raises(RuntimeError):
+        graph.add_requirement("A", "Z", persist=fail)
+    assert "Z" not in graph.closure
+    assert graph.direct_requirements("A") == []
+
+def test_persist_runs_before_graph_changes():
+    graph = chain()
+    seen = []
+    graph.add_requirement("A", "Z", persist=lambda: seen.append(graph.direct_requirements("A")))
+    assert seen == [[]]
+    assert graph.direct_requirements("A") == ["Z"]
+
+def test_remove_requirement_shrinks_closure():
+    graph = chain()
+    graph.remove_requirement("C", "B")
+    assert graph.closure["C"] == frozenset()
+    assert graph.closure["D"] == {"A", "C"}
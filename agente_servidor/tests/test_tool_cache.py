@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from core.tools import Tool, ToolRegistry
+
+class CountingTool(Tool):
+    def __init__(self, name: str, cacheable: bool = True, result: str = "ok", cache_ttl=None):
+        super().__init__(name, f"Ferramenta {name}", {"type": "object", "properties": {}},
+                         cacheable=cacheable, cache_ttl=cache_ttl)
+        self.calls = 0
+        self.result = result
+
+    async def execute(self, **kwargs) -> str:
+        self.calls += 1
+        return f"{self.result} #{self.calls}"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr("core.tools.time.monotonic", fake)
+    return fake
+
+def run(coro):
+    return asyncio.run(coro)
+
+def registry_with(*tools, **cache_config) -> ToolRegistry:
+    registry = ToolRegistry()
+    for tool in tools:
+        registry.register(tool)
+    registry.configure_cache(**cache_config)
+    return registry
+
+def test_read_only_results_are_cached_by_arguments(clock):
+    tool = CountingTool("consultar")
+    registry = registry_with(tool, default_ttl=60)
+
+    assert run(registry.execute("consultar", {"a": 1, "b": 2})) == "ok #1"
+    assert run(registry.execute("consultar", {"b": 2, "a": 1})) == "ok #1"
+    assert run(registry.execute("consultar", {"a": 2})) == "ok #2"
+    assert registry.get_cache_stats()["hits"] == 1
+
+def test_entries_expire_after_ttl(clock):
+    tool = CountingTool("consultar")
+    registry = registry_with(tool, default_ttl=10)
+
+    run(registry.execute("consultar", {}))
+    clock.now += 9.9
+    run(registry.execute("consultar", {}))
+    clock.now += 0.2
+    run(registry.execute("consultar", {}))
+    assert tool.calls == 2
+
+def test_ttl_override_zero_disables_cache(clock):
+    tool = CountingTool("consultar")
+    registry = registry_with(tool, default_ttl=60, ttl_overrides={"consultar": 0})
+
+    run(registry.execute("consultar", {}))
+    run(registry.execute("consultar", {}))
+    assert tool.calls == 2
+
+def test_errors_are_not_cached(clock):
+    tool = CountingTool("consultar", result="Erro")
+    registry = registry_with(tool, default_ttl=60)
+
+    run(registry.execute("consultar", {}))
+    run(registry.execute("consultar", {}))
+    assert tool.calls == 2
+
+def test_lru_evicts_oldest_entry(clock):
+    tool = CountingTool("consultar")
+    registry = registry_with(tool, default_ttl=60, max_entries=2)
+
+    for value in (1, 2, 3):
+        run(registry.execute("consultar", {"v": value}))
+    run(registry.execute("consultar", {"v": 1}))
+    assert tool.calls == 4
+    assert registry.get_cache_stats()["entries"] == 2
+
+def test_write_tool_invalidates_mapped_dependents(clock):
+    leitura, outra, escrita = CountingTool("leitura"), CountingTool("outra"), CountingTool("reservar", cacheable=False)
+    registry = registry_with(leitura, outra, escrita, default_ttl=60, invalidations={"reservar": ["leitura"]})
+
+    run(registry.execute("leitura", {}))
+    run(registry.execute("outra", {}))
+    run(registry.execute("reservar", {}))
+    run(registry.execute("leitura", {}))
+    run(registry.execute("outra", {}))
+    assert leitura.calls == 2
+    assert outra.calls == 1
+
+def test_unmapped_write_tool_clears_whole_cache(clock):
+    leitura, escrita = CountingTool("leitura"), CountingTool("alterar", cacheable=False)
+    registry = registry_with(leitura, escrita, default_ttl=60)
+
+    run(registry.execute("leitura", {}))
+    run(registry.execute("alterar", {}))
+    run(registry.execute("leitura", {}))
+    assert leitura.calls == 2
+
+def test_failed_write_keeps_cache(clock):
+    leitura, escrita = CountingTool("leitura"), CountingTool("alterar", cacheable=False, result="Erro")
+    registry = registry_with(leitura, escrita, default_ttl=60)
+
+    run(registry.execute("leitura", {}))
+    run(registry.execute("alterar", {}))
+    run(registry.execute("leitura", {}))
+    assert leitura.calls == 1
@@ -1,12 +1,14 @@
 from core.tools import Tool
-from typing import Dict, Any
-from fastmcp import Client
+from typing import Dict, Any, TYPE_CHECKING
 import json
 
+if TYPE_CHECKING:
+    from core.mcp_client import MCPServerPool
+
 class MCPTool(Tool):
     def __init__(self, name: str, description: str, parameters: Dict[str, Any], 
-                 mcp_client: Client, mcp_tool_name: str):
-        super().__init__(name, description, parameters)
+                 mcp_client: "MCPServerPool", mcp_tool_name: str, cacheable: bool = False):
+        super().__init__(name, description, parameters, cacheable=cacheable)
         self.mcp_client = mcp_client
         self.mcp_tool_name = mcp_tool_name
     
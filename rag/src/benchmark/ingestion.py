@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+from src.common.logger import setup_logging
+from src.common import config as rag_config
+from src.ingestor.profiler import profiler
+
+setup_logging("benchmark")
+logger = logging.getLogger(__name__)
+
+FIXTURE_HOST = "https://fixtures.unb.local"
+
+PARAGRAPHS = [
+    "A matrícula em disciplinas é realizada pelo SIGAA nos períodos definidos pelo calendário acadêmico.",
+    "O ajuste de matrícula permite incluir e excluir turmas conforme a disponibilidade de vagas.",
+    "O trancamento parcial deve ser solicitado dentro do prazo e não pode zerar a carga horária do semestre.",
+    "Estudantes em mobilidade acadêmica precisam apresentar o plano de estudos aprovado pelo coordenador.",
+    "O restaurante universitário oferece refeições subsidiadas para estudantes em situação de vulnerabilidade.",
+    "A biblioteca central permite a renovação de empréstimos pela internet, desde que não haja reservas.",
+    "O aproveitamento de estudos exige ementa e histórico da instituição de origem autenticados."
+]
+
+def _document_text(rng: random.Random, paragraphs: int) -> list[str]:
+    return [rng.choice(PARAGRAPHS) + f" Referência {rng.randint(1000, 9999)}." for _ in range(paragraphs)]
+
+def build_fixture_corpus(path: str, n_html: int, n_pdf: int, n_md: int, paragraphs: int,
+                         dynamic_ratio: float, seed: int = 7) -> dict:
+    import fitz
+
+    rng = random.Random(seed)
+    local_dir = os.path.join(path, "documentos_locais")
+    os.makedirs(local_dir, exist_ok=True)
+
+    pages = {}
+    for i in range(n_html):
+        body = "".join(f"<p>{p}</p>" for p in _document_text(rng, paragraphs))
+        full = f"<html><body><nav>menu</nav><main><h1>Página {i}</h1>{body}</main><footer>rodapé</footer></body></html>"
+        # Parte das páginas chega "vazia" e força o caminho de renderização dinâmica (Playwright)
+        thin = "<html><body><main><div id='app'></div></main></body></html>"
+        is_dynamic = rng.random() < dynamic_ratio
+        pages[f"{FIXTURE_HOST}/pagina/{i}"] = {"html": thin if is_dynamic else full, "rendered": full}
+
+    for i in range(n_pdf):
+        doc = fitz.open()
+        for p in range(max(1, paragraphs // 5)):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(_document_text(rng, 5)), fontsize=10)
+        doc.save(os.path.join(local_dir, f"edital_{i}.pdf"))
+        doc.close()
+
+    for i in range(n_md):
+        with open(os.path.join(local_dir, f"guia_{i}.md"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(_document_text(rng, paragraphs)))
+
+    links = "".join(f"<a href='{url}'>{url}</a>" for url in pages)
+    seed_url = f"{FIXTURE_HOST}/index"
+    pages[seed_url] = {"html": f"<html><body><main>{links}</main></body></html>", "rendered": None}
+
+    return {"local_dir": local_dir, "seed_url": seed_url, "pages": pages}
+
+class FixtureResponse:
+    def __init__(self, url: str, page: dict | None, latency: float):
+        self.url = url
+        self.status_code = 200 if page else 404
+        self.text = page["html"] if page else ""
+        self.content = self.text.encode("utf-8")
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+        if latency:
+            time.sleep(latency)
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            import requests
+            raise requests.exceptions.HTTPError(response=self)
+
+def _fake_genai(latency: float):
+    def generate_content(model: str, contents: str):
+        if latency:
+            time.sleep(latency)
+        words = sorted({w.strip(".,:;").lower() for w in contents.split() if len(w) > 6})[:8]
+        return SimpleNamespace(text=", ".join(words))
+
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    return SimpleNamespace(Client=lambda api_key=None: client)
+
+def run_benchmark(args) -> dict:
+    from src.ingestor import main as ingestor_main, extractor, crawler
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = build_fixture_corpus(args.fixtures or tmp, args.html, args.pdf, args.md,
+                                        args.paragraphs, args.dynamic_ratio)
+        pages = fixtures["pages"]
+
+        def fake_get(url, *a, **kw):
+            return FixtureResponse(url, pages.get(url), args.network_latency)
+
+        @profiler.stage("playwright")
+        def fake_dynamic(url):
+            if args.render_latency:
+                time.sleep(args.render_latency)
+            rendered = (pages.get(url) or {}).get("rendered")
+            return extractor._scrape_html(rendered) if rendered else ""
+
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(crawler.requests, "get", fake_get))
+            stack.enter_context(mock.patch.object(extractor.requests, "get", fake_get))
+            stack.enter_context(mock.patch.object(extractor, "_scrape_dynamic", fake_dynamic))
+            stack.enter_context(mock.patch("src.ingestor.processor.genai", _fake_genai(args.gemini_latency)))
+            stack.enter_context(mock.patch.object(ingestor_main, "LOCAL_DOCS_PATH", fixtures["local_dir"]))
+            stack.enter_context(mock.patch.object(ingestor_main, "SEED_URLS", [fixtures["seed_url"]]))
+            if args.skip_db:
+                stack.enter_context(mock.patch.object(ingestor_main, "setup_database", lambda: None))
+                stack.enter_context(mock.patch.object(ingestor_main, "drop_table", lambda: None))
+                stack.enter_context(mock.patch.object(ingestor_main, "insert_document", lambda *a: None))
+            else:
+                rag_config.DB_SETTINGS["dbname"] = args.dbname
+
+            profiler.start(cprofile=args.profile_mode == "cprofile", sampling=args.profile_mode == "sampling")
+            try:
+                ingestor_main.run_ingestion(substitute=not args.skip_db)
+            finally:
+                profiler.stop()
+
+    report = profiler.report()
+    report["fixtures"] = {"html": args.html, "pdf": args.pdf, "md": args.md, "paragraphs": args.paragraphs,
+                          "dynamic_ratio": args.dynamic_ratio, "network_latency": args.network_latency,
+                          "gemini_latency": args.gemini_latency, "skip_db": args.skip_db}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline da ingestão (rede, Playwright e Gemini simulados)")
+    parser.add_argument("--html", type=int, default=50)
+    parser.add_argument("--pdf", type=int, default=20)
+    parser.add_argument("--md", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--dynamic-ratio", type=float, default=0.1, help="Fração de páginas que exigem renderização")
+    parser.add_argument("--network-latency", type=float, default=0.0)
+    parser.add_argument("--render-latency", type=float, default=0.0)
+    parser.add_argument("--gemini-latency", type=float, default=0.0)
+    parser.add_argument("--fixtures", help="Pasta onde gravar o corpus de fixtures (padrão: temporária)")
+    parser.add_argument("--skip-db", action="store_true", help="Não grava no Postgres (mede só extração/enriquecimento/embedding)")
+    parser.add_argument("--dbname", default=os.environ.get("BENCH_DB_NAME", "unb_rag_bench"))
+    parser.add_argument("--profile-mode", choices=["stages", "cprofile", "sampling"], default="stages")
+    parser.add_argument("--profile-dir", default="logs/profile")
+    parser.add_argument("--output", default="bench_ingestion.json")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    profiler.log_summary()
+    if args.profile_mode != "stages":
+        profiler.write(args.profile_dir)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"Relatório salvo em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.common.logger import setup_logging
+from src.common import config as rag_config
+from src.common.database import setup_database, drop_table, get_db_connection, search_hybrid
+
+setup_logging("benchmark")
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "name": "baseline",
+    "chunking_mode": rag_config.CHUNKING_MODE,
+    "chunk_tokens": rag_config.CHUNK_TOKENS,
+    "chunk_overlap_tokens": rag_config.CHUNK_OVERLAP_TOKENS,
+    "chunk_size": rag_config.CHUNK_SIZE,
+    "chunk_overlap": rag_config.CHUNK_OVERLAP,
+    "hnsw_m": rag_config.HNSW_M,
+    "hnsw_ef_construction": rag_config.HNSW_EF_CONSTRUCTION,
+    "ef_search": rag_config.HNSW_EF_SEARCH,
+    "rrf_k": rag_config.RRF_K,
+    "candidates": rag_config.CANDIDATE_POOL,
+    "keyword_candidates": None,
+    "rerank_model": None
+}
+
+SYNTHETIC_TOPICS = [
+    "matrícula", "trancamento", "aproveitamento de estudos", "carteirinha estudantil", "restaurante universitário",
+    "biblioteca central", "monitoria", "iniciação científica", "estágio obrigatório", "colação de grau",
+    "mobilidade acadêmica", "auxílio moradia", "bolsa permanência", "histórico escolar", "jubilamento",
+    "transferência facultativa", "dupla diplomação", "calendário acadêmico", "ouvidoria", "assistência estudantil"
+]
+
+def generate_synthetic_corpus(n_docs: int, seed: int = 42):
+    rng = random.Random(seed)
+    corpus, queries = {}, []
+
+    for i in range(n_docs):
+        topic = SYNTHETIC_TOPICS[i % len(SYNTHETIC_TOPICS)]
+        code = f"PROC{i:04d}"
+        prazo = rng.randint(2, 60)
+        setor = rng.choice(["SAA", "DEG", "DAC", "BCE", "DDS", "SECOM"])
+        paragraphs = [
+            f"O procedimento {code} trata de {topic} na Universidade de Brasília.",
+            f"O estudante deve abrir a solicitação {code} junto ao setor {setor} com antecedência de {prazo} dias.",
+            f"Documentos exigidos para {topic}: documento de identidade, comprovante de matrícula e formulário {code}.",
+            " ".join(f"Informação complementar {j} sobre {topic} e normas gerais da graduação." for j in range(rng.randint(5, 30)))
+        ]
+        fonte = f"synthetic:{code}"
+        corpus[fonte] = "\n\n".join(paragraphs)
+        queries.append({"query": f"Qual o prazo e o setor responsável pelo procedimento {code} de {topic}?",
+                        "relevant": [fonte]})
+
+    return corpus, queries
+
+def load_local_corpus(path: str):
+    from src.ingestor.extractor import read_local_file_content
+
+    corpus = {}
+    for f in sorted(os.listdir(path)):
+        full_path = os.path.join(path, f)
+        if os.path.isfile(full_path):
+            text = read_local_file_content(full_path)
+            if text:
+                corpus[f"local:{f}"] = text
+    return corpus
+
+class RetrievalBenchmark:
+    def __init__(self, corpus: dict, queries: list, k: int = rag_config.TOP_K_RESULTS):
+        from sentence_transformers import SentenceTransformer
+
+        self.corpus = corpus
+        self.queries = queries
+        self.k = k
+        self.model = SentenceTransformer(rag_config.HF_MODEL_NAME)
+        self._rerankers = {}
+
+    def split(self, cfg: dict, text: str) -> list[str]:
+        tokenizer = self.model.tokenizer
+        # Mesma divisão do ingestor, inclusive o recuo para caracteres sem tokenizador fast
+        if cfg["chunking_mode"] == "tokens" and getattr(tokenizer, "is_fast", False):
+            from src.ingestor.processor import split_token_chunks
+
+            size = self.model.max_seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+            if cfg["chunk_tokens"]:
+                size = min(size, cfg["chunk_tokens"])
+            overlap = min(cfg["chunk_overlap_tokens"], size // 2)
+            return [chunk for chunk, _ in split_token_chunks(tokenizer, text, size, overlap)]
+
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=cfg["chunk_size"], chunk_overlap=cfg["chunk_overlap"])
+        return splitter.split_text(text)
+
+    def load(self, cfg: dict) -> dict:
+        from psycopg2.extras import execute_values
+        from pgvector.psycopg2 import register_vector
+
+        drop_table()
+        setup_database(hnsw_m=cfg["hnsw_m"], hnsw_ef_construction=cfg["hnsw_ef_construction"])
+
+        rows = [(chunk, fonte) for fonte, text in self.corpus.items() for chunk in self.split(cfg, text)]
+
+        start = time.perf_counter()
+        embeddings = self.model.encode([r[0] for r in rows], batch_size=64, show_progress_bar=False)
+        embed_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with get_db_connection() as conn:
+            register_vector(conn)
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO documentos_unb (conteudo, fonte, embedding, metadados)
+                    VALUES %s
+                """, [(chunk, fonte, emb, "") for (chunk, fonte), emb in zip(rows, embeddings)], page_size=500)
+                cur.execute("ANALYZE documentos_unb;")
+            conn.commit()
+        load_s = time.perf_counter() - start
+
+        return {"chunks": len(rows), "embed_s": round(embed_s, 3), "load_s": round(load_s, 3)}
+
+    def _rerank(self, model_name: str, query: str, results: list) -> list:
+        from sentence_transformers import CrossEncoder
+
+        if model_name not in self._rerankers:
+            self._rerankers[model_name] = CrossEncoder(model_name)
+        scores = self._rerankers[model_name].predict([(query, r["conteudo"]) for r in results])
+        return [r for _, r in sorted(zip(scores, results), key=lambda x: -x[0])]
+
+    def search(self, cfg: dict, query: str) -> tuple[list, float]:
+        start = time.perf_counter()
+        embedding = self.model.encode(query).tolist()
+        # Com reranker, busca um conjunto maior e reordena antes de cortar em k
+        limit = cfg["candidates"] if cfg.get("rerank_model") else self.k
+        results = search_hybrid(query, embedding, limit=limit, rrf_k=cfg["rrf_k"],
+                                candidates=cfg["candidates"], ef_search=cfg["ef_search"],
+                                keyword_candidates=cfg["keyword_candidates"])
+        if cfg.get("rerank_model") and results:
+            results = self._rerank(cfg["rerank_model"], query, results)
+        return results[:self.k], time.perf_counter() - start
+
+    def evaluate_quality(self, cfg: dict) -> dict:
+        recalls, reciprocal_ranks, ndcgs = [], [], []
+
+        for item in self.queries:
+            relevant = set(item["relevant"])
+            results, _ = self.search(cfg, item["query"])
+
+            # Relevância por documento de origem: conta só a primeira ocorrência de cada fonte
+            seen, gains = set(), []
+            for r in results:
+                is_new_relevant = r["fonte"] in relevant and r["fonte"] not in seen
+                gains.append(1.0 if is_new_relevant else 0.0)
+                seen.add(r["fonte"])
+
+            recalls.append(len(seen & relevant) / len(relevant))
+            first_hit = next((i for i, g in enumerate(gains) if g), None)
+            reciprocal_ranks.append(1.0 / (first_hit + 1) if first_hit is not None else 0.0)
+
+            dcg = sum(g / math.log2(i + 2) for i, g in enumerate(gains))
+            idcg = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant), self.k)))
+            ndcgs.append(dcg / idcg if idcg else 0.0)
+
+        return {
+            f"recall@{self.k}": round(statistics.mean(recalls), 4),
+            "mrr": round(statistics.mean(reciprocal_ranks), 4),
+            f"ndcg@{self.k}": round(statistics.mean(ndcgs), 4)
+        }
+
+    def evaluate_latency(self, cfg: dict, concurrency: int, rounds: int) -> dict:
+        workload = [q["query"] for q in self.queries] * rounds
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [lat for _, lat in pool.map(lambda q: self.search(cfg, q), workload)]
+        wall = time.perf_counter() - start
+
+        latencies.sort()
+        pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+        return {
+            "concurrency": concurrency,
+            "requests": len(latencies),
+            "p50_ms": round(pct(0.50), 2),
+            "p95_ms": round(pct(0.95), 2),
+            "p99_ms": round(pct(0.99), 2),
+            "qps": round(len(latencies) / wall, 2)
+        }
+
+    def run(self, configs: list, concurrency_levels: list, rounds: int) -> dict:
+        report = {"k": self.k, "documents": len(self.corpus), "queries": len(self.queries), "configs": []}
+
+        for cfg in configs:
+            cfg = {**DEFAULT_CONFIG, **cfg}
+            logger.info(f"--- Configuração '{cfg['name']}' ---")
+            entry = {"config": cfg, "load": self.load(cfg)}
+            self.search(cfg, self.queries[0]["query"])  # aquecimento (modelo e cache do Postgres)
+            entry["quality"] = self.evaluate_quality(cfg)
+            entry["latency"] = [self.evaluate_latency(cfg, c, rounds) for c in concurrency_levels]
+            logger.info(json.dumps(entry["quality"]))
+            report["configs"].append(entry)
+
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de qualidade e latência da busca híbrida")
+    parser.add_argument("--corpus", help="Pasta com documentos locais (padrão: corpus sintético)")
+    parser.add_argument("--queries", help="JSON com [{'query': ..., 'relevant': [fonte, ...]}]")
+    parser.add_argument("--synthetic-docs", type=int, default=200)
+    parser.add_argument("--configs", help="JSON com a lista de configurações a comparar")
+    parser.add_argument("--k", type=int, default=rag_config.TOP_K_RESULTS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--dbname", default=os.environ.get("BENCH_DB_NAME", "unb_rag_bench"),
+                        help="Banco dedicado ao benchmark (a tabela é recriada a cada configuração)")
+    parser.add_argument("--output", default="bench_retrieval.json")
+    args = parser.parse_args()
+
+    rag_config.DB_SETTINGS["dbname"] = args.dbname
+
+    if args.corpus:
+        if not args.queries:
+            parser.error("--corpus exige --queries com os rótulos de relevância")
+        corpus = load_local_corpus(args.corpus)
+    else:
+        corpus, queries = generate_synthetic_corpus(args.synthetic_docs)
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = json.load(f)
+
+    configs = [DEFAULT_CONFIG]
+    if args.configs:
+        with open(args.configs, encoding="utf-8") as f:
+            configs = json.load(f)
+
+    report = RetrievalBenchmark(corpus, queries, k=args.k).run(configs, args.concurrency, args.rounds)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"Relatório salvo em {args.output}")
+
+if __name__ == "__main__":
+    main()
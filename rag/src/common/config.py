@@ -19,6 +19,13 @@ VECTOR_DIMENSION = 768
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# "tokens": chunks medidos com o tokenizador do modelo de embeddings (nada além do max_seq_length);
+# "chars": divisão antiga por caracteres
+CHUNKING_MODE = os.environ.get("CHUNKING_MODE", "tokens")
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "0"))  # 0 = limite do modelo
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "24"))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+
 SEED_URLS = [
     "https://boasvindas.unb.br/registro-academico",
     "https://boasvindas.unb.br/matricula",
@@ -26,4 +33,30 @@ SEED_URLS = [
 ]
 
 LOCAL_DOCS_PATH = "documentos_locais"
-TOP_K_RESULTS = 5
\ No newline at end of file
+TOP_K_RESULTS = 5
+
+RRF_K = int(os.environ.get("RRF_K", "60"))
+CANDIDATE_POOL = int(os.environ.get("CANDIDATE_POOL", "20"))
+KEYWORD_CANDIDATE_POOL = int(os.environ.get("KEYWORD_CANDIDATE_POOL", "0"))  # 0 = igual ao CANDIDATE_POOL
+SEARCH_POOL_SIZE = int(os.environ.get("SEARCH_POOL_SIZE", "8"))
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "40"))
+
+# "postgres": busca híbrida no banco; "local": índice em arquivos (mmap) gerado por src.common.local_index
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "postgres")
+LOCAL_INDEX_PATH = os.environ.get("LOCAL_INDEX_PATH", "indice_local")
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8888"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "1"))
+# Cópia local do modelo gerada por "python3 -m src.server.encoder" (vazio = baixa/usa o cache do hub)
+QUERY_ENCODER_PATH = os.environ.get("QUERY_ENCODER_PATH", "")
+QUERY_ENCODER_THREADS = int(os.environ.get("QUERY_ENCODER_THREADS", "0"))  # 0 = padrão do torch
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_ANALYZE = os.environ.get("SLOW_QUERY_ANALYZE", "false").lower() == "true"  # reexecuta a busca no EXPLAIN
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+# Com SERVER_WORKERS > 1 cada worker grava suas métricas aqui e /metrics devolve a soma (vazio = pasta temporária)
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
\ No newline at end of file
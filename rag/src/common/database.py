@@ -1,16 +1,134 @@
 import logging
+import threading
+import time
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from pgvector.psycopg2 import register_vector
-from src.common.config import DB_SETTINGS, VECTOR_DIMENSION, TOP_K_RESULTS
+from src.common.config import (
+    DB_SETTINGS, VECTOR_DIMENSION, TOP_K_RESULTS, SLOW_QUERY_MS, SLOW_QUERY_ANALYZE,
+    RRF_K, CANDIDATE_POOL, KEYWORD_CANDIDATE_POOL, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    SEARCH_POOL_SIZE
+)
+from src.common.metrics import metrics, COUNT_BUCKETS
 
 logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query")
+
+_search_pool = None
+_search_pool_lock = threading.Lock()
+
+# Mesma ponderação que o ingestor usava ao gravar: metadados (A) pesam mais que o conteúdo (B)
+SEARCH_VECTOR_EXPR = (
+    "setweight(to_tsvector('portuguese', coalesce(metadados, '')), 'A') || "
+    "setweight(to_tsvector('portuguese', conteudo), 'B')"
+)
+
+# Corpo da busca híbrida, com os parâmetros como marcadores: vira o RETURN QUERY da função e
+# também a consulta explicada quando uma busca passa do limiar de consulta lenta
+HYBRID_SEARCH_QUERY = """
+    WITH semantic_search AS (
+        SELECT s.id, RANK() OVER (ORDER BY s.distance) AS rank_semantic
+        FROM (
+            SELECT d.id, d.embedding <=> {query_embedding} AS distance
+            FROM documentos_unb d
+            ORDER BY distance
+            LIMIT {semantic_pool}
+        ) s
+    ),
+    keyword_search AS (
+        SELECT k.id, RANK() OVER (ORDER BY k.score DESC) AS rank_keyword
+        FROM (
+            SELECT d.id, ts_rank_cd(d.search_vector, {tsq}) AS score
+            FROM documentos_unb d
+            WHERE d.search_vector @@ {tsq}
+            ORDER BY score DESC
+            LIMIT {keyword_pool}
+        ) k
+    ),
+    fused AS (
+        SELECT COALESCE(s.id, k.id) AS id,
+               COALESCE(1.0 / ({rrf_k} + s.rank_semantic), 0.0) +
+               COALESCE(1.0 / ({rrf_k} + k.rank_keyword), 0.0) AS score
+        FROM semantic_search s
+        FULL OUTER JOIN keyword_search k ON s.id = k.id
+        ORDER BY score DESC
+        LIMIT {result_limit}
+    )
+    SELECT d.conteudo, d.fonte, f.score::FLOAT8,
+           (SELECT COUNT(*) FROM semantic_search),
+           (SELECT COUNT(*) FROM keyword_search)
+    FROM fused f
+    JOIN documentos_unb d ON d.id = f.id
+    ORDER BY f.score DESC
+"""
+
+# Busca híbrida em uma única chamada: tsquery calculada uma vez, vetor enviado uma vez e
+# plano em cache por sessão (plpgsql), com ef_search ajustado dentro da própria transação
+SEARCH_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION buscar_hibrido(
+    query_text TEXT,
+    query_embedding VECTOR({VECTOR_DIMENSION}),
+    result_limit INT,
+    rrf_k INT,
+    semantic_pool INT,
+    keyword_pool INT,
+    ef_search INT
+)
+RETURNS TABLE (conteudo TEXT, fonte VARCHAR, rrf_score FLOAT8, n_semantic BIGINT, n_keyword BIGINT)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    tsq TSQUERY := websearch_to_tsquery('portuguese', query_text);
+BEGIN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+    RETURN QUERY {HYBRID_SEARCH_QUERY.format(
+        query_embedding="query_embedding", tsq="tsq", semantic_pool="semantic_pool",
+        keyword_pool="keyword_pool", rrf_k="rrf_k", result_limit="result_limit")};
+END;
+$$;
+"""
+
+# A mesma consulta em SQL puro, para o EXPLAIN: dentro da função o plano apareceria só como Function Scan
+EXPLAIN_SEARCH_SQL = HYBRID_SEARCH_QUERY.format(
+    query_embedding="%(query_embedding)s::vector", tsq="websearch_to_tsquery('portuguese', %(query_text)s)",
+    semantic_pool="%(semantic_pool)s", keyword_pool="%(keyword_pool)s", rrf_k="%(rrf_k)s",
+    result_limit="%(result_limit)s"
+)
 
 def get_db_connection():
     conn = psycopg2.connect(**DB_SETTINGS)
     conn.set_client_encoding('UTF8')
     return conn
 
-def setup_database():
+def _create_search_indexes(cur, hnsw_m: int, hnsw_ef_construction: int):
+    cur.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_hnsw_embedding
+    ON documentos_unb
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = {int(hnsw_m)}, ef_construction = {int(hnsw_ef_construction)});
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_gin_search
+    ON documentos_unb
+    USING GIN(search_vector);
+    """)
+
+def create_search_indexes(hnsw_m: int = HNSW_M, hnsw_ef_construction: int = HNSW_EF_CONSTRUCTION,
+                          maintenance_work_mem: str | None = None):
+    # Usado após cargas em massa: construir os índices uma vez sobre a tabela cheia é bem mais
+    # rápido do que mantê-los linha a linha durante a carga
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            if maintenance_work_mem:
+                cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+            start = time.perf_counter()
+            _create_search_indexes(cur, hnsw_m, hnsw_ef_construction)
+            cur.execute("ANALYZE documentos_unb;")
+        conn.commit()
+    logger.info(f"Índices criados em {time.perf_counter() - start:.1f}s")
+
+def setup_database(hnsw_m: int = HNSW_M, hnsw_ef_construction: int = HNSW_EF_CONSTRUCTION,
+                   create_indexes: bool = True):
     try:
         with get_db_connection() as conn:
             register_vector(conn)
@@ -23,19 +141,25 @@ def setup_database():
                     fonte VARCHAR(1024) NOT NULL,
                     data_ingestao TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
                     embedding VECTOR({VECTOR_DIMENSION}),
-                    search_vector TSVECTOR
+                    search_vector TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPR}) STORED
                 );
                 """)
+                # Tabelas antigas tinham search_vector preenchido pelo ingestor: converte para coluna gerada
                 cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_hnsw_embedding
-                ON documentos_unb
-                USING hnsw (embedding vector_cosine_ops);
-                """)
-                cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_gin_search
-                ON documentos_unb
-                USING GIN(search_vector);
+                SELECT is_generated FROM information_schema.columns
+                WHERE table_name = 'documentos_unb' AND column_name = 'search_vector';
                 """)
+                row = cur.fetchone()
+                if row and row[0] == "NEVER":
+                    logger.info("Convertendo search_vector para coluna gerada...")
+                    cur.execute("ALTER TABLE documentos_unb DROP COLUMN search_vector;")
+                    cur.execute(f"""
+                    ALTER TABLE documentos_unb
+                    ADD COLUMN search_vector TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPR}) STORED;
+                    """)
+                if create_indexes:
+                    _create_search_indexes(cur, hnsw_m, hnsw_ef_construction)
+                cur.execute(SEARCH_FUNCTION_SQL)
             conn.commit()
             logger.info("Banco de dados configurado (Híbrido + UTF8).")
     except Exception as e:
@@ -52,39 +176,98 @@ def drop_table():
     except Exception as e:
         logger.error(f"Erro drop_table: {e}")
 
-def search_hybrid(query_text: str, query_embedding: list[float], limit: int = TOP_K_RESULTS):
+def _log_slow_query(cur, params: dict, elapsed_ms: float, query_text: str):
+    # Por padrão só o plano (EXPLAIN sem ANALYZE), para não executar a busca lenta outra vez;
+    # SLOW_QUERY_ANALYZE=true troca por EXPLAIN ANALYZE com tempos e buffers reais
+    options = "ANALYZE, BUFFERS" if SLOW_QUERY_ANALYZE else "VERBOSE"
+    # A conexão volta ao pool em autocommit: o ef_search vale só dentro desta transação explícita,
+    # desfeita ao final, para não vazar a configuração para as próximas buscas da mesma conexão
     try:
-        with get_db_connection() as conn:
-            register_vector(conn)
-            with conn.cursor() as cur:
-                sql = """
-                WITH semantic_search AS (
-                    SELECT id, conteudo, fonte, 
-                           RANK() OVER (ORDER BY embedding <=> %s::vector) as rank_semantic
-                    FROM documentos_unb
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT 20
-                ),
-                keyword_search AS (
-                    SELECT id, conteudo, fonte,
-                           RANK() OVER (ORDER BY ts_rank_cd(search_vector, websearch_to_tsquery('portuguese', %s)) DESC) as rank_keyword
-                    FROM documentos_unb
-                    WHERE search_vector @@ websearch_to_tsquery('portuguese', %s)
-                    LIMIT 20
-                )
-                SELECT 
-                    COALESCE(s.conteudo, k.conteudo) as conteudo,
-                    COALESCE(s.fonte, k.fonte) as fonte,
-                    COALESCE(1.0 / (60 + s.rank_semantic), 0.0) + 
-                    COALESCE(1.0 / (60 + k.rank_keyword), 0.0) as rrf_score
-                FROM semantic_search s
-                FULL OUTER JOIN keyword_search k ON s.id = k.id
-                ORDER BY rrf_score DESC
-                LIMIT %s;
-                """
-                cur.execute(sql, (query_embedding, query_embedding, query_text, query_text, limit))
-                results = cur.fetchall()
-                return [{"conteudo": r[0], "fonte": r[1]} for r in results]
+        cur.execute("BEGIN")
+        try:
+            if SLOW_QUERY_ANALYZE:
+                cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(params["ef_search"]),))
+            cur.execute(f"EXPLAIN ({options}) " + EXPLAIN_SEARCH_SQL, params)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+        finally:
+            cur.execute("ROLLBACK")
+    except Exception as e:
+        plan = f"(falha ao obter EXPLAIN: {e})"
+    slow_query_logger.warning(f"Consulta lenta ({elapsed_ms:.1f} ms > {SLOW_QUERY_MS} ms) para '{query_text}':\n{plan}")
+    metrics.inc("rag_slow_queries_total", help="Consultas acima do limiar de consulta lenta")
+
+class _SearchConnectionPool(ThreadedConnectionPool):
+    # Conexões reaproveitadas mantêm o plano da função em cache e evitam o register_vector por consulta
+    def _connect(self, key=None):
+        return _prepare_search_connection(super()._connect(key))
+
+def _prepare_search_connection(conn):
+    conn.set_client_encoding('UTF8')
+    conn.autocommit = True
+    register_vector(conn)
+    return conn
+
+def _get_search_pool() -> ThreadedConnectionPool:
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = _SearchConnectionPool(1, SEARCH_POOL_SIZE, **DB_SETTINGS)
+        return _search_pool
+
+def _checkout_search_connection():
+    try:
+        return _get_search_pool().getconn(), True
+    except PoolError:
+        # Pool esgotado (concorrência acima de SEARCH_POOL_SIZE): conexão avulsa
+        return _prepare_search_connection(psycopg2.connect(**DB_SETTINGS)), False
+
+def _release_search_connection(conn, pooled: bool, broken: bool = False):
+    if pooled:
+        _get_search_pool().putconn(conn, close=broken or conn.closed != 0)
+    else:
+        conn.close()
+
+def search_hybrid(query_text: str, query_embedding: list[float], limit: int = TOP_K_RESULTS,
+                  rrf_k: int = RRF_K, candidates: int = CANDIDATE_POOL, ef_search: int = HNSW_EF_SEARCH,
+                  keyword_candidates: int | None = None):
+    conn = None
+    pooled = broken = False
+    try:
+        conn, pooled = _checkout_search_connection()
+        with conn.cursor() as cur:
+            sql = "SELECT * FROM buscar_hibrido(%s, %s::vector, %s, %s, %s, %s, %s);"
+            keyword_pool = keyword_candidates or KEYWORD_CANDIDATE_POOL or candidates
+            params = (query_text, query_embedding, limit, rrf_k, candidates, keyword_pool, ef_search)
+
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            results = cur.fetchall()
+            elapsed = time.perf_counter() - start
+
+            n_semantic = results[0][3] if results else 0
+            n_keyword = results[0][4] if results else 0
+            metrics.observe("rag_search_stage_seconds", elapsed, {"stage": "sql"},
+                            help="Latência por etapa da busca híbrida")
+            metrics.observe("rag_candidates", n_semantic, {"branch": "semantic"}, buckets=COUNT_BUCKETS,
+                            help="Candidatos por ramo da busca")
+            metrics.observe("rag_candidates", n_keyword, {"branch": "keyword"}, buckets=COUNT_BUCKETS)
+            metrics.observe("rag_candidates", len(results), {"branch": "rrf"}, buckets=COUNT_BUCKETS)
+            logger.debug(f"search_hybrid: {elapsed * 1000:.1f} ms, semântica={n_semantic}, "
+                         f"palavra-chave={n_keyword}, rrf={len(results)}")
+
+            if elapsed * 1000 > SLOW_QUERY_MS:
+                _log_slow_query(cur, {
+                    "query_text": query_text, "query_embedding": query_embedding, "result_limit": limit,
+                    "rrf_k": rrf_k, "semantic_pool": candidates, "keyword_pool": keyword_pool,
+                    "ef_search": ef_search
+                }, elapsed * 1000, query_text)
+
+            return [{"conteudo": r[0], "fonte": r[1], "score": float(r[2])} for r in results]
     except Exception as e:
+        broken = isinstance(e, psycopg2.OperationalError)
+        metrics.inc("rag_search_errors_total", labels={"stage": "sql"}, help="Erros na busca híbrida")
         logger.error(f"Erro search_hybrid: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        return []
+    finally:
+        if conn is not None:
+            _release_search_connection(conn, pooled, broken)
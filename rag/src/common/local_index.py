@@ -0,0 +1,260 @@
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Iterable
+import numpy as np
+from src.common.config import TOP_K_RESULTS, RRF_K, CANDIDATE_POOL, KEYWORD_CANDIDATE_POOL, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH
+from src.common.metrics import metrics, COUNT_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+HNSW_MIN_ROWS = 20000
+SCAN_BLOCK_ROWS = 65536
+EXPORT_FETCH_SIZE = 2000
+BM25_K1 = 1.2
+BM25_B = 0.75
+# No Postgres os metadados entram no search_vector com peso 'A' e o conteúdo com 'B';
+# o ts_rank usa 1.0 e 0.4 para esses pesos, então um termo dos metadados vale 2,5 do conteúdo
+METADATA_WEIGHT = 2.5
+
+STOPWORDS = set("""
+a ao aos as ate com como da das de dela dele do dos e ela ele em entre era essa esse esta este eu foi
+ha isso isto ja lhe mais mas me mesmo meu minha muito na nas nao nem no nos o os ou para pela pelas pelo
+pelos por qual quais quando que quem se sem ser seu seus sua suas so tambem te tem um uma umas uns voce
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    # Aproxima o to_tsvector('portuguese') sem dependências: minúsculas, sem acentos, sem stopwords
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    return [t for t in _TOKEN_RE.findall(normalized) if t not in STOPWORDS and len(t) > 1]
+
+def weighted_terms(conteudo: str, metadados: str | None) -> Counter:
+    terms = Counter(tokenize(conteudo))
+    for term, tf in Counter(tokenize(metadados or "")).items():
+        terms[term] += METADATA_WEIGHT * tf
+    return terms
+
+class LocalHybridIndex:
+    def __init__(self, path: str, embeddings: np.ndarray, documents: list[dict], vocab: dict,
+                 postings_doc: np.ndarray, postings_tf: np.ndarray, doc_len: np.ndarray, hnsw=None):
+        self.path = path
+        self.embeddings = embeddings
+        self.documents = documents
+        self.vocab = vocab
+        self.postings_doc = postings_doc
+        self.postings_tf = postings_tf
+        self.doc_len = doc_len
+        self.avg_doc_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        self.hnsw = hnsw
+
+    @staticmethod
+    def build(output_dir: str, rows: Iterable[tuple[str, str | None, str, Any]], total: int,
+              model_name: str = "") -> None:
+        # rows: (conteudo, metadados, fonte, embedding) consumidos um a um; embeddings e documentos vão
+        # direto para o disco, só o índice invertido fica em memória até o fim
+        if total <= 0:
+            raise ValueError("Nenhum chunk com embedding para indexar.")
+        os.makedirs(output_dir, exist_ok=True)
+        started = time.perf_counter()
+
+        embeddings = None
+        postings = defaultdict(list)
+        doc_len = np.zeros(total, dtype=np.float32)
+        count = 0
+        with open(os.path.join(output_dir, "documents.jsonl"), "w", encoding="utf-8") as f:
+            for doc_id, (conteudo, metadados, fonte, embedding) in enumerate(rows):
+                if doc_id >= total:
+                    raise ValueError(f"Mais chunks que os {total} informados")
+                vector = np.asarray(embedding, dtype=np.float32)
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(os.path.join(output_dir, "embeddings.f16.npy"), mode="w+",
+                                                           dtype=np.float16, shape=(total, len(vector)))
+                # Vetores normalizados: distância de cosseno vira produto interno
+                embeddings[doc_id] = vector / (np.linalg.norm(vector) or 1.0)
+                f.write(json.dumps({"conteudo": conteudo, "fonte": fonte}, ensure_ascii=False) + "\n")
+
+                # Índice invertido BM25: postings contíguos por termo, endereçados por (offset, tamanho)
+                terms = weighted_terms(conteudo, metadados)
+                doc_len[doc_id] = sum(terms.values())
+                for term, tf in terms.items():
+                    postings[term].append((doc_id, tf))
+                count += 1
+
+        if count != total:
+            raise ValueError(f"Esperados {total} chunks, recebidos {count}")
+        embeddings.flush()
+
+        vocab, docs, tfs, offset = {}, [], [], 0
+        for term in sorted(postings):
+            plist = postings[term]
+            idf = math.log(1 + (total - len(plist) + 0.5) / (len(plist) + 0.5))
+            vocab[term] = [offset, len(plist), idf]
+            docs.extend(d for d, _ in plist)
+            tfs.extend(tf for _, tf in plist)
+            offset += len(plist)
+
+        np.save(os.path.join(output_dir, "postings_doc.npy"), np.asarray(docs, dtype=np.int32))
+        np.save(os.path.join(output_dir, "postings_tf.npy"), np.asarray(tfs, dtype=np.float32))
+        np.save(os.path.join(output_dir, "doc_len.npy"), doc_len)
+        with open(os.path.join(output_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+
+        has_hnsw = False
+        if total >= HNSW_MIN_ROWS:
+            try:
+                import hnswlib
+                index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+                index.init_index(max_elements=total, M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+                for begin in range(0, total, SCAN_BLOCK_ROWS):
+                    block = embeddings[begin:begin + SCAN_BLOCK_ROWS]
+                    index.add_items(block.astype(np.float32), np.arange(begin, begin + len(block)))
+                index.save_index(os.path.join(output_dir, "hnsw.bin"))
+                has_hnsw = True
+            except ImportError:
+                logger.info("hnswlib não instalado; o índice local usará busca exata com NumPy.")
+
+        with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "rows": total, "dimension": int(embeddings.shape[1]),
+                       "model": model_name, "hnsw": has_hnsw, "terms": len(vocab)}, f, indent=2)
+        logger.info(f"Índice local gravado em {output_dir}: {total} chunks, {len(vocab)} termos "
+                    f"({time.perf_counter() - started:.1f}s)")
+
+    @classmethod
+    def load(cls, path: str) -> "LocalHybridIndex":
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"Versão do índice local incompatível: {manifest.get('version')}")
+
+        # mmap: as matrizes não são copiadas para a memória do processo na carga
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        with open(os.path.join(path, "documents.jsonl"), encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f]
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            vocab = json.load(f)
+
+        hnsw = None
+        if manifest.get("hnsw"):
+            import hnswlib
+            hnsw = hnswlib.Index(space="ip", dim=manifest["dimension"])
+            hnsw.load_index(os.path.join(path, "hnsw.bin"))
+
+        logger.info(f"Índice local carregado de {path}: {manifest['rows']} chunks, hnsw={bool(hnsw)}")
+        return cls(path, load("embeddings.f16.npy"), documents, vocab,
+                   load("postings_doc.npy"), load("postings_tf.npy"), load("doc_len.npy"), hnsw)
+
+    def _semantic(self, query_embedding: list[float], candidates: int, ef_search: int) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        n = min(candidates, len(self.documents))
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(ef_search, n))
+            labels, _ = self.hnsw.knn_query(query, k=n)
+            return labels[0]
+
+        # float16 não tem BLAS: converte em blocos para float32 sem materializar a matriz inteira
+        scores = np.empty(len(self.documents), dtype=np.float32)
+        for begin in range(0, len(scores), SCAN_BLOCK_ROWS):
+            block = self.embeddings[begin:begin + SCAN_BLOCK_ROWS]
+            scores[begin:begin + len(block)] = block.astype(np.float32) @ query
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])]
+
+    def _keyword(self, query_text: str, candidates: int) -> np.ndarray:
+        scores = defaultdict(float)
+        for term in set(tokenize(query_text)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, length, idf = entry
+            docs = self.postings_doc[offset:offset + length]
+            tf = self.postings_tf[offset:offset + length]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / (self.avg_doc_len or 1.0))
+            for doc, score in zip(docs.tolist(), (idf * tf * (BM25_K1 + 1) / (tf + norm)).tolist()):
+                scores[doc] += score
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:candidates]
+        return np.asarray([doc for doc, _ in ranked], dtype=np.int64)
+
+    def search_hybrid(self, query_text: str, query_embedding: list[float], limit: int = TOP_K_RESULTS,
+                      rrf_k: int = RRF_K, candidates: int = CANDIDATE_POOL, ef_search: int = HNSW_EF_SEARCH,
+                      keyword_candidates: int | None = None):
+        try:
+            start = time.perf_counter()
+            semantic = self._semantic(query_embedding, candidates, ef_search) if query_embedding else np.empty(0)
+            keyword = self._keyword(query_text, keyword_candidates or KEYWORD_CANDIDATE_POOL or candidates)
+
+            fused = defaultdict(float)
+            for rank, doc in enumerate(semantic.tolist(), start=1):
+                fused[doc] += 1.0 / (rrf_k + rank)
+            for rank, doc in enumerate(keyword.tolist(), start=1):
+                fused[doc] += 1.0 / (rrf_k + rank)
+            ranked = sorted(fused.items(), key=lambda item: -item[1])[:limit]
+            elapsed = time.perf_counter() - start
+
+            metrics.observe("rag_search_stage_seconds", elapsed, {"stage": "local_index"},
+                            help="Latência por etapa da busca híbrida")
+            metrics.observe("rag_candidates", len(semantic), {"branch": "semantic"}, buckets=COUNT_BUCKETS,
+                            help="Candidatos por ramo da busca")
+            metrics.observe("rag_candidates", len(keyword), {"branch": "keyword"}, buckets=COUNT_BUCKETS)
+            metrics.observe("rag_candidates", len(ranked), {"branch": "rrf"}, buckets=COUNT_BUCKETS)
+
+            return [{**self.documents[doc], "score": score} for doc, score in ranked]
+        except Exception as e:
+            metrics.inc("rag_search_errors_total", labels={"stage": "local_index"}, help="Erros na busca híbrida")
+            logger.error(f"Erro search_hybrid (índice local): {e}", exc_info=True)
+            return []
+
+def export_from_database(output_dir: str) -> None:
+    from src.common.database import get_db_connection
+    from src.common.config import HF_MODEL_NAME
+
+    with get_db_connection() as conn:
+        # Contagem e leitura na mesma foto do banco; cursor nomeado traz as linhas em lotes
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM documentos_unb WHERE embedding IS NOT NULL")
+            total = cur.fetchone()[0]
+        with conn.cursor(name="local_index_export") as cur:
+            cur.itersize = EXPORT_FETCH_SIZE
+            # embedding::text evita o adaptador do pgvector e é convertido direto pelo NumPy
+            cur.execute("SELECT conteudo, metadados, fonte, embedding::text FROM documentos_unb "
+                        "WHERE embedding IS NOT NULL ORDER BY id")
+            rows = ((conteudo, metadados, fonte, np.array(embedding.strip("[]").split(","), dtype=np.float32))
+                    for conteudo, metadados, fonte, embedding in cur)
+            LocalHybridIndex.build(output_dir, rows, total, model_name=HF_MODEL_NAME)
+
+def export_from_snapshot(snapshot_dir: str, output_dir: str) -> None:
+    from src.ingestor.snapshot import iter_snapshot, read_manifest
+
+    manifest = read_manifest(snapshot_dir)
+    rows = ((chunk["conteudo"], chunk.get("metadados"), chunk["fonte"], embedding)
+            for chunk, embedding in iter_snapshot(snapshot_dir))
+    LocalHybridIndex.build(output_dir, rows, manifest["rows"], model_name=manifest["model"])
+
+if __name__ == "__main__":
+    from src.common.logger import setup_logging
+    from src.common.config import LOCAL_INDEX_PATH
+
+    setup_logging("local_index")
+    parser = argparse.ArgumentParser(description="Gera o índice local (sem Postgres) a partir da saída do ingestor")
+    parser.add_argument("--output", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--snapshot", help="Usa um snapshot do ingestor em vez de ler do Postgres")
+    args = parser.parse_args()
+    if args.snapshot:
+        export_from_snapshot(args.snapshot, args.output)
+    else:
+        export_from_database(args.output)
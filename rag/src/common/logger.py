@@ -16,5 +16,9 @@ def setup_logging(name="app"):
             logging.StreamHandler()
         ]
     )
+    slow_query_handler = RotatingFileHandler(os.path.join(LOG_DIR, "slow_queries.log"), maxBytes=5*1024*1024, backupCount=2)
+    slow_query_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+    logging.getLogger("slow_query").addHandler(slow_query_handler)
+
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("sentence_transformers").setLevel(logging.WARNING)
\ No newline at end of file
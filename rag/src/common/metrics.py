@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._buckets = {}
+        self._help = {}
+
+    # Mesma assinatura do MetricsRegistry do agente_servidor (core/tracing.py)
+    def inc(self, name: str, value: float = 1.0, labels: dict | None = None, help: str = ""):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict | None = None, help: str = "",
+                buckets: tuple = LATENCY_BUCKETS):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            bounds = self._buckets.setdefault(name, buckets)
+            series = self._histograms.setdefault(key, [0.0] * (len(bounds) + 2))
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def timer(self, name: str, labels: dict | None = None, help: str = ""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels, help=help)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[name, [list(p) for p in labels], value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, [list(p) for p in labels], list(series)]
+                               for (name, labels), series in self._histograms.items()],
+                "buckets": {name: list(bounds) for name, bounds in self._buckets.items()},
+                "help": dict(self._help)
+            }
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for name, text in snapshot.get("help", {}).items():
+                self._help.setdefault(name, text)
+            for name, bounds in snapshot.get("buckets", {}).items():
+                self._buckets.setdefault(name, tuple(bounds))
+            for name, labels, value in snapshot.get("counters", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            for name, labels, series in snapshot.get("histograms", []):
+                current = self._histograms.setdefault((name, tuple(tuple(p) for p in labels)), [0.0] * len(series))
+                for i, value in enumerate(series):
+                    current[i] += value
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({k[0] for k in self._counters}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in self._counters.items():
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({k[0] for k in self._histograms}):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), series in self._histograms.items():
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self._buckets[name], series):
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {series[-2]}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {series[-2]}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+class SharedMetrics:
+    # Com vários workers cada processo tem o próprio registro e a coleta cai em um worker qualquer.
+    # Cada worker grava periodicamente um snapshot no diretório; quem atende /metrics soma todos.
+    # Snapshots de workers encerrados continuam na soma, então os contadores agregados nunca diminuem.
+    def __init__(self, registry: Metrics, directory: str, interval: float = 5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+
+    @staticmethod
+    def prepare(directory: str) -> str:
+        # Chamado pelo processo principal antes de iniciar os workers: descarta snapshots de execuções anteriores
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("metrics_") and name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
+        return directory
+
+    def _path(self) -> str:
+        # pid lido na hora: o objeto pode ter sido criado antes do fork
+        return os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+
+    def write(self):
+        path = self._path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Falha ao gravar snapshot de métricas: {e}")
+
+    def start(self):
+        # Deve rodar no worker, depois do fork: threads não sobrevivem ao fork
+        self.write()
+        threading.Thread(target=self._loop, name="metrics-snapshot", daemon=True).start()
+
+    def render_prometheus(self) -> str:
+        self.write()
+        combined = Metrics()
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("metrics_") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    combined.merge(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Snapshot de métricas ignorado ({name}): {e}")
+        return combined.render_prometheus()
+
+metrics = Metrics()
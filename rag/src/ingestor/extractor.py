@@ -5,6 +5,7 @@ import io
 import os
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
+from src.ingestor.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,7 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+@profiler.stage("parse_html")
 def _scrape_html(content: str) -> str:
     soup = BeautifulSoup(content, 'lxml')
     
@@ -25,6 +27,7 @@ def _scrape_html(content: str) -> str:
         return text
     return ""
 
+@profiler.stage("parse_pdf")
 def _scrape_pdf(content: bytes) -> str:
     text = ""
     try:
@@ -37,6 +40,7 @@ def _scrape_pdf(content: bytes) -> str:
         logger.error(f"Falha ao processar PDF: {e}", exc_info=True)
         return ""
 
+@profiler.stage("playwright")
 def _scrape_dynamic(url: str) -> str:
     try:
         with sync_playwright() as p:
@@ -7,6 +7,7 @@ from src.common.config import LOCAL_DOCS_PATH, SEED_URLS
 from src.ingestor.processor import TextProcessor
 from src.ingestor.crawler import crawl_seeds
 from src.ingestor.extractor import fetch_url_content, read_local_file_content
+from src.ingestor.profiler import profiler
 
 setup_logging("ingestor")
 logger = logging.getLogger(__name__)
@@ -18,41 +19,81 @@ def insert_document(conteudo, fonte, embedding, metadados):
             register_vector(conn)
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO documentos_unb (conteudo, fonte, embedding, metadados, search_vector)
-                    VALUES (%s, %s, %s, %s, setweight(to_tsvector('portuguese', %s), 'A') || setweight(to_tsvector('portuguese', %s), 'B'));
-                """, (conteudo, fonte, embedding, metadados, metadados, conteudo))
+                    INSERT INTO documentos_unb (conteudo, fonte, embedding, metadados)
+                    VALUES (%s, %s, %s, %s);
+                """, (conteudo, fonte, embedding, metadados))
             conn.commit()
     except Exception as e:
         logger.error(f"Erro insert: {e}")
 
+def ingest_text(processor, text, fonte):
+    with profiler.stage("enrich"):
+        meta = processor.enrich_text(text)
+    with profiler.stage("chunk"):
+        chunks = processor.create_token_chunks(text)
+    with profiler.stage("embed"):
+        embeddings = processor.embed_chunks(chunks)
+    for (chunk, _), embedding in zip(chunks, embeddings):
+        with profiler.stage("insert"):
+            insert_document(chunk, fonte, embedding, meta)
+    profiler.count("documents")
+    profiler.count("chunks", len(chunks))
+
 def run_ingestion(substitute=False):
     logger.info("--- Pipeline Unificado Iniciado ---")
-    if substitute: drop_table()
-    setup_database()
+    with profiler.stage("setup_db"):
+        if substitute: drop_table()
+        setup_database()
     
     try:
-        processor = TextProcessor()
+        with profiler.stage("load_models"):
+            processor = TextProcessor()
     except Exception: return
 
     if os.path.exists(LOCAL_DOCS_PATH):
         for f in os.listdir(LOCAL_DOCS_PATH):
             path = os.path.join(LOCAL_DOCS_PATH, f)
             if os.path.isfile(path):
-                text = read_local_file_content(path)
+                with profiler.stage("read_local"):
+                    text = read_local_file_content(path)
                 if text:
-                    meta = processor.enrich_text(text)
-                    for chunk in processor.create_chunks(text):
-                        insert_document(chunk, f"local:{f}", processor.get_embedding(chunk), meta)
+                    ingest_text(processor, text, f"local:{f}")
+                else:
+                    profiler.count("failed_documents")
+
+    with profiler.stage("crawl"):
+        urls = crawl_seeds(SEED_URLS)
 
-    for url in crawl_seeds(SEED_URLS):
-        text = fetch_url_content(url)
+    for url in urls:
+        with profiler.stage("fetch"):
+            text = fetch_url_content(url)
         if text:
-            meta = processor.enrich_text(text)
-            for chunk in processor.create_chunks(text):
-                insert_document(chunk, url, processor.get_embedding(chunk), meta)
+            ingest_text(processor, text, url)
+        else:
+            profiler.count("failed_documents")
+
+    stats = processor.get_chunk_stats()
+    logger.info(f"Chunks: {stats['chunks']} ({stats['tokens']} tokens, limite {stats['max_chunk_tokens']}/chunk, "
+                f"encoder {stats['encoder_max_tokens']}); "
+                f"truncados: {stats['truncated_chunks']} chunks, {stats['truncated_tokens']} tokens "
+                f"({stats['truncated_ratio'] * 100:.1f}%)")
+    profiler.count("truncated_tokens", stats["truncated_tokens"])
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--substitute', action='store_true')
+    parser.add_argument('--profile', action='store_true', help="Mede tempo de parede/CPU por etapa, vazão e pico de RSS")
+    parser.add_argument('--profile-mode', choices=['stages', 'cprofile', 'sampling'], default='stages',
+                        help="'cprofile' grava ingestion.prof; 'sampling' usa pyinstrument, se instalado")
+    parser.add_argument('--profile-dir', default="logs/profile")
     args = parser.parse_args()
-    run_ingestion(args.substitute)
\ No newline at end of file
+
+    if args.profile:
+        profiler.start(cprofile=args.profile_mode == 'cprofile', sampling=args.profile_mode == 'sampling')
+    try:
+        run_ingestion(args.substitute)
+    finally:
+        if args.profile:
+            profiler.stop()
+            profiler.log_summary()
+            logger.info(f"Relatório de perfil salvo em {profiler.write(args.profile_dir)}")
@@ -1,23 +1,137 @@
 import logging
-from sentence_transformers import SentenceTransformer
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from google import genai
-from src.common.config import HF_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, GEMINI_API_KEY
+from src.common.config import (
+    HF_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, GEMINI_API_KEY,
+    CHUNKING_MODE, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, EMBED_BATCH_SIZE
+)
 
 logger = logging.getLogger(__name__)
 
+SENTENCE_ENDINGS = ".!?;:"
+
+def _is_sentence_boundary(text: str, offsets: list, j: int) -> bool:
+    last_char = text[offsets[j][1] - 1:offsets[j][1]]
+    if last_char and last_char in SENTENCE_ENDINGS:
+        return True
+    # Os offsets não incluem espaços: a quebra de linha fica no intervalo até o próximo token
+    return "\n" in text[offsets[j][1]:offsets[j + 1][0]]
+
+def split_token_chunks(tokenizer, text: str, size: int, overlap: int) -> list[tuple[str, list[int]]]:
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    ids, offsets = encoding["input_ids"], encoding["offset_mapping"]
+    chunks, start = [], 0
+
+    while start < len(ids):
+        end = min(start + size, len(ids))
+        if end < len(ids):
+            # Prefere terminar o chunk no fim de uma frase dentro do último terço da janela
+            for j in range(end - 1, start + (2 * size) // 3, -1):
+                if _is_sentence_boundary(text, offsets, j):
+                    end = j + 1
+                    break
+
+        chunk_ids = ids[start:end]
+        chunk_text = text[offsets[start][0]:offsets[end - 1][1]].strip()
+        if chunk_text:
+            chunks.append((chunk_text, chunk_ids))
+
+        if end >= len(ids):
+            break
+        start = max(end - overlap, start + 1)
+
+    return chunks
+
 class TextProcessor:
     def __init__(self):
+        # Importações pesadas só ao instanciar: split_token_chunks é usado sem modelo (benchmark, testes)
+        from sentence_transformers import SentenceTransformer
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from google import genai
+
         try:
             self.model = SentenceTransformer(HF_MODEL_NAME)
+            self.tokenizer = self.model.tokenizer
             self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
             self.genai_client = genai.Client(api_key=GEMINI_API_KEY)
         except Exception as e:
             logger.critical(f"Erro init TextProcessor: {e}")
             raise
 
+        # Espaço para os tokens especiais (<s> e </s>) que o modelo acrescenta
+        self.special_tokens = self.tokenizer.num_special_tokens_to_add(pair=False)
+        # Limite do encoder: o que passar disso é cortado na codificação e não entra no embedding
+        self.encoder_max_tokens = self.model.max_seq_length - self.special_tokens
+        self.max_chunk_tokens = self.encoder_max_tokens
+        if CHUNK_TOKENS:
+            self.max_chunk_tokens = min(self.max_chunk_tokens, CHUNK_TOKENS)
+        self.overlap_tokens = min(CHUNK_OVERLAP_TOKENS, self.max_chunk_tokens // 2)
+
+        self.chunking_mode = CHUNKING_MODE
+        if self.chunking_mode == "tokens" and not getattr(self.tokenizer, "is_fast", False):
+            logger.warning("Tokenizador sem offsets (não-fast); usando divisão por caracteres.")
+            self.chunking_mode = "chars"
+
+        self.chunk_stats = {"chunks": 0, "tokens": 0, "truncated_chunks": 0, "truncated_tokens": 0}
+
+    def _record_chunk(self, n_tokens: int):
+        # Registrado na codificação, com os tokens do texto efetivamente enviado ao encoder
+        self.chunk_stats["chunks"] += 1
+        self.chunk_stats["tokens"] += n_tokens
+        if n_tokens > self.encoder_max_tokens:
+            self.chunk_stats["truncated_chunks"] += 1
+            self.chunk_stats["truncated_tokens"] += n_tokens - self.encoder_max_tokens
+
+    def _split_tokens(self, text: str) -> list[tuple[str, list[int]]]:
+        return split_token_chunks(self.tokenizer, text, self.max_chunk_tokens, self.overlap_tokens)
+
+    def create_token_chunks(self, text: str) -> list[tuple[str, list[int] | None]]:
+        if self.chunking_mode == "tokens":
+            return self._split_tokens(text)
+        # No modo por caracteres os ids são calculados só na codificação
+        return [(chunk, None) for chunk in self.text_splitter.split_text(text)]
+
     def create_chunks(self, text: str) -> list[str]:
-        return self.text_splitter.split_text(text)
+        return [chunk for chunk, _ in self.create_token_chunks(text)]
+
+    def _encode_ids(self, batch_ids: list[list[int]]) -> list[list[float]]:
+        import torch
+
+        # Corta no limite do encoder, como o model.encode faz no modo por caracteres
+        sequences = [self.tokenizer.build_inputs_with_special_tokens(ids[:self.encoder_max_tokens]) for ids in batch_ids]
+        width = max(len(s) for s in sequences)
+        input_ids = torch.full((len(sequences), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for i, seq in enumerate(sequences):
+            input_ids[i, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+            attention_mask[i, :len(seq)] = 1
+
+        features = {"input_ids": input_ids.to(self.model.device), "attention_mask": attention_mask.to(self.model.device)}
+        with torch.no_grad():
+            embeddings = self.model(features)["sentence_embedding"]
+        return embeddings.cpu().tolist()
+
+    def embed_chunks(self, chunks: list[tuple[str, list[int] | None]]) -> list[list[float]]:
+        if not chunks:
+            return []
+        try:
+            if all(ids is not None for _, ids in chunks):
+                # Reaproveita os ids da divisão: o texto não é tokenizado de novo
+                for _, ids in chunks:
+                    self._record_chunk(len(ids))
+                order = sorted(range(len(chunks)), key=lambda i: len(chunks[i][1]))
+                embeddings = [None] * len(chunks)
+                for b in range(0, len(order), EMBED_BATCH_SIZE):
+                    batch = order[b:b + EMBED_BATCH_SIZE]
+                    for i, emb in zip(batch, self._encode_ids([chunks[i][1] for i in batch])):
+                        embeddings[i] = emb
+                return embeddings
+
+            texts = [chunk for chunk, _ in chunks]
+            for text in texts:
+                self._record_chunk(len(self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]))
+            return self.model.encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False).tolist()
+        except Exception as e:
+            logger.error(f"Falha ao gerar embeddings: {e}")
+            return [[] for _ in chunks]
 
     def get_embedding(self, text: str) -> list[float]:
         try:
@@ -25,6 +139,13 @@ class TextProcessor:
         except Exception:
             return []
 
+    def get_chunk_stats(self) -> dict:
+        stats = dict(self.chunk_stats)
+        stats["max_chunk_tokens"] = self.max_chunk_tokens
+        stats["encoder_max_tokens"] = self.encoder_max_tokens
+        stats["truncated_ratio"] = round(stats["truncated_tokens"] / stats["tokens"], 4) if stats["tokens"] else 0.0
+        return stats
+
     def enrich_text(self, text: str) -> str:
         if not text or len(text) < 50: return ""
         try:
@@ -35,4 +156,4 @@ class TextProcessor:
             return response.text.strip() if response.text else ""
         except Exception as e:
             logger.warning(f"Falha enrichment: {e}")
-            return ""
\ No newline at end of file
+            return ""
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class IngestionProfiler:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {"documents": 0, "chunks": 0, "failed_documents": 0}
+        self._started_wall = None
+        self._started_cpu = None
+        self._finished_wall = None
+        self._finished_cpu = None
+        self._cprofile = None
+        self._sampler = None
+
+    def start(self, cprofile: bool = False, sampling: bool = False):
+        self.reset()
+        self.enabled = True
+        if cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif sampling:
+            try:
+                from pyinstrument import Profiler
+                self._sampler = Profiler()
+                self._sampler.start()
+            except ImportError:
+                logger.warning("pyinstrument não instalado; perfil por amostragem desativado.")
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+
+    def stop(self):
+        self._finished_wall = time.perf_counter()
+        self._finished_cpu = time.process_time()
+        if self._cprofile:
+            self._cprofile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        self.enabled = False
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        # Etapas podem ser aninhadas (ex.: playwright dentro de fetch): o tempo próprio exclui os filhos
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = {"child_wall": 0.0, "child_cpu": 0.0}
+        stack.append(frame)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            stack.pop()
+            if stack:
+                stack[-1]["child_wall"] += wall
+                stack[-1]["child_cpu"] += cpu
+            with self._lock:
+                entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                      "self_wall_s": 0.0, "self_cpu_s": 0.0})
+                entry["calls"] += 1
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+                entry["self_wall_s"] += wall - frame["child_wall"]
+                entry["self_cpu_s"] += cpu - frame["child_cpu"]
+
+    def count(self, key: str, value: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self) -> dict:
+        end_wall = self._finished_wall or time.perf_counter()
+        end_cpu = self._finished_cpu or time.process_time()
+        wall = end_wall - (self._started_wall or end_wall)
+        cpu = end_cpu - (self._started_cpu or end_cpu)
+
+        stages = {}
+        for name, entry in sorted(self.stages.items(), key=lambda item: -item[1]["self_wall_s"]):
+            stages[name] = {k: round(v, 4) if isinstance(v, float) else v for k, v in entry.items()}
+            stages[name]["share_of_wall"] = round(entry["self_wall_s"] / wall, 4) if wall else 0.0
+
+        return {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "documents_per_s": round(self.counters["documents"] / wall, 3) if wall else 0.0,
+            "chunks_per_s": round(self.counters["chunks"] / wall, 3) if wall else 0.0,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "counters": dict(self.counters),
+            "stages": stages
+        }
+
+    def write(self, output_dir: str) -> str:
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, "ingestion_profile.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+        if self._cprofile:
+            self._cprofile.dump_stats(os.path.join(output_dir, "ingestion.prof"))
+        if self._sampler:
+            with open(os.path.join(output_dir, "ingestion_profile.html"), "w", encoding="utf-8") as f:
+                f.write(self._sampler.output_html())
+        return report_path
+
+    def log_summary(self):
+        report = self.report()
+        logger.info(f"Perfil da ingestão: {report['wall_s']}s de parede, {report['cpu_s']}s de CPU, "
+                    f"{report['documents_per_s']} docs/s, {report['chunks_per_s']} chunks/s, "
+                    f"pico de RSS {report['peak_rss_mb']} MB")
+        for name, entry in report["stages"].items():
+            logger.info(f"  {name:<12} chamadas={entry['calls']:<5} parede={entry['self_wall_s']:.3f}s "
+                        f"cpu={entry['self_cpu_s']:.3f}s ({entry['share_of_wall'] * 100:.1f}%)")
+
+profiler = IngestionProfiler()
@@ -0,0 +1,172 @@
+import argparse
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+from src.common.logger import setup_logging
+from src.common.database import get_db_connection, setup_database, drop_table, create_search_indexes
+from src.common.config import (
+    HF_MODEL_NAME, VECTOR_DIMENSION, CHUNKING_MODE, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS,
+    CHUNK_SIZE, CHUNK_OVERLAP
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+FETCH_SIZE = 2000
+COPY_BATCH_ROWS = 5000
+
+def _copy_text(value) -> str:
+    # Formato texto do COPY: \N é nulo; barra, tab e quebras de linha precisam de escape
+    if value is None:
+        return r"\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def _vector_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(map(str, vector.tolist())) + "]"
+
+def export_snapshot(output_dir: str) -> dict:
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    with get_db_connection() as conn:
+        # Contagem e leitura na mesma foto do banco: ingestões concorrentes não desalinham as linhas
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM documentos_unb WHERE embedding IS NOT NULL;")
+            total = cur.fetchone()[0]
+
+        # Cursor nomeado (lado do servidor): as linhas chegam em lotes, sem carregar a tabela na memória
+        embeddings = np.lib.format.open_memmap(os.path.join(output_dir, "embeddings.npy"), mode="w+",
+                                               dtype=np.float32, shape=(total, VECTOR_DIMENSION))
+        rows = 0
+        with conn.cursor(name="snapshot_export") as cur, \
+                open(os.path.join(output_dir, "chunks.jsonl"), "w", encoding="utf-8") as f:
+            cur.itersize = FETCH_SIZE
+            # embedding::text evita o adaptador do pgvector e é convertido direto pelo NumPy
+            cur.execute("""
+                SELECT conteudo, metadados, fonte, data_ingestao, embedding::text
+                FROM documentos_unb WHERE embedding IS NOT NULL ORDER BY id
+            """)
+            for conteudo, metadados, fonte, data_ingestao, embedding in cur:
+                embeddings[rows] = np.array(embedding.strip("[]").split(","), dtype=np.float32)
+                f.write(json.dumps({
+                    "conteudo": conteudo,
+                    "metadados": metadados,
+                    "fonte": fonte,
+                    "data_ingestao": data_ingestao.isoformat() if data_ingestao else None
+                }, ensure_ascii=False) + "\n")
+                rows += 1
+        embeddings.flush()
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "model": HF_MODEL_NAME,
+        "dimension": VECTOR_DIMENSION,
+        "rows": rows,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "chunking": {
+            "mode": CHUNKING_MODE, "chunk_tokens": CHUNK_TOKENS, "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+            "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP
+        }
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Snapshot exportado para {output_dir}: {rows} chunks em {time.perf_counter() - start:.1f}s")
+    return manifest
+
+def read_manifest(snapshot_dir: str) -> dict:
+    with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    # Embeddings de outro modelo (ou dimensão) não são comparáveis com as consultas: recusa a carga
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Versão de snapshot não suportada: {manifest.get('version')} (esperada {SNAPSHOT_VERSION})")
+    if manifest.get("model") != HF_MODEL_NAME:
+        raise ValueError(f"Snapshot gerado com o modelo '{manifest.get('model')}', mas o configurado é '{HF_MODEL_NAME}'")
+    if manifest.get("dimension") != VECTOR_DIMENSION:
+        raise ValueError(f"Dimensão do snapshot ({manifest.get('dimension')}) difere de VECTOR_DIMENSION ({VECTOR_DIMENSION})")
+    return manifest
+
+def iter_snapshot(snapshot_dir: str):
+    manifest = read_manifest(snapshot_dir)
+    embeddings = np.load(os.path.join(snapshot_dir, "embeddings.npy"), mmap_mode="r")
+    if embeddings.shape != (manifest["rows"], manifest["dimension"]):
+        raise ValueError(f"embeddings.npy com formato {embeddings.shape}, manifesto indica "
+                         f"({manifest['rows']}, {manifest['dimension']})")
+
+    with open(os.path.join(snapshot_dir, "chunks.jsonl"), encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            yield json.loads(line), embeddings[i]
+
+def import_snapshot(snapshot_dir: str, substitute: bool = False, maintenance_work_mem: str | None = None) -> int:
+    manifest = read_manifest(snapshot_dir)
+    start = time.perf_counter()
+
+    if substitute:
+        drop_table()
+    # Tabela sem índices durante o COPY; HNSW e GIN são construídos uma vez no final
+    setup_database(create_indexes=False)
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM documentos_unb);")
+            if cur.fetchone()[0]:
+                raise ValueError("documentos_unb não está vazia; use --substitute para recriar a tabela")
+
+            # Índices de uma execução anterior interrompida seriam mantidos linha a linha: remove antes da carga
+            cur.execute("DROP INDEX IF EXISTS idx_hnsw_embedding;")
+            cur.execute("DROP INDEX IF EXISTS idx_gin_search;")
+
+            copy_sql = ("COPY documentos_unb (conteudo, metadados, fonte, data_ingestao, embedding) "
+                        "FROM STDIN WITH (FORMAT text)")
+            rows, buffer = 0, io.StringIO()
+            for chunk, embedding in iter_snapshot(snapshot_dir):
+                buffer.write("\t".join([
+                    _copy_text(chunk["conteudo"]),
+                    _copy_text(chunk.get("metadados")),
+                    _copy_text(chunk["fonte"]),
+                    _copy_text(chunk.get("data_ingestao")),
+                    _vector_literal(embedding)
+                ]) + "\n")
+                rows += 1
+                if rows % COPY_BATCH_ROWS == 0:
+                    buffer.seek(0)
+                    cur.copy_expert(copy_sql, buffer)
+                    buffer = io.StringIO()
+                    logger.info(f"{rows}/{manifest['rows']} chunks carregados")
+            if buffer.tell():
+                buffer.seek(0)
+                cur.copy_expert(copy_sql, buffer)
+        conn.commit()
+
+    load_s = time.perf_counter() - start
+    logger.info(f"COPY concluído: {rows} chunks em {load_s:.1f}s; criando índices...")
+    create_search_indexes(maintenance_work_mem=maintenance_work_mem)
+    logger.info(f"Snapshot importado em {time.perf_counter() - start:.1f}s")
+    return rows
+
+if __name__ == "__main__":
+    setup_logging("ingestor")
+    parser = argparse.ArgumentParser(description="Exporta/importa o corpus já processado (texto, metadados e embeddings)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Grava documentos_unb em um snapshot (NPY + JSONL)")
+    export_cmd.add_argument("--output", required=True)
+
+    import_cmd = commands.add_parser("import", help="Carrega um snapshot via COPY em um banco vazio")
+    import_cmd.add_argument("--input", required=True)
+    import_cmd.add_argument("--substitute", action="store_true", help="Recria a tabela antes da carga")
+    import_cmd.add_argument("--maintenance-work-mem", default="1GB",
+                            help="Memória para construir os índices após a carga (ex.: 1GB)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.output)
+    else:
+        import_snapshot(args.input, substitute=args.substitute, maintenance_work_mem=args.maintenance_work_mem)
@@ -0,0 +1,66 @@
+import argparse
+import logging
+import os
+import threading
+from functools import lru_cache
+from src.common.config import HF_MODEL_NAME, QUERY_ENCODER_PATH, QUERY_ENCODER_THREADS, QUERY_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class QueryEncoder:
+    # Só o necessário para embeddar consultas: nada de splitters, Gemini ou tokenização de chunks.
+    # O modelo é carregado sob demanda (ou no preload, antes do fork dos workers).
+    def __init__(self, model_name: str = HF_MODEL_NAME, model_path: str = QUERY_ENCODER_PATH,
+                 num_threads: int = QUERY_ENCODER_THREADS, cache_size: int = QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.model = None
+        self._lock = threading.Lock()
+        self._encode_cached = lru_cache(maxsize=cache_size)(self._encode) if cache_size > 0 else self._encode
+
+    def _source(self) -> str:
+        # Cópia exportada localmente evita resolver o modelo no hub do Hugging Face a cada início
+        if self.model_path and os.path.isdir(self.model_path):
+            return self.model_path
+        return self.model_name
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                from sentence_transformers import SentenceTransformer
+
+                source = self._source()
+                self.model = SentenceTransformer(source, device="cpu")
+                self.model.eval()
+                logger.info(f"Encoder de consultas carregado de {source}")
+        return self.model
+
+    def configure_threads(self):
+        # Chamado em cada worker depois do fork: vários processos com todos os núcleos cada um só disputam CPU
+        if self.num_threads > 0:
+            import torch
+            torch.set_num_threads(self.num_threads)
+
+    def _encode(self, text: str) -> tuple:
+        return tuple(self.load().encode(text, show_progress_bar=False).tolist())
+
+    def encode(self, text: str) -> list[float]:
+        try:
+            return list(self._encode_cached(text))
+        except Exception as e:
+            logger.error(f"Erro ao gerar embedding da consulta: {e}")
+            return []
+
+    def export(self, path: str):
+        self.load().save(path)
+        logger.info(f"Modelo exportado para {path} (use QUERY_ENCODER_PATH={path})")
+
+if __name__ == "__main__":
+    from src.common.logger import setup_logging
+
+    setup_logging("server")
+    parser = argparse.ArgumentParser(description="Exporta o modelo de embeddings para uso local pelo servidor")
+    parser.add_argument("--output", default=QUERY_ENCODER_PATH or "modelos/query_encoder")
+    args = parser.parse_args()
+    QueryEncoder(model_path="").export(args.output)
@@ -1,15 +1,41 @@
 from fastmcp import FastMCP
 from pydantic import BaseModel, Field
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 from src.common.logger import setup_logging
-from src.common.database import search_hybrid
-from src.ingestor.processor import TextProcessor # Reutiliza para gerar embedding da query
+from src.common.metrics import metrics, SharedMetrics
+from src.common.config import (
+    METRICS_ENABLED, METRICS_DIR, RETRIEVAL_BACKEND, LOCAL_INDEX_PATH, SERVER_HOST, SERVER_PORT, SERVER_WORKERS
+)
+from src.server.encoder import QueryEncoder
 import logging
+import os
+import tempfile
 
 setup_logging("server")
 logger = logging.getLogger(__name__)
 
-# Instancia global do processador para não recarregar modelo a cada request
-processor = TextProcessor()
+# Instancia global do encoder; o modelo só é carregado no preload ou na primeira consulta
+encoder = QueryEncoder()
+_search_hybrid = None
+# Preenchido quando há vários workers: cada um tem o próprio registro de métricas
+shared_metrics: SharedMetrics | None = None
+
+def get_search_hybrid():
+    global _search_hybrid
+    if _search_hybrid is None:
+        if RETRIEVAL_BACKEND == "local":
+            # Índice em arquivos carregado uma vez via mmap; o Postgres não é necessário neste modo
+            from src.common.local_index import LocalHybridIndex
+            _search_hybrid = LocalHybridIndex.load(LOCAL_INDEX_PATH).search_hybrid
+        else:
+            from src.common.database import search_hybrid
+            _search_hybrid = search_hybrid
+    return _search_hybrid
+
+def preload():
+    encoder.load()
+    get_search_hybrid()
 
 class RAGOutput(BaseModel):
     prompt_original: str
@@ -18,12 +44,22 @@ class RAGOutput(BaseModel):
 
 mcp = FastMCP(name="Servidor_RAG_UnB")
 
-@mcp.tool
+@mcp.tool(annotations={"readOnlyHint": True})
 def enriquecer_prompt_com_rag_unb(prompt_usuario: str) -> str:
     logger.info(f"Query: {prompt_usuario}")
     
-    query_emb = processor.get_embedding(prompt_usuario)
-    results = search_hybrid(prompt_usuario, query_emb)
+    with metrics.timer("rag_search_stage_seconds", {"stage": "total"}):
+        with metrics.timer("rag_search_stage_seconds", {"stage": "embed"}):
+            query_emb = encoder.encode(prompt_usuario)
+        
+        if not query_emb:
+            metrics.inc("rag_search_errors_total", labels={"stage": "embed"}, help="Erros na busca híbrida")
+        
+        results = get_search_hybrid()(prompt_usuario, query_emb)
+    
+    metrics.inc("rag_queries_total", help="Consultas recebidas")
+    if not results:
+        metrics.inc("rag_empty_results_total", help="Consultas sem nenhum resultado")
     
     import json
     return json.dumps({
@@ -32,5 +68,29 @@ def enriquecer_prompt_com_rag_unb(prompt_usuario: str) -> str:
         "fontes": [r['fonte'] for r in results]
     })
 
+if METRICS_ENABLED:
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        body = shared_metrics.render_prometheus() if shared_metrics else metrics.render_prometheus()
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+def on_worker_start():
+    encoder.configure_threads()
+    if shared_metrics:
+        shared_metrics.start()
+
 if __name__ == "__main__":
-    mcp.run(transport='http', host="0.0.0.0", port=8888)
\ No newline at end of file
+    preload()
+    if SERVER_WORKERS > 1:
+        from src.server.workers import serve_preforked
+        
+        if METRICS_ENABLED:
+            metrics_dir = METRICS_DIR or os.path.join(tempfile.gettempdir(), f"rag_metrics_{SERVER_PORT}")
+            shared_metrics = SharedMetrics(metrics, SharedMetrics.prepare(metrics_dir))
+        
+        # Sessões MCP não são compartilhadas entre processos: com vários workers o transporte é stateless
+        serve_preforked(lambda: mcp.http_app(path="/mcp", stateless_http=True), SERVER_HOST, SERVER_PORT,
+                        SERVER_WORKERS, on_worker_start=on_worker_start)
+    else:
+        encoder.configure_threads()
+        mcp.run(transport='http', host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
@@ -0,0 +1,80 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(app_factory: Callable, sock: socket.socket, on_start: Callable | None):
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if on_start:
+        on_start()
+    server = uvicorn.Server(uvicorn.Config(app_factory(), log_level="info"))
+    server.run(sockets=[sock])
+
+def _spawn(app_factory: Callable, sock: socket.socket, on_start: Callable | None) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app_factory, sock, on_start)
+        except BaseException:
+            logger.exception("Worker encerrado com erro")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def serve_preforked(app_factory: Callable, host: str, port: int, workers: int,
+                    on_worker_start: Callable | None = None):
+    # O chamador já carregou modelo e índices: depois do fork os workers compartilham essas
+    # páginas em copy-on-write. gc.freeze tira os objetos atuais do coletor, que de outra forma
+    # tocaria seus cabeçalhos e forçaria cópias das páginas em cada processo.
+    sock = _bind(host, port)
+    gc.freeze()
+
+    children = {_spawn(app_factory, sock, on_worker_start) for _ in range(workers)}
+    logger.info(f"{workers} workers atendendo em http://{host}:{port} (pids {sorted(children)})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} terminou (status {status}); iniciando substituto")
+            time.sleep(1)
+            children.add(_spawn(app_factory, sock, on_worker_start))
+
+    sock.close()
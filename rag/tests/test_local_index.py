@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.common.local_index import LocalHybridIndex, weighted_terms, METADATA_WEIGHT
+
+def rows():
+    # Gerador: o build consome uma linha por vez, sem lista em memória
+    yield "Regras de trancamento de disciplina no semestre.", None, "a", [1.0, 0.0, 0.0]
+    yield "Texto geral sobre a universidade.", "trancamento matrícula", "b", [0.0, 1.0, 0.0]
+    yield "Cardápio do restaurante universitário.", "", "c", [0.0, 0.0, 1.0]
+
+@pytest.fixture
+def index(tmp_path):
+    LocalHybridIndex.build(str(tmp_path), rows(), total=3, model_name="teste")
+    return LocalHybridIndex.load(str(tmp_path))
+
+def test_weighted_terms_up_weight_metadata():
+    terms = weighted_terms("trancamento de curso", "trancamento")
+    assert terms["trancamento"] == 1 + METADATA_WEIGHT
+    assert terms["curso"] == 1
+
+def test_keyword_search_sees_metadata(index):
+    results = index.search_hybrid("matrícula", [], limit=3)
+    assert [r["fonte"] for r in results] == ["b"]
+
+def test_metadata_match_outranks_content_match(index):
+    ranked = index._keyword("trancamento", candidates=3).tolist()
+    assert ranked == [1, 0]
+
+def test_embeddings_are_normalized_float16(index):
+    assert index.embeddings.dtype == np.float16
+    assert index.embeddings.shape == (3, 3)
+    assert index.search_hybrid("", [0.0, 0.0, 2.0], limit=1)[0]["fonte"] == "c"
+
+def test_build_rejects_row_count_mismatch(tmp_path):
+    with pytest.raises(ValueError):
+        LocalHybridIndex.build(str(tmp_path), rows(), total=4)
+    with pytest.raises(ValueError):
+        LocalHybridIndex.build(str(tmp_path), rows(), total=2)
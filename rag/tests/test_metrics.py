@@ -0,0 +1,27 @@
+from src.common.metrics import Metrics
+
+def test_inc_matches_agent_registry_signature():
+    m = Metrics()
+    m.inc("rag_queries_total", help="Consultas recebidas")
+    m.inc("rag_queries_total", 2)
+    m.inc("rag_search_errors_total", labels={"stage": "sql"})
+    text = m.render_prometheus()
+    assert "rag_queries_total 3.0" in text
+    assert 'rag_search_errors_total{stage="sql"} 1.0' in text
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.inc("rag_search_errors_total", labels={"stage": 'a"b\\c\nd'})
+    assert 'rag_search_errors_total{stage="a\\"b\\\\c\\nd"} 1.0' in m.render_prometheus()
+
+def test_merge_sums_snapshots():
+    a, b = Metrics(), Metrics()
+    a.inc("rag_queries_total", labels={"stage": "x"})
+    b.inc("rag_queries_total", 4, {"stage": "x"})
+    b.observe("rag_search_stage_seconds", 0.02, {"stage": "sql"})
+    combined = Metrics()
+    combined.merge(a.snapshot())
+    combined.merge(b.snapshot())
+    text = combined.render_prometheus()
+    assert 'rag_queries_total{stage="x"} 5.0' in text
+    assert 'rag_search_stage_seconds_count{stage="sql"} 1.0' in text
@@ -0,0 +1,66 @@
+import re
+from src.ingestor.processor import split_token_chunks
+
+class WordTokenizer:
+    """Tokenizador fast simulado: uma palavra ou pontuação por token, offsets sem espaços."""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False, verbose=True):
+        matches = list(re.finditer(r"\w+|[^\w\s]", text))
+        return {
+            "input_ids": [hash(m.group()) % 50000 for m in matches],
+            "offset_mapping": [(m.start(), m.end()) for m in matches]
+        }
+
+tokenizer = WordTokenizer()
+
+def words(n: int, start: int = 0) -> str:
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+def test_short_text_is_a_single_chunk():
+    chunks = split_token_chunks(tokenizer, "uma frase curta.", size=10, overlap=2)
+    assert [text for text, _ in chunks] == ["uma frase curta."]
+    assert len(chunks[0][1]) == 4
+
+def test_chunks_respect_size_and_ids_match_text():
+    text = words(25)
+    for chunk_text, ids in split_token_chunks(tokenizer, text, size=10, overlap=0):
+        assert len(ids) <= 10
+        assert ids == tokenizer(chunk_text)["input_ids"]
+
+def test_chunk_text_is_sliced_from_offsets():
+    text = "  alfa,   beta\tgama  "
+    chunks = split_token_chunks(tokenizer, text, size=10, overlap=0)
+    assert chunks[0][0] == "alfa,   beta\tgama"
+
+def test_overlap_repeats_tail_tokens():
+    chunks = split_token_chunks(tokenizer, words(20), size=8, overlap=3)
+    first, second = chunks[0][0].split(), chunks[1][0].split()
+    assert first[-3:] == second[:3]
+
+def test_without_overlap_tokens_are_covered_once():
+    text = words(23)
+    chunks = split_token_chunks(tokenizer, text, size=8, overlap=0)
+    assert " ".join(c for c, _ in chunks).split() == text.split()
+
+def test_prefers_sentence_end_in_last_third():
+    text = "a b c d e f g. h i j k l m n"
+    chunks = split_token_chunks(tokenizer, text, size=9, overlap=0)
+    assert chunks[0][0] == "a b c d e f g."
+
+def test_ignores_sentence_end_before_last_third():
+    text = "a. b c d e f g h i j k l m n"
+    chunks = split_token_chunks(tokenizer, text, size=9, overlap=0)
+    assert len(chunks[0][1]) == 9
+
+def test_line_break_is_a_boundary():
+    text = "um dois tres quatro cinco seis\nsete oito nove dez onze doze"
+    chunks = split_token_chunks(tokenizer, text, size=7, overlap=0)
+    assert [c for c, _ in chunks] == ["um dois tres quatro cinco seis", "sete oito nove dez onze doze"]
+
+def test_overlap_never_stalls():
+    chunks = split_token_chunks(tokenizer, words(12), size=4, overlap=4)
+    assert len(chunks) < 12 * 2
+    assert chunks[-1][0].endswith("w11")
+
+def test_empty_text():
+    assert split_token_chunks(tokenizer, "   ", size=8, overlap=2) == []